@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Pipelined Parts Segmentation
+============================
+여러 이미지의 업로드 / 큐 등록·GPU 실행 / 마스크 다운로드를 asyncio로 겹쳐 실행
+
+parts_segment.segment_parts는 업로드 → 큐 → 대기 → sleep을 파츠마다 순차 실행해서
+HTTP 왕복 동안 GPU가 논다. 여기서는 단계별 동시성 한도(semaphore)를 두고
+이미지 N+1 업로드, 이미지 N GPU 실행, 이미지 N-1 다운로드가 동시에 진행된다.
+
+HTTP는 keep-alive 커넥션 풀과 재시도를 갖춘 ComfyClient 하나를 공유하고,
+블로킹 호출은 AsyncComfyClient(asyncio.to_thread)로 이벤트 루프 밖에서 실행한다.
+
+Usage:
+    python async_segment.py --images D:/AI/SpineAtlas/characters/arcana/full --output parts/
+    python async_segment.py -i a.png b.png --gpu-limit 3 --download-limit 8
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import requests
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from comfy_client import (
+    ComfyClient, AsyncComfyClient, check_comfyui, estimate_reclaimed, history_output_files
+)
+from parts_segment import (
+    DEFAULT_COMFYUI_HOST,
+    DEFAULT_OUTPUT_DIR,
+    DEFAULT_UPLOAD_MANIFEST,
+    PARTS_PROMPTS,
+    upload_image,
+    build_segmentation_workflow,
+)
+
+
+# 단계별 기본 동시성 한도
+DEFAULT_UPLOAD_LIMIT = 2
+DEFAULT_GPU_LIMIT = 2      # ComfyUI에 동시에 올려둘 프롬프트 수
+DEFAULT_DOWNLOAD_LIMIT = 4
+
+
+def collect_images(paths: List[str]) -> List[str]:
+    """파일/폴더 인자를 PNG 경로 리스트로 펼침"""
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            images.extend(str(p) for p in sorted(Path(path).glob("*.png")))
+        else:
+            images.append(path)
+    return images
+
+
+class AsyncSegmentRunner:
+    """업로드 / GPU / 다운로드 단계를 파이프라인으로 겹치는 세그먼테이션 실행기"""
+
+    def __init__(
+        self,
+        host: str,
+        output_dir: str,
+        parts: Optional[List[str]] = None,
+        upload_limit: int = DEFAULT_UPLOAD_LIMIT,
+        gpu_limit: int = DEFAULT_GPU_LIMIT,
+        download_limit: int = DEFAULT_DOWNLOAD_LIMIT,
+        poll_interval: float = 0.5,
+        timeout: int = 180,
+        manifest_path: Optional[str] = DEFAULT_UPLOAD_MANIFEST,
+        client: Optional[ComfyClient] = None,
+    ):
+        """
+        Args:
+            host: ComfyUI 호스트
+            output_dir: 출력 폴더 (<output_dir>/<image stem>/<part>.png)
+            parts: 분리할 파츠 (기본: PARTS_PROMPTS 전체)
+            upload_limit: 동시 업로드 수
+            gpu_limit: ComfyUI에 동시에 올려둘 프롬프트 수
+            download_limit: 동시 다운로드 수
+            poll_interval: /history 폴링 간격 (초)
+            timeout: 프롬프트당 최대 대기 시간 (초)
+            manifest_path: 업로드 매니페스트 (None이면 항상 업로드)
+            client: 재사용할 클라이언트 (상주 워커 등, 없으면 새로 만들고 끝나면 닫음)
+        """
+        self.host = host
+        self.output_dir = Path(output_dir)
+        self.parts = parts or list(PARTS_PROMPTS.keys())
+        self.limits = {
+            "upload": upload_limit,
+            "gpu": gpu_limit,
+            "download": download_limit,
+        }
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.manifest_path = manifest_path
+        # 커넥션 풀 크기를 동시성 한도에 맞춤
+        self.owns_client = client is None
+        self.client = client or ComfyClient(
+            host, pool_size=upload_limit + gpu_limit + download_limit,
+            client_id="parts-segmenter"
+        )
+        self.aclient = AsyncComfyClient(self.client)
+
+        # 단계별 누적 소요 시간 (겹침 정도 확인용)
+        self.stage_time = {"upload": 0.0, "gpu": 0.0, "download": 0.0}
+        self.durations = []
+        self.cancelled = []
+
+    async def run(self, image_paths: List[str]) -> List[Dict]:
+        """모든 이미지를 파이프라인으로 처리"""
+        self._semaphores = {
+            name: asyncio.Semaphore(limit) for name, limit in self.limits.items()
+        }
+        try:
+            return await asyncio.gather(
+                *(self._segment_image(path) for path in image_paths)
+            )
+        finally:
+            if self.owns_client:
+                self.client.close()
+
+    async def _segment_image(self, image_path: str) -> Dict:
+        """이미지 한 장: 업로드 후 모든 파츠를 동시에 큐에 올림"""
+        results = {
+            "image": image_path,
+            "parts": {},
+            "errors": []
+        }
+
+        async with self._semaphores["upload"]:
+            started = time.time()
+            try:
+                upload_result = await asyncio.to_thread(
+                    upload_image, self.host, image_path,
+                    self.manifest_path, True, self.client
+                )
+            except (requests.RequestException, OSError) as e:
+                upload_result = None
+                results["errors"].append(f"upload: {e}")
+            self.stage_time["upload"] += time.time() - started
+
+        if not upload_result:
+            results["errors"].append("Failed to upload image")
+            return results
+
+        image_name = upload_result.get("name", os.path.basename(image_path))
+        output_prefix = Path(image_path).stem
+        part_dir = self.output_dir / output_prefix
+        part_dir.mkdir(parents=True, exist_ok=True)
+
+        parts = [p for p in self.parts if p in PARTS_PROMPTS]
+        for part_name in set(self.parts) - set(parts):
+            results["errors"].append(f"{part_name}: Unknown part")
+
+        statuses = await asyncio.gather(*(
+            self._segment_part(image_name, output_prefix, part_name, part_dir, results)
+            for part_name in parts
+        ))
+        results["parts"] = dict(zip(parts, statuses))
+
+        done = sum(1 for s in statuses if s == "success")
+        print(f"  [{'OK' if done == len(parts) else 'FAIL'}] {output_prefix}: {done}/{len(parts)} parts")
+        return results
+
+    async def _segment_part(
+        self,
+        image_name: str,
+        output_prefix: str,
+        part_name: str,
+        part_dir: Path,
+        results: Dict
+    ) -> str:
+        """파츠 하나: 큐 등록 → 완료 대기 (GPU 슬롯 점유) → 다운로드"""
+        workflow = build_segmentation_workflow(
+            image_name, part_name, PARTS_PROMPTS[part_name], output_prefix
+        )
+
+        async with self._semaphores["gpu"]:
+            started = time.time()
+            try:
+                prompt_id = await self.aclient.queue_prompt(workflow)
+                if not prompt_id:
+                    results["errors"].append(f"{output_prefix}/{part_name}: Failed to queue")
+                    return "error"
+                entry = await self.aclient.wait_for_completion(
+                    prompt_id, self.timeout, self.poll_interval
+                )
+                if entry is None:
+                    # 타임아웃된 프롬프트는 GPU 슬롯을 놓기 전에 취소
+                    state = await self.aclient.cancel_prompt(prompt_id)
+                    if state:
+                        self.cancelled.append({
+                            "image": output_prefix,
+                            "part": part_name,
+                            "prompt_id": prompt_id,
+                            "state": state,
+                            "reclaimed_sec": estimate_reclaimed(state, self.durations)
+                        })
+                else:
+                    self.durations.append(time.time() - started)
+            except requests.RequestException as e:
+                results["errors"].append(f"{output_prefix}/{part_name}: {e}")
+                return "error"
+            finally:
+                self.stage_time["gpu"] += time.time() - started
+
+        if entry is None:
+            results["errors"].append(f"{output_prefix}/{part_name}: Timeout")
+            return "timeout"
+
+        images = history_output_files(entry)
+        if not images:
+            results["errors"].append(f"{output_prefix}/{part_name}: No output image")
+            return "error"
+
+        async with self._semaphores["download"]:
+            started = time.time()
+            try:
+                await asyncio.to_thread(
+                    self.client.download_output, images[0], part_dir / f"{part_name}.png"
+                )
+            except (requests.RequestException, OSError) as e:
+                results["errors"].append(f"{output_prefix}/{part_name}: download {e}")
+                return "error"
+            finally:
+                self.stage_time["download"] += time.time() - started
+
+        return "success"
+
+
+def run_segmentation(host: str, image_paths: List[str], output_dir: str, **kwargs) -> List[Dict]:
+    """동기 코드용 진입점"""
+    runner = AsyncSegmentRunner(host, output_dir, **kwargs)
+    return asyncio.run(runner.run(image_paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pipelined SAM + GroundingDINO Parts Segmentation"
+    )
+    parser.add_argument(
+        "--images", "-i",
+        nargs="+",
+        required=True,
+        help="입력 이미지 경로 또는 폴더 (여러 개 가능)"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        default=DEFAULT_OUTPUT_DIR,
+        help=f"출력 디렉토리 (기본: {DEFAULT_OUTPUT_DIR})"
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_COMFYUI_HOST,
+        help=f"ComfyUI 호스트 (기본: {DEFAULT_COMFYUI_HOST})"
+    )
+    parser.add_argument(
+        "--parts", "-p",
+        default=",".join(PARTS_PROMPTS.keys()),
+        help="분리할 파츠 (콤마 구분)"
+    )
+    parser.add_argument(
+        "--upload-limit",
+        type=int,
+        default=DEFAULT_UPLOAD_LIMIT,
+        help=f"동시 업로드 수 (기본: {DEFAULT_UPLOAD_LIMIT})"
+    )
+    parser.add_argument(
+        "--gpu-limit",
+        type=int,
+        default=DEFAULT_GPU_LIMIT,
+        help=f"ComfyUI에 동시에 올려둘 프롬프트 수 (기본: {DEFAULT_GPU_LIMIT})"
+    )
+    parser.add_argument(
+        "--download-limit",
+        type=int,
+        default=DEFAULT_DOWNLOAD_LIMIT,
+        help=f"동시 다운로드 수 (기본: {DEFAULT_DOWNLOAD_LIMIT})"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=180,
+        help="프롬프트당 최대 대기 시간 (기본: 180초)"
+    )
+
+    args = parser.parse_args()
+
+    print(f"Connecting to ComfyUI at {args.host}...")
+    if not check_comfyui(args.host):
+        print("Error: ComfyUI is not running!")
+        sys.exit(1)
+    print("  [OK] Connected\n")
+
+    image_paths = collect_images(args.images)
+    missing = [p for p in image_paths if not os.path.exists(p)]
+    if missing:
+        print(f"Error: Image not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    parts = [p.strip() for p in args.parts.split(",")]
+
+    print("=" * 50)
+    print("  Pipelined Parts Segmentation")
+    print("=" * 50)
+    print(f"  Images: {len(image_paths)}")
+    print(f"  Parts: {', '.join(parts)}")
+    print(f"  Limits: upload={args.upload_limit}, gpu={args.gpu_limit}, download={args.download_limit}")
+    print(f"  Output: {args.output}")
+    print("=" * 50)
+    print()
+
+    runner = AsyncSegmentRunner(
+        args.host, args.output, parts,
+        upload_limit=args.upload_limit,
+        gpu_limit=args.gpu_limit,
+        download_limit=args.download_limit,
+        timeout=args.timeout,
+    )
+    start_time = time.time()
+    results = asyncio.run(runner.run(image_paths))
+    elapsed = time.time() - start_time
+
+    success_count = sum(
+        1 for r in results for v in r["parts"].values() if v == "success"
+    )
+    errors = [e for r in results for e in r["errors"]]
+
+    print("\n" + "=" * 50)
+    print("  Segmentation Complete")
+    print("=" * 50)
+    print(f"  Total Time: {elapsed:.1f}s")
+    print(f"  Success: {success_count}/{len(image_paths) * len(parts)}")
+    for stage, seconds in runner.stage_time.items():
+        print(f"  {stage:>8}: {seconds:.1f}s (slot-seconds)")
+    if runner.cancelled:
+        reclaimed = sum(c["reclaimed_sec"] for c in runner.cancelled)
+        print(f"  Cancelled: {len(runner.cancelled)}, ~{reclaimed:.0f}s GPU time reclaimed")
+
+    if errors:
+        print(f"\n  Errors ({len(errors)}):")
+        for err in errors[:10]:
+            print(f"    - {err}")
+
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
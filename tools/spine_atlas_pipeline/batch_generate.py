@@ -7,23 +7,72 @@ Batch Character Generator
 Usage:
     python batch_generate.py --character arcana --expressions idle,happy,skill
     python batch_generate.py --all  # 전체 캐릭터 생성
+    python batch_generate.py --all --cloud runpod,replicate  # 로컬 GPU가 꽉 차면 클라우드로 burst
 """
 
 import os
 import sys
 import json
 import time
+import copy
 import random
 import argparse
+import threading
 import requests
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+from job_journal import JobJournal, STATUS_QUEUED
+from generation_cache import GenerationCache, CACHE_DIRNAME, derive_seed, workflow_hash
+from comfy_client import (
+    get_client,
+    check_comfyui,
+    estimate_reclaimed,
+)
+from generation_backend import (
+    CAP_WORKFLOW,
+    CAP_RESUME,
+    STATE_SUCCESS,
+    STATE_RUNNING,
+    FINAL_STATES,
+    describe,
+)
 
 # 기본 설정
 DEFAULT_COMFYUI_HOST = "http://localhost:8188"
 DEFAULT_OUTPUT_DIR = "D:/AI/SpineAtlas/characters"
 SCRIPT_DIR = Path(__file__).parent
 
+# VRAM 기반 배치 크기 추정 (SDXL 1024x1024 기준, GB)
+MODEL_VRAM_GB = 7.0
+VRAM_PER_IMAGE_GB = 1.5
+DEFAULT_MAX_BATCH = 4
+
+# 생성 해상도/스텝 (full: 최종, preview: 탐색용 저해상도)
+FULL_SIZE = 1024
+FULL_STEPS = 30
+PREVIEW_SIZE = 512
+PREVIEW_STEPS = 12
+PREVIEW_DIRNAME = "preview"
+# hires 패스 (preview latent 업스케일 후 재샘플링 강도)
+HIRES_DENOISE = 0.5
+# img2img 표정 모드 (idle latent에서 다시 샘플링하는 강도)
+BASE_EXPRESSION = "idle"
+EXPRESSION_DENOISE = 0.55
+
+# 출력 다운로드 동시 실행 수
+DEFAULT_DOWNLOAD_WORKERS = 4
+
+# 멀티 호스트: 연속 실패 허용 횟수, 죽은 호스트 재확인 간격 (초)
+HOST_MAX_FAILURES = 3
+HOST_HEALTH_INTERVAL = 10.0
+# 모든 호스트가 죽었을 때 남은 작업을 실패 처리하기 전에 복구를 기다리는 시간 (초)
+HOST_OUTAGE_WAIT = 120.0
+# 큐에도 히스토리에도 없는 프롬프트 (서버 재시작, 큐 삭제): 연속 poll 횟수, 작업당 재제출 횟수
+LOST_POLLS = 3
+MAX_LOST_RETRIES = 2
+
 
 def load_prompts() -> Dict:
     """캐릭터 프롬프트 로드"""
@@ -32,38 +81,35 @@ def load_prompts() -> Dict:
         return json.load(f)
 
 
-def check_comfyui(host: str) -> bool:
-    """ComfyUI 서버 상태 확인"""
+def get_vram_total(host: str) -> Optional[int]:
+    """첫 번째 GPU의 전체 VRAM (bytes, /system_stats)"""
     try:
-        response = requests.get(f"{host}/system_stats", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
-
+        stats = get_client(host).system_stats()
+        devices = stats.get("devices", [])
+        return devices[0].get("vram_total") if devices else None
+    except (requests.RequestException, ValueError, AttributeError):
+        return None
 
-def queue_prompt(host: str, prompt: Dict, client_id: str = "batch-generator") -> str:
-    """ComfyUI에 프롬프트 큐 등록"""
-    payload = {
-        "prompt": prompt,
-        "client_id": client_id
-    }
-    response = requests.post(f"{host}/prompt", json=payload)
-    return response.json().get("prompt_id")
 
+def max_batch_for_vram(
+    vram_total: Optional[int],
+    width: int = 1024,
+    height: int = 1024,
+    fallback: int = DEFAULT_MAX_BATCH
+) -> int:
+    """VRAM에서 모델 상주분을 뺀 나머지로 한 번에 샘플링할 수 있는 이미지 수"""
+    if not vram_total:
+        return fallback
+    per_image = VRAM_PER_IMAGE_GB * (width * height) / (1024 * 1024)
+    available = vram_total / 1024 ** 3 - MODEL_VRAM_GB
+    return max(1, int(available // per_image))
 
-def wait_for_completion(host: str, prompt_id: str, timeout: int = 120) -> bool:
-    """생성 완료 대기"""
-    start_time = time.time()
 
-    while time.time() - start_time < timeout:
-        response = requests.get(f"{host}/history/{prompt_id}")
-        if response.status_code == 200:
-            history = response.json()
-            if prompt_id in history:
-                return True
-        time.sleep(2)
-
-    return False
+def variant_chunks(variants: int, max_batch: int) -> List[List[int]]:
+    """변형 인덱스(1..N)를 max_batch 크기 묶음으로 분할"""
+    indices = list(range(1, variants + 1))
+    size = max(1, max_batch)
+    return [indices[i:i + size] for i in range(0, len(indices), size)]
 
 
 def build_generation_prompt(
@@ -71,22 +117,30 @@ def build_generation_prompt(
     expression: str,
     prompts: Dict,
     output_filename: str,
-    use_rembg: bool = True
+    use_rembg: bool = True,
+    variant_names: Optional[List[str]] = None,
+    seed: Optional[int] = None,
+    width: int = FULL_SIZE,
+    height: int = FULL_SIZE,
+    steps: int = FULL_STEPS,
+    subfolder: str = ""
 ) -> Dict:
-    """ComfyUI 생성 프롬프트 구축"""
-    common = prompts["common"]
-    char = prompts["characters"][character_name]
-    expr_prompt = prompts["expressions"].get(expression, "")
+    """
+    ComfyUI 생성 프롬프트 구축
 
-    positive = f"{common['positive_base']}, {char['positive']}, {expr_prompt}"
-    negative = f"{common['negative_base']}, {char.get('negative', '')}"
+    variant_names가 있으면 EmptyLatentImage batch_size를 그 수로 두고 한 번의 샘플링으로
+    여러 장을 만든 뒤, ImageFromBatch로 나눠 각 이름으로 저장한다
+    (텍스트 인코딩/그래프 준비/VAE 디코드 비용을 한 번만 낸다).
+    seed가 없으면 매번 무작위 seed를 쓴다. subfolder는 ComfyUI output 아래 저장 폴더.
+    """
+    positive, negative = build_prompt_texts(character_name, expression, prompts)
 
     # ComfyUI 워크플로우 프롬프트
     workflow = {
         "3": {
             "inputs": {
-                "seed": random.randint(0, 2**32 - 1),
-                "steps": 30,
+                "seed": seed if seed is not None else random.randint(0, 2**32 - 1),
+                "steps": steps,
                 "cfg": 7,
                 "sampler_name": "dpmpp_2m",
                 "scheduler": "karras",
@@ -106,9 +160,9 @@ def build_generation_prompt(
         },
         "5": {
             "inputs": {
-                "width": 1024,
-                "height": 1024,
-                "batch_size": 1
+                "width": width,
+                "height": height,
+                "batch_size": len(variant_names) if variant_names else 1
             },
             "class_type": "EmptyLatentImage"
         },
@@ -135,6 +189,30 @@ def build_generation_prompt(
         }
     }
 
+    add_save_nodes(workflow, output_filename, use_rembg, variant_names, subfolder)
+    return workflow
+
+
+def build_prompt_texts(character_name: str, expression: str, prompts: Dict):
+    """(positive, negative) 프롬프트 텍스트"""
+    common = prompts["common"]
+    char = prompts["characters"][character_name]
+    expr_prompt = prompts["expressions"].get(expression, "")
+
+    positive = f"{common['positive_base']}, {char['positive']}, {expr_prompt}"
+    negative = f"{common['negative_base']}, {char.get('negative', '')}"
+    return positive, negative
+
+
+def add_save_nodes(
+    workflow: Dict,
+    output_filename: str,
+    use_rembg: bool = True,
+    variant_names: Optional[List[str]] = None,
+    subfolder: str = ""
+):
+    """VAEDecode(노드 8) 뒤에 rembg + SaveImage 노드 추가 (변형이면 ImageFromBatch로 나눠 저장)"""
+    image_source = ["8", 0]
     if use_rembg:
         # rembg로 배경 제거 (투명 배경 PNG 출력)
         workflow["10"] = {
@@ -143,78 +221,930 @@ def build_generation_prompt(
             },
             "class_type": "Image Remove Background (rembg)"
         }
+        image_source = ["10", 0]
+
+    def prefix(name: str) -> str:
+        return f"{subfolder}/{name}" if subfolder else name
+
+    if not variant_names:
         workflow["9"] = {
             "inputs": {
-                "filename_prefix": output_filename,
-                "images": ["10", 0]
+                "filename_prefix": prefix(output_filename),
+                "images": image_source
             },
             "class_type": "SaveImage"
         }
-    else:
-        workflow["9"] = {
+        return
+
+    # 배치 결과를 한 장씩 나눠 변형별 이름으로 저장
+    for i, name in enumerate(variant_names):
+        workflow[str(100 + i)] = {
+            "inputs": {
+                "image": image_source,
+                "batch_index": i,
+                "length": 1
+            },
+            "class_type": "ImageFromBatch"
+        }
+        workflow[str(200 + i)] = {
             "inputs": {
-                "filename_prefix": output_filename,
-                "images": ["8", 0]
+                "filename_prefix": prefix(name),
+                "images": [str(100 + i), 0]
             },
             "class_type": "SaveImage"
         }
 
-    return workflow
-
 
-def generate_character(
+def build_img2img_prompt(
     character_name: str,
-    expressions: List[str],
-    host: str,
-    output_dir: str,
+    expression: str,
     prompts: Dict,
+    output_filename: str,
+    base_seed: int,
+    seed: int,
+    denoise: float = EXPRESSION_DENOISE,
+    use_rembg: bool = True,
+    variant_names: Optional[List[str]] = None,
+    width: int = FULL_SIZE,
+    height: int = FULL_SIZE,
+    steps: int = FULL_STEPS,
+    subfolder: str = ""
+) -> Dict:
+    """
+    idle latent을 출발점으로 표정만 바꾸는 img2img 프롬프트
+
+    노드 3-7은 idle 작업과 입력이 같은 그래프라 ComfyUI 캐시에 idle 샘플링 결과가 있으면 재사용되고,
+    그 latent을 표정 프롬프트(노드 21)로 denoise만큼 다시 샘플링한다(노드 23).
+    ComfyUI 캐시는 직전 프롬프트의 노드만 남기므로, 재사용은 같은 호스트에서 idle 바로 뒤에
+    실행될 때만 된다 (build_jobs의 "after", JobScheduler 참고). 아니면 idle을 다시 샘플링한다.
+    KSampler는 denoise < 1이면 steps를 그대로 실행하므로 steps도 denoise 비율로 줄인다.
+    """
+    workflow = build_generation_prompt(
+        character_name, BASE_EXPRESSION, prompts, output_filename, use_rembg,
+        seed=base_seed, width=width, height=height, steps=steps
+    )
+    workflow = {
+        node_id: node for node_id, node in workflow.items()
+        if node["class_type"] not in ("SaveImage", "ImageFromBatch")
+    }
+    positive, _ = build_prompt_texts(character_name, expression, prompts)
+
+    workflow["21"] = {
+        "inputs": {
+            "text": positive,
+            "clip": ["4", 1]
+        },
+        "class_type": "CLIPTextEncode"
+    }
+    latent = ["3", 0]
+    if variant_names:
+        workflow["22"] = {
+            "inputs": {
+                "samples": latent,
+                "amount": len(variant_names)
+            },
+            "class_type": "RepeatLatentBatch"
+        }
+        latent = ["22", 0]
+    workflow["23"] = {
+        "inputs": dict(
+            workflow["3"]["inputs"],
+            seed=seed,
+            steps=max(1, round(steps * denoise)),
+            denoise=denoise,
+            positive=["21", 0],
+            latent_image=latent
+        ),
+        "class_type": "KSampler"
+    }
+    workflow["8"]["inputs"]["samples"] = ["23", 0]
+
+    add_save_nodes(workflow, output_filename, use_rembg, variant_names, subfolder)
+    return workflow
+
+
+def add_hires_pass(
+    workflow: Dict,
+    output_filename: str,
+    batch_index: Optional[int] = None,
+    width: int = FULL_SIZE,
+    height: int = FULL_SIZE,
+    steps: int = FULL_STEPS,
+    denoise: float = HIRES_DENOISE,
     use_rembg: bool = True
 ) -> Dict:
-    """단일 캐릭터의 모든 표정 생성"""
+    """
+    preview 워크플로우에 hires 패스 추가 (hires-fix 방식)
 
-    results = {
-        "character": character_name,
-        "expressions": {},
-        "errors": []
+    preview 샘플링(VAEDecode 앞 KSampler)은 그대로 두어 같은 seed로 같은 구도를 재현하고,
+    그 latent 중 batch_index 한 장을 업스케일해 denoise를 낮춘 두 번째 KSampler로 다듬는다.
+    batch_index가 None이면 배치가 한 장인 워크플로우다.
+    """
+    hires = {
+        node_id: node for node_id, node in copy.deepcopy(workflow).items()
+        if node["class_type"] not in ("SaveImage", "ImageFromBatch")
     }
+    samples = hires["8"]["inputs"]["samples"]
+    sampler_inputs = hires[samples[0]]["inputs"]
+    if batch_index is not None:
+        hires["11"] = {
+            "inputs": {
+                "samples": samples,
+                "batch_index": batch_index,
+                "length": 1
+            },
+            "class_type": "LatentFromBatch"
+        }
+        samples = ["11", 0]
 
-    char_output_dir = Path(output_dir) / character_name / "full"
-    char_output_dir.mkdir(parents=True, exist_ok=True)
+    hires["12"] = {
+        "inputs": {
+            "upscale_method": "nearest-exact",
+            "width": width,
+            "height": height,
+            "crop": "disabled",
+            "samples": samples
+        },
+        "class_type": "LatentUpscale"
+    }
+    hires["13"] = {
+        "inputs": dict(
+            sampler_inputs,
+            steps=steps,
+            denoise=denoise,
+            latent_image=["12", 0]
+        ),
+        "class_type": "KSampler"
+    }
+    hires["8"]["inputs"]["samples"] = ["13", 0]
+    hires["9"] = {
+        "inputs": {
+            "filename_prefix": output_filename,
+            "images": ["10", 0] if use_rembg else ["8", 0]
+        },
+        "class_type": "SaveImage"
+    }
+    return hires
+
+
+def build_jobs(
+    char_list: List[str],
+    expressions: List[str],
+    prompts: Dict,
+    use_rembg: bool = True,
+    variants: int = 1,
+    max_batch: int = DEFAULT_MAX_BATCH,
+    seed_salt: Optional[str] = "",
+    preview: bool = False,
+    img2img_denoise: Optional[float] = None
+) -> List[Dict]:
+    """
+    캐릭터 × 표정 생성 작업 목록 (캐릭터 우선 순서)
+
+    variants > 1이면 <char>_<expr>_v{i} 이름으로 max_batch장씩 묶은 작업을 만든다.
+    seed는 (캐릭터, 표정, 변형 묶음 시작 번호, seed_salt)에서 유도하고,
+    seed_salt가 None이면 무작위 seed를 쓴다. 각 작업의 "hash"는 출력 캐시 키다.
+    preview면 저해상도/적은 스텝으로 <char>/preview/에 저장한다 (작업 키에 @preview).
+    img2img_denoise가 있으면 idle 외 표정은 idle latent에서 그 강도로 다시 샘플링하고,
+    idle 작업이 목록에 있으면 그 키를 "after"에 넣는다 (스케줄러가 같은 백엔드에서 idle 바로 뒤에 실행).
+    기준 idle seed는 idle 작업 첫 이미지의 seed와 같다.
+    rembg 없는 full 해상도 txt2img 작업에는 프롬프트 텍스트("texts")를 넣어
+    워크플로우를 실행하지 못하는 클라우드 서비스(txt2img capability)도 맡을 수 있게 한다.
+    """
+    size_args = {}
+    stage, key_suffix = "full", ""
+    if preview:
+        size_args = {
+            "width": PREVIEW_SIZE, "height": PREVIEW_SIZE,
+            "steps": PREVIEW_STEPS, "subfolder": PREVIEW_DIRNAME
+        }
+        stage, key_suffix = PREVIEW_DIRNAME, "@preview"
 
-    for expr in expressions:
-        print(f"  Generating {character_name}_{expr}...")
+    def seed_for(*parts) -> Optional[int]:
+        return None if seed_salt is None else derive_seed(*parts, salt=seed_salt)
 
-        output_filename = f"{character_name}_{expr}"
-        prompt = build_generation_prompt(
-            character_name, expr, prompts, output_filename, use_rembg
+    def base_parts(character_name) -> tuple:
+        """idle 작업 첫 묶음의 seed 입력"""
+        if variants <= 1:
+            return (character_name, BASE_EXPRESSION)
+        return (character_name, BASE_EXPRESSION, 1)
+
+    def base_seed_for(character_name) -> int:
+        # idle 기준 seed는 무작위 모드여도 캐릭터 안에서 같아야 한다
+        if character_name not in base_seeds:
+            base_seed = seed_for(*base_parts(character_name))
+            base_seeds[character_name] = (
+                base_seed if base_seed is not None else random.randint(0, 2**32 - 1)
+            )
+        return base_seeds[character_name]
+
+    def prompt_for(character_name, expr, output_filename, seed_parts, variant_names=None):
+        if img2img_denoise is None or expr == BASE_EXPRESSION:
+            seed = seed_for(*seed_parts)
+            if img2img_denoise is not None and seed_parts == base_parts(character_name):
+                # 배치 noise의 첫 장은 같은 seed의 한 장짜리 noise와 같다
+                seed = base_seed_for(character_name)
+            return build_generation_prompt(
+                character_name, expr, prompts, output_filename, use_rembg,
+                variant_names=variant_names, seed=seed, **size_args
+            )
+        seed = seed_for(*seed_parts)
+        return build_img2img_prompt(
+            character_name, expr, prompts, output_filename,
+            base_seed=base_seed_for(character_name),
+            seed=seed if seed is not None else random.randint(0, 2**32 - 1),
+            denoise=img2img_denoise, use_rembg=use_rembg,
+            variant_names=variant_names, **size_args
         )
 
+    base_seeds = {}
+
+    def texts_for(character_name, expr) -> Dict:
+        if use_rembg or preview or (img2img_denoise is not None and expr != BASE_EXPRESSION):
+            return {}
+        return {"texts": build_prompt_texts(character_name, expr, prompts)}
+
+    jobs = []
+    for character_name in char_list:
+        for expr in expressions:
+            output_filename = f"{character_name}_{expr}"
+            if variants <= 1:
+                jobs.append({
+                    "key": output_filename + key_suffix,
+                    "character": character_name,
+                    "expression": expr,
+                    "stage": stage,
+                    "images": [output_filename],
+                    "prompt": prompt_for(character_name, expr, output_filename,
+                                         (character_name, expr)),
+                    **texts_for(character_name, expr)
+                })
+                continue
+
+            for chunk in variant_chunks(variants, max_batch):
+                names = [f"{output_filename}_v{i}" for i in chunk]
+                key = names[0] if len(names) == 1 else f"{names[0]}-{chunk[-1]}"
+                jobs.append({
+                    "key": key + key_suffix,
+                    "character": character_name,
+                    "expression": expr,
+                    "stage": stage,
+                    "images": names,
+                    "prompt": prompt_for(character_name, expr, output_filename,
+                                         (character_name, expr, chunk[0]), names),
+                    **texts_for(character_name, expr)
+                })
+    base_keys = {}
+    for job in jobs:
+        job["hash"] = workflow_hash(job["prompt"])
+        if job["expression"] == BASE_EXPRESSION:
+            base_keys.setdefault(job["character"], job["key"])
+    if img2img_denoise is not None:
+        for job in jobs:
+            if job["expression"] != BASE_EXPRESSION and job["character"] in base_keys:
+                job["after"] = base_keys[job["character"]]
+    return jobs
+
+
+def build_upscale_jobs(
+    preview_jobs: List[Dict],
+    selected: set,
+    use_rembg: bool = True
+) -> List[Dict]:
+    """선택된 preview 이미지만 같은 seed의 hires 작업으로 (<char>/full/에 저장, 키에 @hires)"""
+    jobs = []
+    for preview in preview_jobs:
+        for i, name in enumerate(preview["images"]):
+            if name not in selected:
+                continue
+            batch_index = i if len(preview["images"]) > 1 else None
+            prompt = add_hires_pass(preview["prompt"], name, batch_index=batch_index, use_rembg=use_rembg)
+            jobs.append({
+                "key": f"{name}@hires",
+                "character": preview["character"],
+                "expression": preview["expression"],
+                "stage": "full",
+                "images": [name],
+                "prompt": prompt,
+                "hash": workflow_hash(prompt),
+            })
+    return jobs
+
+
+def selected_previews(output_dir: str, char_list: List[str], approve_file: Optional[str] = None) -> set:
+    """
+    hires로 다시 만들 preview 이미지 이름
+
+    approve_file이 있으면 그 목록(한 줄에 하나, .png 생략 가능)을,
+    없으면 <output>/<char>/preview/에 남아 있는 파일을 선택으로 본다 (버릴 preview는 지우면 된다).
+    """
+    if approve_file:
+        with open(approve_file, "r", encoding="utf-8") as f:
+            return {
+                Path(line.strip()).stem for line in f
+                if line.strip() and not line.startswith("#")
+            }
+    return {
+        path.stem
+        for char in char_list
+        for path in (Path(output_dir) / char / PREVIEW_DIRNAME).glob("*.png")
+    }
+
+
+class JobScheduler:
+    """
+    백엔드마다 항상 max_in_flight개의 작업을 올려두는 파이프라인 스케줄러
+
+    한 작업이 끝나기를 기다린 뒤 다음을 제출하면 HTTP 왕복과 sleep 동안 GPU가 논다.
+    여기서는 큐에 여유가 생기는 즉시 다음 작업을 제출하고,
+    폴링 한 번(ComfyUI는 /queue)으로 백엔드의 모든 진행 중 작업의 완료를 확인한다.
+
+    백엔드(generation_backend.py)가 여럿이면 priority가 낮은 쪽(로컬 GPU)부터, 같은 priority 안에서는
+    실제 대기열 길이(다른 클라이언트 작업 포함)가 가장 짧은 백엔드에 제출한다. 클라우드 서비스는
+    로컬 슬롯이 모두 차 있을 때만 작업을 받고(burst), 실행할 수 있는 작업(capability)만 받는다.
+    응답이 끊긴 백엔드의 작업은 살아있는 백엔드로 다시 보낸다.
+
+    "after"가 있는 작업(img2img 표정)은 그 작업(idle)이 제출될 때까지 기다렸다가
+    같은 백엔드에 바로 이어서 제출한다. 그 사이에 다른 프롬프트가 끼면 ComfyUI 노드 캐시에서
+    idle 샘플링 결과가 밀려나기 때문이다. idle 백엔드가 죽으면 아무 백엔드에나 보낸다.
+    """
+
+    def __init__(
+        self,
+        host,
+        max_in_flight: int = 3,
+        timeout: int = 120,
+        poll_interval: float = 1.0,
+        client_id: str = "batch-generator",
+        durations: Optional[List[float]] = None,
+        max_failures: int = HOST_MAX_FAILURES,
+        health_interval: float = HOST_HEALTH_INTERVAL,
+        outage_wait: float = HOST_OUTAGE_WAIT,
+        journal: Optional[JobJournal] = None,
+    ):
+        """
+        Args:
+            host: ComfyUI 호스트 또는 생성 백엔드 (여러 개면 리스트)
+            max_in_flight: 백엔드당 동시에 큐에 올려둘 작업 수 (백엔드가 정한 값이 있으면 그 값)
+            timeout: 작업당 최대 실행 시간 (실행 시작 시점부터, 초, 백엔드가 정한 값이 있으면 그 값)
+            poll_interval: 폴링 간격 (초)
+            client_id: ComfyUI client_id
+            durations: 이전 작업 소요 시간 (취소 시 회수 시간 추정용)
+            max_failures: 연속 요청 실패가 이만큼 쌓이면 백엔드를 죽은 것으로 본다
+            health_interval: 죽은 백엔드 재확인 간격 (초)
+            outage_wait: 모든 백엔드가 죽었을 때 남은 작업을 실패 처리하기 전에 복구를 기다리는 시간 (초)
+            journal: 작업 저널 (제출/완료 기록, 이전 실행에서 제출된 프롬프트 재연결)
+        """
+        hosts = [host] if isinstance(host, str) else list(host)
+        backends = [get_client(h) if isinstance(h, str) else h for h in hosts]
+        self.backends = {backend.name: backend for backend in backends}
+        self.hosts = [
+            {
+                "name": backend.name,
+                "backend": backend,
+                "alive": True,
+                "failures": 0,
+                "in_flight": {},
+                "checked": 0.0,
+                "completed": 0,
+                "images": 0,
+                "failed": 0,
+                "redispatched": 0,
+            }
+            for backend in backends
+        ]
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.client_id = client_id
+        self.durations = list(durations or [])
+        self.max_failures = max(1, max_failures)
+        self.health_interval = health_interval
+        self.outage_wait = outage_wait
+        self.journal = journal
+        self.lost = {}   # job key -> 잃어버려 다시 제출한 횟수
+        self.pending_bases = set()   # 의존 작업이 기다리는, 아직 제출되지 않은 작업 키
+        self.pins = {}               # 제출된 기준 작업 키 -> 백엔드 이름
+
+    def run(self, jobs: List[Dict], on_complete=None) -> List[Dict]:
+        """
+        모든 작업 실행
+
+        Args:
+            jobs: build_jobs() 형식의 작업 리스트
+            on_complete: 작업 하나가 끝날 때마다 호출 (result, done_count, total)
+
+        Returns:
+            작업별 결과 리스트 (완료 순서)
+        """
+        waiting = list(reversed(jobs))
+        results = []
+        total = len(jobs)
+        keys = {job["key"] for job in jobs}
+        self.pending_bases = {job["after"] for job in jobs if job.get("after") in keys}
+        self.pins = {}
+
+        for state in self.hosts:
+            state["alive"] = state["backend"].healthy()
+            state["checked"] = time.time()
+            if not state["alive"]:
+                print(f"  [WARN] {state['name']} is not responding")
+
+        if self.journal:
+            self._reattach(waiting)
+
+        outage_deadline = None
+        while waiting or self._in_flight_count():
+            self._revive_hosts()
+
+            # 빈 슬롯 채우기 (로컬 → 클라우드, 대기열이 가장 짧은 백엔드부터)
+            while waiting:
+                picked = self._pick(waiting)
+                if picked is None:
+                    break
+                index, state = picked
+                job = waiting.pop(index)
+                try:
+                    prompt_id = state["backend"].submit(job, self.client_id)
+                except requests.ConnectionError:
+                    waiting.append(job)
+                    self._host_failed(state, waiting)
+                    continue
+                except (requests.RequestException, ValueError) as e:
+                    prompt_id, error = None, str(e)
+                else:
+                    error = "Failed to queue"
+
+                if not prompt_id:
+                    self._finish(results, job, None, "error", 0.0, error, on_complete, total)
+                    continue
+
+                state["backend"].queue_depth += 1
+                state["in_flight"][prompt_id] = {
+                    "job": job,
+                    "submitted": time.time(),
+                    "started": None,
+                    "missing": 0,
+                }
+                if self.journal:
+                    self.journal.record(job["key"], STATUS_QUEUED, hash=job.get("hash"),
+                                        prompt_id=prompt_id, host=state["name"])
+                self._pin(job, state, waiting)
+
+            if any(state["alive"] for state in self.hosts):
+                outage_deadline = None
+
+            if self._in_flight_count():
+                time.sleep(self.poll_interval)
+                for state in self.hosts:
+                    if state["alive"] and state["in_flight"]:
+                        self._poll(state, waiting, results, on_complete, total)
+            elif waiting:
+                # 진행 중인 작업도 없는데 제출하지 못했으면 남은 작업을 맡을 백엔드가 없다.
+                # 모든 백엔드가 죽은 경우는 outage_wait 동안 재확인하며 복구를 기다린다
+                if not any(state["alive"] for state in self.hosts):
+                    now = time.time()
+                    if outage_deadline is None:
+                        outage_deadline = now + self.outage_wait
+                        print(f"  [HOST] No healthy backend, waiting up to {self.outage_wait:.0f}s "
+                              f"for {len(waiting)} job(s)")
+                    if now < outage_deadline:
+                        next_check = min(state["checked"] for state in self.hosts) + self.health_interval
+                        time.sleep(max(0.0, min(next_check, outage_deadline) - now))
+                        continue
+                    error = "No healthy backend"
+                else:
+                    error = "No backend can run this job"
+                while waiting:
+                    self._finish(results, waiting.pop(), None, "error", 0.0,
+                                 error, on_complete, total)
+
+        return results
+
+    def host_stats(self) -> List[Dict]:
+        """백엔드별 처리 결과"""
+        return [
+            {
+                "host": state["name"],
+                "alive": state["alive"],
+                "completed": state["completed"],
+                "images": state["images"],
+                "failed": state["failed"],
+                "redispatched": state["redispatched"],
+            }
+            for state in self.hosts
+        ]
+
+    def _reattach(self, waiting: List[Dict]):
+        """
+        저널에 제출만 기록된 작업이 서버 큐/히스토리에 남아 있으면 다시 제출하지 않고 이어서 추적
+
+        ComfyUI가 재시작되어 큐와 히스토리가 사라진 작업, resume을 지원하지 않는 백엔드(클라우드)에
+        제출했던 작업은 waiting에 남아 새로 제출된다.
+        """
+        by_name = {
+            state["name"]: state for state in self.hosts
+            if state["alive"] and CAP_RESUME in state["backend"].capabilities
+        }
+        for job in list(waiting):
+            pending = self.journal.pending_prompt(job["key"], job.get("hash"))
+            if not pending or pending["host"] not in by_name:
+                continue
+            state = by_name[pending["host"]]
+            prompt_id = pending["prompt_id"]
+
+            try:
+                known = prompt_id in state["backend"].poll([prompt_id])
+            except (requests.RequestException, ValueError):
+                continue
+
+            if not known:
+                continue
+            waiting.remove(job)
+            state["in_flight"][prompt_id] = {
+                "job": job,
+                "submitted": self.journal.get(job["key"]).get("time", time.time()),
+                "started": None,
+                "missing": 0,
+            }
+            print(f"  [RESUME] {job['key']} → {prompt_id[:8]} on {state['name']}")
+            self._pin(job, state, waiting)
+
+    def _pin(self, job: Dict, state: Dict, waiting: List[Dict]):
+        """기준 작업이 제출되면 의존 작업을 같은 백엔드에 고정하고 대기열 맨 앞(다음 순서)으로"""
+        if job["key"] not in self.pending_bases:
+            return
+        self.pending_bases.discard(job["key"])
+        self.pins[job["key"]] = state["name"]
+        dependents = [j for j in waiting if j.get("after") == job["key"]]
+        waiting[:] = [j for j in waiting if j.get("after") != job["key"]] + dependents
+
+    def _in_flight_count(self) -> int:
+        return sum(len(state["in_flight"]) for state in self.hosts)
+
+    def _slots(self, state: Dict) -> int:
+        return state["backend"].max_in_flight or self.max_in_flight
+
+    def _pick(self, waiting: List[Dict]) -> Optional[tuple]:
+        """
+        (waiting 인덱스, 백엔드) - 대기열 끝(다음 순서)부터 실행 가능한 백엔드가 있는 작업을 찾고,
+        그중 priority → 대기열 길이 → 진행 중 작업 수가 가장 작은 백엔드
+
+        기준 작업이 아직 제출되지 않은 작업은 건너뛰고, 기준 작업이 제출된 작업은 그 백엔드만 쓴다.
+        """
+        free = [
+            state for state in self.hosts
+            if state["alive"] and len(state["in_flight"]) < self._slots(state)
+        ]
+        if not free:
+            return None
+        alive = {state["name"] for state in self.hosts if state["alive"]}
+        for index in range(len(waiting) - 1, -1, -1):
+            job = waiting[index]
+            if job.get("after") in self.pending_bases:
+                continue
+            candidates = [state for state in free if state["backend"].can_run(job)]
+            pinned = self.pins.get(job.get("after"))
+            if pinned in alive:
+                candidates = [state for state in candidates if state["name"] == pinned]
+            if candidates:
+                return index, min(candidates, key=lambda state: (
+                    state["backend"].priority, state["backend"].queue_depth, len(state["in_flight"])
+                ))
+        return None
+
+    def _revive_hosts(self):
+        """죽은 백엔드를 health_interval마다 재확인"""
+        now = time.time()
+        for state in self.hosts:
+            if state["alive"] or now - state["checked"] < self.health_interval:
+                continue
+            state["checked"] = now
+            if state["backend"].healthy():
+                state["alive"] = True
+                state["failures"] = 0
+                print(f"  [HOST] {state['name']} is back")
+
+    def _host_failed(self, state: Dict, waiting: List[Dict]):
+        """
+        요청 실패 기록, 연속 실패가 max_failures에 닿고 상태 확인에도 응답이 없으면
+        백엔드를 내리고 진행 중이던 작업을 대기열 앞으로 되돌린다
+        """
+        state["failures"] += 1
+        if state["failures"] < self.max_failures:
+            return
+        state["checked"] = time.time()
+        if state["backend"].healthy():
+            state["failures"] = 0
+            return
+
+        state["alive"] = False
+        state["backend"].queue_depth = 0
+        lost = list(state["in_flight"].values())
+        state["in_flight"].clear()
+        for entry in reversed(lost):
+            waiting.append(entry["job"])
+        state["redispatched"] += len(lost)
+        print(f"  [HOST] {state['name']} is down, re-dispatching {len(lost)} job(s)")
+
+    def _poll(self, state: Dict, waiting: List[Dict], results: List[Dict], on_complete, total: int):
+        """백엔드 poll 한 번으로 진행 중 작업 상태 갱신, 끝난 작업은 결과 기록"""
+        backend = state["backend"]
+        in_flight = state["in_flight"]
         try:
-            # 큐에 등록
-            prompt_id = queue_prompt(host, prompt)
+            statuses = backend.poll(list(in_flight))
+        except (requests.RequestException, ValueError):
+            self._host_failed(state, waiting)
+            return
+        state["failures"] = 0
+
+        now = time.time()
+        timeout = backend.job_timeout or self.timeout
+        for prompt_id, entry in list(in_flight.items()):
+            job = entry["job"]
+            status = statuses.get(prompt_id)
+            if status is None:
+                entry["missing"] += 1
+                if entry["missing"] >= LOST_POLLS:
+                    del in_flight[prompt_id]
+                    self._lost(state, job, prompt_id, waiting, results, on_complete, total,
+                               now - entry["submitted"])
+                elif now - (entry["started"] or entry["submitted"]) > timeout * self._slots(state):
+                    del in_flight[prompt_id]
+                    state["failed"] += 1
+                    self._cancel(state, job, prompt_id, results, on_complete, total,
+                                 now - entry["submitted"])
+                continue
+            entry["missing"] = 0
+
+            if status["state"] == STATE_RUNNING and entry["started"] is None:
+                entry["started"] = now
 
-            if not prompt_id:
-                results["errors"].append(f"{expr}: Failed to queue")
+            if status["state"] not in FINAL_STATES:
+                # 대기 시간은 앞선 작업 수만큼 허용
+                started = entry["started"] or entry["submitted"]
+                limit = timeout if entry["started"] else timeout * self._slots(state)
+                if now - started > limit:
+                    del in_flight[prompt_id]
+                    state["failed"] += 1
+                    self._cancel(state, job, prompt_id, results, on_complete, total, now - started)
                 continue
 
-            # 완료 대기
-            if wait_for_completion(host, prompt_id, timeout=120):
-                results["expressions"][expr] = "success"
-                print(f"    [OK] {expr} completed")
+            del in_flight[prompt_id]
+            elapsed = now - (entry["started"] or entry["submitted"])
+            if status["state"] == STATE_SUCCESS:
+                self.durations.append(elapsed)
+                result = self._finish(results, job, prompt_id, "success", elapsed, None, on_complete, total,
+                                      host=state["name"], outputs=status.get("outputs"))
+                result["cached_nodes"] = status.get("cached_nodes")
+                result["total_nodes"] = len(job["prompt"])
+                state["completed"] += 1
+                state["images"] += len(result["images"])
             else:
-                results["expressions"][expr] = "timeout"
-                results["errors"].append(f"{expr}: Timeout")
-                print(f"    [FAIL] {expr} timeout")
+                self._finish(results, job, prompt_id, "error", elapsed,
+                             status.get("error") or "Execution failed", on_complete, total,
+                             host=state["name"])
+                state["failed"] += 1
+
+    def _lost(self, state: Dict, job: Dict, prompt_id: str, waiting: List[Dict], results: List[Dict],
+              on_complete, total: int, elapsed: float):
+        """큐/히스토리에서 사라진 프롬프트: MAX_LOST_RETRIES까지 대기열 앞으로 되돌리고, 넘으면 실패"""
+        retries = self.lost.get(job["key"], 0)
+        if retries >= MAX_LOST_RETRIES:
+            state["failed"] += 1
+            self._finish(results, job, prompt_id, "error", elapsed, "Prompt lost (not in queue or history)",
+                         on_complete, total, host=state["name"])
+            return
+        self.lost[job["key"]] = retries + 1
+        waiting.append(job)
+        state["redispatched"] += 1
+        print(f"  [LOST] {job['key']} ({prompt_id[:8]}) is gone from {state['name']}, re-queued")
+
+    def _cancel(self, state: Dict, job: Dict, prompt_id: str, results: List[Dict], on_complete, total: int, elapsed: float):
+        """타임아웃 작업 취소 후 결과 기록"""
+        try:
+            cancelled = state["backend"].cancel(prompt_id)
+        except (requests.RequestException, ValueError):
+            cancelled = None
+        result = self._finish(results, job, prompt_id, "timeout", elapsed, "Timeout", on_complete, total,
+                              host=state["name"])
+        if cancelled:
+            result["cancelled"] = {
+                "state": cancelled,
+                "reclaimed_sec": estimate_reclaimed(cancelled, self.durations)
+            }
+
+    def _finish(self, results, job, prompt_id, status, elapsed, error, on_complete, total,
+                host=None, outputs=None) -> Dict:
+        result = {
+            "key": job["key"],
+            "character": job["character"],
+            "expression": job["expression"],
+            "images": job.get("images", [job["key"]]),
+            "hash": job.get("hash"),
+            "stage": job.get("stage", "full"),
+            "prompt_id": prompt_id,
+            "host": host,
+            "status": status,
+            "elapsed": elapsed,
+            "error": error,
+            "outputs": outputs or [],
+        }
+        # 제출 전에 끝난 기준 작업 (의존 작업은 idle을 직접 샘플링)
+        self.pending_bases.discard(job["key"])
+        if self.journal:
+            self.journal.record(job["key"], status, hash=job.get("hash"), prompt_id=prompt_id,
+                                host=host, outputs=result["outputs"], error=error)
+        results.append(result)
+        if on_complete:
+            on_complete(result, len(results), total)
+        return result
+
+
+def download_output(host: str, output_file: str, dest: Path, timeout: int = 60) -> int:
+    """ComfyUI 출력 이미지를 dest로 스트리밍 다운로드 (ComfyClient.download_output 참고)"""
+    return get_client(host).download_output(output_file, dest, timeout)
+
+
+def image_paths(output_dir: str, result: Dict) -> List[Path]:
+    """작업 이미지의 로컬 경로 (<output>/<char>/<full|preview>/<name>.png)"""
+    stage_dir = Path(output_dir) / result["character"] / result.get("stage", "full")
+    return [stage_dir / f"{name}.png" for name in result["images"]]
+
+
+def restore_cached(
+    jobs: List[Dict],
+    output_dir: str,
+    cache: GenerationCache,
+    journal: Optional[JobJournal] = None
+) -> Tuple[List[Dict], List[Dict]]:
+    """캐시에 출력이 있는 작업은 GPU 대신 파일 복사 (남은 작업, 복원한 작업)"""
+    remaining, hits = [], []
+    for job in jobs:
+        files = cache.lookup(job["hash"], len(job["images"]))
+        if not files:
+            remaining.append(job)
+            continue
+        paths = image_paths(output_dir, job)
+        cache.materialize(files, paths)
+        if journal:
+            journal.record(job["key"], "success", hash=job["hash"], cache=True,
+                           outputs=[str(path) for path in paths])
+        hits.append(job)
+        print(f"  [CACHE] {job['key']} ({job['hash'][:12]})")
+    return remaining, hits
+
+
+def save_job_outputs(
+    result: Dict,
+    output_dir: str,
+    cache: Optional[GenerationCache] = None,
+    backend=None
+) -> int:
+    """
+    완료된 작업의 출력을 <output>/<char>/<stage>/<name>.png로 받고, cache가 있으면 캐시에도 저장
 
-        except Exception as e:
-            results["expressions"][expr] = "error"
-            results["errors"].append(f"{expr}: {str(e)}")
-            print(f"    [FAIL] {expr} error: {e}")
+    backend가 없으면 result["host"]의 ComfyUI에서 받는다.
+    캐시 키는 워크플로우 해시라 워크플로우를 그대로 실행한 백엔드의 출력만 저장한다.
 
-        # Rate limiting
-        time.sleep(2)
+    Returns:
+        받은 바이트 수
 
-    return results
+    Raises:
+        ValueError: 백엔드 출력에서 작업 이미지를 찾지 못함
+        requests.RequestException, OSError: 다운로드/저장 실패
+    """
+    backend = backend or get_client(result["host"])
+    paths = image_paths(output_dir, result)
+    size = backend.fetch(result, paths)
+    if cache and result.get("hash") and CAP_WORKFLOW in backend.capabilities:
+        cache.store(result["hash"], paths, {"key": result["key"], "prompt_id": result["prompt_id"]})
+    return size
+
+
+class OutputDownloader:
+    """
+    완료된 작업의 출력을 스레드 풀에서 내려받음
+
+    스케줄러의 완료 콜백에서 submit만 하고 바로 돌아가므로,
+    다운로드가 /queue 폴링과 다음 프롬프트 제출을 막지 않는다 (GPU는 계속 다른 작업을 렌더링).
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        cache: Optional[GenerationCache] = None,
+        workers: int = DEFAULT_DOWNLOAD_WORKERS,
+        backends: Optional[Dict] = None
+    ):
+        self.output_dir = output_dir
+        self.cache = cache
+        self.backends = backends or {}   # result["host"] -> 백엔드 (없으면 ComfyUI 호스트)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.lock = threading.Lock()
+        self.stats = {"files": 0, "bytes": 0, "errors": []}
+
+    def submit(self, result: Dict):
+        """성공한 작업의 출력 다운로드 예약"""
+        if result["status"] == "success":
+            self.executor.submit(self._download, result)
+
+    def _download(self, result: Dict):
+        try:
+            size = save_job_outputs(result, self.output_dir, self.cache,
+                                    self.backends.get(result["host"]))
+        except (requests.RequestException, OSError, ValueError) as e:
+            with self.lock:
+                self.stats["errors"].append(f"{result['key']}: download {e}")
+            print(f"    [WARN] {result['key']} 출력 다운로드 실패: {e}")
+            return
+        with self.lock:
+            self.stats["files"] += len(result["images"])
+            self.stats["bytes"] += size
+
+    def close(self) -> Dict:
+        """남은 다운로드를 모두 기다린 뒤 통계 반환"""
+        self.executor.shutdown(wait=True)
+        return self.stats
+
+
+def print_job_result(result: Dict, done: int, total: int):
+    """작업 완료 출력"""
+    tag = "OK" if result["status"] == "success" else "FAIL"
+    line = f"  [{done}/{total}] [{tag}] {result['key']} {result['status']} ({result['elapsed']:.1f}s)"
+    if result.get("cancelled"):
+        cancelled = result["cancelled"]
+        line += f" [CANCEL] {cancelled['state']}, ~{cancelled['reclaimed_sec']:.0f}s GPU reclaimed"
+    print(line)
+
+
+def summarize_by_character(job_results: List[Dict]) -> List[Dict]:
+    """작업별 결과 → 캐릭터별 결과 (generate_character 반환 형식)"""
+    by_character = {}
+    for r in job_results:
+        result = by_character.setdefault(r["character"], {
+            "character": r["character"],
+            "expressions": {},
+            "errors": [],
+            "durations": [],
+            "cancelled": []
+        })
+        expr = r["expression"]
+        # 변형 묶음이 여럿이면 하나라도 실패한 상태를 남긴다
+        if result["expressions"].get(expr, "success") == "success":
+            result["expressions"][expr] = r["status"]
+        if r["status"] == "success":
+            result["durations"].append(r["elapsed"])
+        if r["error"]:
+            result["errors"].append(f"{r['key']}: {r['error']}")
+        if r.get("cancelled"):
+            result["cancelled"].append(dict(r["cancelled"], expression=expr, prompt_id=r["prompt_id"]))
+    return list(by_character.values())
+
+
+def generate_character(
+    character_name: str,
+    expressions: List[str],
+    host: str,
+    output_dir: str,
+    prompts: Dict,
+    use_rembg: bool = True,
+    durations: Optional[List[float]] = None,
+    max_in_flight: int = 3,
+    img2img_denoise: Optional[float] = None
+) -> Dict:
+    """
+    단일 캐릭터의 모든 표정 생성
+
+    durations: 이전 작업들의 소요 시간 (타임아웃 취소 시 회수 시간 추정용)
+    img2img_denoise: 있으면 idle 외 표정을 idle latent에서 img2img로 생성
+    """
+    char_output_dir = Path(output_dir) / character_name / "full"
+    char_output_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = build_jobs([character_name], expressions, prompts, use_rembg,
+                      img2img_denoise=img2img_denoise)
+    scheduler = JobScheduler(host, max_in_flight=max_in_flight, durations=durations)
+    downloader = OutputDownloader(output_dir)
+
+    def on_complete(result, done, total):
+        print_job_result(result, done, total)
+        downloader.submit(result)
+
+    job_results = scheduler.run(jobs, on_complete=on_complete)
+    download_errors = downloader.close()["errors"]
+
+    summary = summarize_by_character(job_results)
+    if summary:
+        summary[0]["errors"].extend(download_errors)
+        return summary[0]
+    return {
+        "character": character_name,
+        "expressions": {},
+        "errors": [],
+        "durations": [],
+        "cancelled": []
+    }
 
 
 def main():
@@ -238,7 +1168,7 @@ def main():
     parser.add_argument(
         "--host",
         default=DEFAULT_COMFYUI_HOST,
-        help=f"ComfyUI 호스트 (기본: {DEFAULT_COMFYUI_HOST})"
+        help=f"ComfyUI 호스트, 여러 대면 콤마 구분 (기본: {DEFAULT_COMFYUI_HOST})"
     )
     parser.add_argument(
         "--output", "-o",
@@ -261,6 +1191,90 @@ def main():
         action="store_true",
         help="rembg 배경 제거 비활성화"
     )
+    parser.add_argument(
+        "--in-flight", "-j",
+        type=int,
+        default=3,
+        help="ComfyUI 큐에 동시에 올려둘 프롬프트 수 (기본: 3)"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=120,
+        help="작업당 최대 실행 시간 (기본: 120초)"
+    )
+    parser.add_argument(
+        "--variants", "-n",
+        type=int,
+        default=1,
+        help="표정당 후보 수 (한 번의 샘플러 배치로 생성, <char>_<expr>_v{i} 저장)"
+    )
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=None,
+        help="샘플러 배치 최대 크기 (기본: GPU VRAM에서 추정)"
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="이전 실행 저널 무시 (완료된 작업도 다시 생성, 기록은 계속)"
+    )
+    parser.add_argument(
+        "--seed-salt",
+        default="",
+        help="seed 유도용 salt (같은 salt면 같은 seed → 캐시 재사용, 기본: 빈 문자열)"
+    )
+    parser.add_argument(
+        "--random-seed",
+        action="store_true",
+        help="작업마다 무작위 seed 사용 (캐시 적중, 이어서 생성 없음)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="출력 캐시 사용 안 함"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help=f"출력 캐시 디렉토리 (기본: <output>/{CACHE_DIRNAME})"
+    )
+    parser.add_argument(
+        "--phase",
+        choices=["full", "preview", "upscale"],
+        default="full",
+        help=(f"full: {FULL_SIZE}px {FULL_STEPS}steps 생성, "
+              f"preview: {PREVIEW_SIZE}px {PREVIEW_STEPS}steps 탐색 생성 (<char>/{PREVIEW_DIRNAME}/), "
+              "upscale: 선택된 preview만 같은 seed로 hires 생성 (기본: full)")
+    )
+    parser.add_argument(
+        "--approve",
+        help=f"upscale할 preview 이름 목록 파일 (기본: <char>/{PREVIEW_DIRNAME}/에 남아 있는 파일)"
+    )
+    parser.add_argument(
+        "--expression-mode",
+        choices=["txt2img", "img2img"],
+        default="txt2img",
+        help=f"img2img: {BASE_EXPRESSION} 외 표정을 {BASE_EXPRESSION} latent에서 다시 샘플링 (기본: txt2img)"
+    )
+    parser.add_argument(
+        "--expression-denoise",
+        type=float,
+        default=EXPRESSION_DENOISE,
+        help=f"img2img 표정 denoise (steps도 같은 비율로 줄어듦, 기본: {EXPRESSION_DENOISE})"
+    )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=DEFAULT_DOWNLOAD_WORKERS,
+        help=f"출력 이미지 동시 다운로드 수 (기본: {DEFAULT_DOWNLOAD_WORKERS})"
+    )
+    parser.add_argument(
+        "--cloud",
+        default="",
+        help=("로컬 슬롯이 모두 차면 작업을 나눠 받을 클라우드 서비스, 콤마 구분 "
+              "(runpod: 모든 작업, replicate/together/stability: --no-rembg full txt2img 작업만)")
+    )
 
     args = parser.parse_args()
 
@@ -268,14 +1282,41 @@ def main():
     prompts = load_prompts()
     characters = prompts["characters"]
 
+    # 클라우드 burst 백엔드 (API 키가 없는 서비스는 건너뜀)
+    cloud_backends = []
+    if args.cloud:
+        from cloud_api_alternatives import PROVIDERS
+        from provider_stats import ProviderStatsStore, STATS_FILENAME
+
+        stats_store = ProviderStatsStore(Path(args.output) / STATS_FILENAME)
+        for name in [s.strip().lower() for s in args.cloud.split(",") if s.strip()]:
+            if name not in PROVIDERS:
+                print(f"Error: Unknown cloud service '{name}' (available: {', '.join(PROVIDERS)})")
+                sys.exit(1)
+            try:
+                provider = PROVIDERS[name]()
+            except ValueError as e:
+                print(f"  [SKIP] {name}: {e}")
+                continue
+            provider.stats_store = stats_store
+            cloud_backends.append(provider)
+
     # ComfyUI 연결 확인
+    hosts = [h.strip().rstrip("/") for h in args.host.split(",") if h.strip()]
+    alive_hosts = []
     if not args.dry_run:
-        print(f"Connecting to ComfyUI at {args.host}...")
-        if not check_comfyui(args.host):
+        for host in hosts:
+            print(f"Connecting to ComfyUI at {host}...")
+            if check_comfyui(host):
+                alive_hosts.append(host)
+                print("  [OK] Connected")
+            else:
+                print("  [FAIL] Not responding")
+        if not alive_hosts and not cloud_backends:
             print("Error: ComfyUI is not running!")
             print(f"Please start ComfyUI: python main.py --listen --port 8188")
             sys.exit(1)
-        print("  [OK] Connected\n")
+        print()
 
     # 표정 리스트
     expressions = [e.strip() for e in args.expressions.split(",")]
@@ -301,64 +1342,175 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    if args.phase == "upscale" and args.random_seed:
+        print("Error: --phase upscale needs the preview seeds (remove --random-seed)")
+        sys.exit(1)
+
+    # 변형 배치 크기 (VRAM 기준 상한, preview/upscale은 preview 해상도 기준으로 같은 묶음 재현)
+    size = FULL_SIZE if args.phase == "full" else PREVIEW_SIZE
+    if args.max_batch:
+        max_batch = args.max_batch
+    elif args.dry_run or not alive_hosts:
+        max_batch = DEFAULT_MAX_BATCH
+    else:
+        # 가장 작은 GPU에 맞춘다
+        max_batch = min(
+            max_batch_for_vram(get_vram_total(host), size, size) for host in alive_hosts
+        )
+
+    jobs = build_jobs(
+        char_list, expressions, prompts,
+        use_rembg=not args.no_rembg,
+        variants=args.variants,
+        max_batch=max_batch,
+        seed_salt=None if args.random_seed else args.seed_salt,
+        preview=args.phase != "full",
+        img2img_denoise=args.expression_denoise if args.expression_mode == "img2img" else None
+    )
+    if args.phase == "upscale":
+        selected = selected_previews(args.output, char_list, args.approve)
+        jobs = build_upscale_jobs(jobs, selected, use_rembg=not args.no_rembg)
+        if not jobs:
+            print(f"Error: No approved previews in {args.output}/<char>/{PREVIEW_DIRNAME}/ "
+                  f"(run --phase preview first, or pass --approve)")
+            sys.exit(1)
+
     # 생성 계획 출력
-    total_images = len(char_list) * len(expressions)
+    total_images = sum(len(job["images"]) for job in jobs)
     print("=" * 50)
     print("  Batch Generation Plan")
     print("=" * 50)
     print(f"  Characters: {len(char_list)}")
     print(f"  Expressions: {', '.join(expressions)}")
     print(f"  Total Images: {total_images}")
+    if args.phase != "full":
+        print(f"  Phase: {args.phase}")
+    if args.expression_mode == "img2img":
+        print(f"  Expressions from {BASE_EXPRESSION} latent (denoise {args.expression_denoise})")
+    if args.variants > 1:
+        print(f"  Variants: {args.variants} per expression (max batch {max_batch})")
+    print(f"  In-flight: {args.in_flight}" + (" per host" if len(hosts) > 1 else ""))
+    if len(hosts) > 1:
+        print(f"  Hosts: {len(hosts)}")
+    for backend in cloud_backends:
+        runnable = sum(1 for job in jobs if backend.can_run(job))
+        print(f"  Cloud: {describe(backend)}, {runnable}/{len(jobs)} jobs eligible")
     print(f"  Output: {args.output}")
     print("=" * 50)
     print()
 
     if args.dry_run:
         print("[DRY RUN] Would generate:")
-        for char in char_list:
-            for expr in expressions:
-                print(f"  - {char}_{expr}.png")
+        for job in jobs:
+            seed = job["prompt"]["3"]["inputs"]["seed"]
+            for name in job["images"]:
+                print(f"  - {name}.png (seed {seed}, {job['hash'][:12]})")
+        return
+
+    # 생성 실행 (캐릭터 간 대기 없이 큐를 계속 채움)
+    # 저널: 이전 실행에서 완료된 작업은 건너뜀
+    journal = JobJournal(args.output)
+    if args.no_resume:
+        journal.entries = {}
+    completed = {
+        job["key"] for job in jobs
+        if journal.is_completed(job["key"], image_paths(args.output, job), job["hash"])
+    }
+    skipped = [job for job in jobs if job["key"] in completed]
+    if skipped:
+        jobs = [job for job in jobs if job["key"] not in completed]
+        print(f"Resume: {len(skipped)} job(s) already completed ({journal.path})")
+    changed = sum(1 for job in jobs if journal.is_completed(job["key"]))
+    if changed:
+        print(f"Resume: {changed} job(s) completed with a different workflow/seed, regenerating")
+
+    # 출력 캐시: 같은 워크플로우의 이전 출력은 GPU 대신 파일 복사
+    cache = None if args.no_cache else GenerationCache(
+        args.cache_dir or Path(args.output) / CACHE_DIRNAME
+    )
+    cache_hits = []
+    if cache:
+        jobs, cache_hits = restore_cached(jobs, args.output, cache, journal)
+        if cache_hits:
+            print(f"Cache: {len(cache_hits)} job(s) restored from {cache.cache_dir}")
+
+    if not jobs:
+        print("Nothing to generate: all jobs completed or cached "
+              "(use --no-resume / --no-cache to regenerate)")
         return
 
-    # 생성 실행
-    all_results = []
+    for char_name in char_list:
+        (Path(args.output) / char_name / "full").mkdir(parents=True, exist_ok=True)
+
     start_time = time.time()
+    scheduler = JobScheduler(
+        hosts + cloud_backends, max_in_flight=args.in_flight, timeout=args.timeout,
+        journal=journal
+    )
+    downloader = OutputDownloader(args.output, cache, workers=args.download_workers,
+                                  backends=scheduler.backends)
 
-    for i, char_name in enumerate(char_list, 1):
-        print(f"\n[{i}/{len(char_list)}] {char_name.upper()}")
-        print("-" * 30)
-
-        result = generate_character(
-            char_name,
-            expressions,
-            args.host,
-            args.output,
-            prompts,
-            use_rembg=not args.no_rembg
-        )
-        all_results.append(result)
+    def on_complete(result, done, total):
+        print_job_result(result, done, total)
+        downloader.submit(result)
 
-        # 캐릭터 간 대기
-        if i < len(char_list):
-            time.sleep(3)
+    job_results = scheduler.run(jobs, on_complete=on_complete)
+    download_stats = downloader.close()
+    for backend in cloud_backends:
+        backend.close()
+    all_results = summarize_by_character(job_results)
 
     # 결과 요약
     elapsed = time.time() - start_time
     success_count = sum(
-        1 for r in all_results
-        for e in r["expressions"].values()
-        if e == "success"
+        len(r["images"]) for r in job_results if r["status"] == "success"
     )
+    skipped_images = sum(len(job["images"]) for job in skipped + cache_hits)
 
     print("\n" + "=" * 50)
     print("  Generation Complete")
     print("=" * 50)
     print(f"  Total Time: {elapsed:.1f}s")
-    print(f"  Success: {success_count}/{total_images}")
+    print(f"  Success: {success_count}/{total_images - skipped_images}")
+    if skipped_images:
+        print(f"  Skipped: {skipped_images} (completed in previous runs or cached)")
+    if elapsed > 0:
+        print(f"  Throughput: {success_count / elapsed * 60:.1f} images/min "
+              f"(in-flight {args.in_flight})")
     print(f"  Output: {args.output}")
+    print(f"  Downloaded: {download_stats['files']} files "
+          f"({download_stats['bytes'] / 1024 / 1024:.1f} MB)")
+
+    if len(scheduler.hosts) > 1:
+        print("  Hosts:")
+        for stats in scheduler.host_stats():
+            rate = stats["images"] / elapsed * 60 if elapsed > 0 else 0.0
+            status = "up" if stats["alive"] else "DOWN"
+            line = (f"    - {stats['host']} [{status}]: {stats['images']} images, "
+                    f"{rate:.1f} images/min")
+            if stats["failed"]:
+                line += f", {stats['failed']} failed"
+            if stats["redispatched"]:
+                line += f", {stats['redispatched']} re-dispatched"
+            print(line)
+
+    reported = [r for r in job_results if r.get("cached_nodes") is not None]
+    if reported:
+        cached_nodes = sum(r["cached_nodes"] for r in reported)
+        total_nodes = sum(r["total_nodes"] for r in reported)
+        print(f"  Cache Hits: {cached_nodes}/{total_nodes} nodes "
+              f"({cached_nodes / total_nodes if total_nodes else 0.0:.1%})")
+
+    cancelled = [c for r in all_results for c in r["cancelled"]]
+    if cancelled:
+        reclaimed = sum(c["reclaimed_sec"] for c in cancelled)
+        pending = sum(1 for c in cancelled if c["state"] == "pending")
+        print(f"  Cancelled: {len(cancelled)} "
+              f"(queued {pending}, running {len(cancelled) - pending}), "
+              f"~{reclaimed:.0f}s GPU time reclaimed")
 
     # 에러 출력
-    errors = [e for r in all_results for e in r["errors"]]
+    errors = [e for r in all_results for e in r["errors"]] + download_stats["errors"]
     if errors:
         print(f"\n  Errors ({len(errors)}):")
         for err in errors[:10]:  # 최대 10개만 표시
@@ -13,43 +13,540 @@ Cloud API Alternatives
 
 Usage:
     python cloud_api_alternatives.py --service replicate --character arcana
+    python cloud_api_alternatives.py -s stability --all -e idle,happy,angry   # 배치 (동시 실행)
+    python cloud_api_alternatives.py -s replicate,stability --all             # hedge + failover
+    python cloud_api_alternatives.py -s auto --optimize cost --all            # 기록 기반 자동 선택
+    python cloud_api_alternatives.py -s replicate --all --webhook-url https://my-tunnel.example.com
+    python cloud_api_alternatives.py -s auto --mock-providers fast=1:0.01,cheap=4:0.001 --all -o /tmp/out
 """
 
 import os
-import json
 import time
+import uuid
 import base64
+import random
+import shutil
 import argparse
+import tempfile
+import threading
 import requests
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from requests.adapters import HTTPAdapter
+
+from provider_stats import ProviderStatsStore, STATS_FILENAME, OBJECTIVES, choose_provider, print_estimates
+from generation_backend import (
+    GenerationBackend,
+    CAP_WORKFLOW,
+    CAP_TXT2IMG,
+    CAP_CANCEL,
+    PRIORITY_CLOUD,
+    STATE_QUEUED,
+    STATE_RUNNING,
+    STATE_SUCCESS,
+    STATE_ERROR,
+)
+from comfy_client import match_outputs
+from batch_generate import load_prompts, build_prompt_texts
+
+# 429 응답 재시도 (Retry-After가 없으면 backoff * 2^attempt 대기)
+RATE_LIMIT_RETRIES = 5
+RATE_LIMIT_BACKOFF = 2.0
+
+# 출력 저장: URL은 청크 스트리밍, base64는 4의 배수 청크로 나눠 디코드
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = (10, 60)
+BASE64_CHUNK_SIZE = 64 * 1024
+OUTPUT_WRITERS = 4
+
+# 완료 대기: 동기 대기(Replicate Prefer: wait / RunPod /runsync) 후 끝나지 않았으면
+# POLL_INITIAL부터 POLL_BACKOFF배씩 POLL_MAX까지 간격을 늘리며 폴링 (webhook 사용 시 더 드물게)
+REPLICATE_MAX_SYNC_WAIT = 60
+POLL_INITIAL = 1.0
+POLL_BACKOFF = 1.5
+POLL_MAX = 10.0
+WEBHOOK_POLL_INITIAL = 10.0
+WEBHOOK_POLL_MAX = 30.0
+GENERATION_TIMEOUT = 600.0
+
+# 서비스별 API 주소 (base_url / --base-url로 바꾸면 로컬 대역 서버(mock_cloud.py)에 붙일 수 있음)
+REPLICATE_BASE_URL = "https://api.replicate.com/v1"
+TOGETHER_BASE_URL = "https://api.together.xyz/v1"
+STABILITY_BASE_URL = "https://api.stability.ai/v1"
+RUNPOD_BASE_URL = "https://api.runpod.ai/v2"
+
+
+class GenerationCancelled(Exception):
+    """라우터가 다른 서비스 결과를 채택해 중단된 생성"""
+
+
+class GenerationTimeout(Exception):
+    """generation_timeout 안에 끝나지 않은 생성"""
 
-SCRIPT_DIR = Path(__file__).parent
 
+# =============================================================================
+# Rate Limiting
+# =============================================================================
+
+class TokenBucket:
+    """
+    토큰 버킷 rate limiter (스레드 안전)
+
+    초당 rate개씩 토큰이 차고 최대 burst개까지 쌓인다.
+    요청마다 토큰 하나를 소비하고, 없으면 찰 때까지 대기한다.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = max(1, burst if burst is not None else int(rate) or 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """토큰 하나 획득 (대기한 시간 반환)"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """429를 받으면 모든 요청을 잠시 멈추고 쌓인 토큰을 비움"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+# =============================================================================
+# Output Writers
+# =============================================================================
+
+def stream_to_file(session: requests.Session, url: str, dest: str) -> int:
+    """
+    URL을 dest로 스트리밍 다운로드 (<dest>.part에 청크 단위로 쓴 뒤 rename)
+
+    이미지 전체를 메모리에 올리지 않는다. 받은 바이트 수 반환.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest.with_name(dest.name + ".part")
+    size = 0
+    try:
+        with session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+        os.replace(tmp_path, dest)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return size
+
+
+def decode_base64_to_file(data: str, dest: str) -> int:
+    """
+    base64 문자열을 청크 단위로 디코드해 dest에 저장 (<dest>.part 후 rename)
+
+    디코드된 이미지 전체를 한 번에 만들지 않는다. 쓴 바이트 수 반환.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest.with_name(dest.name + ".part")
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(data), BASE64_CHUNK_SIZE):
+                chunk = base64.b64decode(data[start:start + BASE64_CHUNK_SIZE])
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, dest)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return size
+
+
+def variant_paths(output_path: str, variants: int) -> List[str]:
+    """표정당 후보 경로 (variants > 1이면 <name>_v1..v{n}.png, batch_generate.py와 같은 규칙)"""
+    if variants <= 1:
+        return [output_path]
+    path = Path(output_path)
+    return [str(path.with_name(f"{path.stem}_v{i}{path.suffix}")) for i in range(1, variants + 1)]
 
-def load_prompts() -> Dict:
-    """캐릭터 프롬프트 로드"""
-    with open(SCRIPT_DIR / "character_prompts.json", "r", encoding="utf-8") as f:
-        return json.load(f)
 
+def as_paths(output_path: Union[str, List[str]]) -> List[str]:
+    """출력 경로 하나 또는 목록 → 목록"""
+    return [output_path] if isinstance(output_path, (str, Path)) else list(output_path)
 
-def build_prompt(character_name: str, expression: str, prompts: Dict) -> tuple:
-    """프롬프트 구성"""
-    common = prompts["common"]
-    char = prompts["characters"][character_name]
-    expr_prompt = prompts["expressions"].get(expression, "")
 
-    positive = f"{common['positive_base']}, {char['positive']}, {expr_prompt}"
-    negative = f"{common['negative_base']}, {char.get('negative', '')}"
+_writer_pool = None
+_writer_pool_lock = threading.Lock()
+
+
+def write_outputs(writers: List[Callable[[], int]]) -> int:
+    """
+    출력 저장 함수 여러 개를 공용 스레드 풀에서 동시에 실행 (하나면 바로 실행)
+
+    하나라도 실패하면 모두 끝난 뒤 첫 예외를 다시 던진다. 전체 바이트 수 반환.
+    """
+    global _writer_pool
+    if len(writers) == 1:
+        return writers[0]()
+
+    with _writer_pool_lock:
+        if _writer_pool is None:
+            _writer_pool = ThreadPoolExecutor(max_workers=OUTPUT_WRITERS)
+    futures = [_writer_pool.submit(writer) for writer in writers]
+    errors = [future.exception() for future in futures]
+    for error in errors:
+        if error is not None:
+            raise error
+    return sum(future.result() for future in futures)
+
+
+# =============================================================================
+# Provider Base
+# =============================================================================
+
+class CloudProvider(GenerationBackend):
+    """
+    클라우드 서비스 공통 기반
+
+    - 서비스별 토큰 버킷으로 모든 API 호출(생성 요청 + 상태 폴링)의 초당 요청 수 제한
+    - 동시에 진행 중인 생성 수 상한 (run()이 슬롯을 잡고 generate() 실행)
+    - 429는 Retry-After만큼 버킷 전체를 멈춘 뒤 재시도
+
+    기본값은 각 서비스의 기본 계정 한도보다 보수적으로 잡은 값이며,
+    유료 플랜 한도에 맞게 configure_limits()(CLI: --rate, --concurrency)로 올린다.
+
+    generate()는 mark()로 단계별 시간(queue_time / run_time / download_time)을 남기고,
+    stats_store가 설정돼 있으면 run()이 결과와 함께 기록한다 (provider_stats.py).
+
+    output_path에 경로 목록을 주면 API의 다중 출력 파라미터(num_outputs / n / samples /
+    batch_size)로 요청 하나에 그 수만큼(최대 max_outputs) 생성해 순서대로 저장한다.
+
+    생성 백엔드 프로토콜(generation_backend.py)도 구현한다: submit()은 작업을 생성 스레드에
+    넘기고 바로 handle을 돌려주며, 출력은 임시 폴더에 받아 두었다가 fetch()에서 옮긴다.
+    """
+
+    capabilities = frozenset({CAP_TXT2IMG})
+    priority = PRIORITY_CLOUD
+
+    name = "cloud"
+    rate_limit = 1.0      # 초당 API 요청 수
+    burst = 1             # 순간 최대 요청 수
+    max_concurrency = 1   # 동시 생성 수
+    max_outputs = 1       # 요청 하나로 받을 수 있는 최대 이미지 수
+    sync_wait = 0         # 동기 대기 (초, 지원 서비스만, 0이면 바로 폴링)
+    unit_cost = 0.0       # 이미지당 비용 (USD, 기록이 없을 때 자동 선택 기준)
+    default_latency = 30.0  # 요청당 예상 시간 (초, 기록이 없을 때 자동 선택 기준)
+
+    def __init__(self):
+        self.limiter = TokenBucket(self.rate_limit, self.burst)
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.session = self._create_session(self.max_concurrency)
+        self.stats_store = None
+        self.webhook = None   # cloud_webhook.WebhookReceiver (지원 서비스만 사용)
+        self.generation_timeout = GENERATION_TIMEOUT
+        self._timing = threading.local()
+        self._executor = None
+        self._staging = None
+        self._handles = {}   # handle -> {"future", "cancel", "paths", "started"}
+        self._handles_lock = threading.Lock()
+
+    def _create_session(self, pool_size: int) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def configure_limits(self, rate: Optional[float] = None, concurrency: Optional[int] = None):
+        """rate limit / 동시 실행 수 변경 (작업 시작 전에 호출)"""
+        if rate:
+            self.rate_limit = rate
+            self.burst = max(1, int(rate))
+            self.limiter = TokenBucket(rate, self.burst)
+        if concurrency:
+            self.max_concurrency = concurrency
+            self.slots = threading.BoundedSemaphore(concurrency)
+            self.session = self._create_session(concurrency)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """rate limit을 지키는 HTTP 요청 (429는 대기 후 재시도)"""
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self.limiter.acquire()
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+                return response
+            try:
+                delay = float(response.headers.get("Retry-After", ""))
+            except ValueError:
+                delay = RATE_LIMIT_BACKOFF * (2 ** attempt)
+            self.limiter.pause(delay)
+        return response
+
+    def download_outputs(self, urls: List[str], paths: List[str]) -> int:
+        """출력 URL들을 각 경로로 동시에 스트리밍 다운로드 (CDN URL이므로 rate limit 밖, data: URI는 디코드)"""
+        return write_outputs([
+            (lambda url=url, path=path: decode_base64_to_file(url.split(",", 1)[1], path))
+            if url.startswith("data:") else
+            (lambda url=url, path=path: stream_to_file(self.session, url, path))
+            for url, path in zip(urls, paths)
+        ])
+
+    def decode_outputs(self, images_b64: List[str], paths: List[str]) -> int:
+        """base64 출력들을 각 경로로 동시에 디코드 저장"""
+        return write_outputs([
+            lambda data=data, path=path: decode_base64_to_file(data, path)
+            for data, path in zip(images_b64, paths)
+        ])
+
+    def check_outputs(self, outputs: List, paths: List[str]):
+        """요청한 수만큼 이미지가 왔는지 확인 (필터링 등으로 모자라면 실패 처리)"""
+        if len(outputs) < len(paths):
+            raise Exception(f"Expected {len(paths)} images, got {len(outputs)}")
+
+    def mark(self, phase: str):
+        """직전 mark 이후 시간을 phase에 누적 (현재 스레드의 생성 하나 기준)"""
+        now = time.time()
+        phases = self._timing.phases
+        phases[phase] = phases.get(phase, 0.0) + now - self._timing.last
+        self._timing.last = now
+
+    def wait(self, seconds: float, cancel: Optional[threading.Event] = None):
+        """폴링 간격 대기 (cancel이 설정되면 즉시 GenerationCancelled)"""
+        if cancel is None:
+            time.sleep(seconds)
+        elif cancel.wait(seconds):
+            raise GenerationCancelled()
+
+    def _sleep(
+        self,
+        seconds: float,
+        cancel: Optional[threading.Event] = None,
+        token: Optional[str] = None
+    ) -> Optional[Dict]:
+        """폴링 간격 대기 (webhook payload가 오면 바로 반환)"""
+        if token is None:
+            self.wait(seconds, cancel)
+            return None
+        end = time.time() + seconds
+        while True:
+            remaining = end - time.time()
+            if remaining <= 0:
+                return None
+            payload = self.webhook.wait(token, min(remaining, 0.5))
+            if payload is not None:
+                return payload
+            if cancel is not None and cancel.is_set():
+                raise GenerationCancelled()
+
+    def poll_until(
+        self,
+        fetch: Callable[[], Dict],
+        is_done: Callable[[Dict], bool],
+        cancel: Optional[threading.Event] = None,
+        token: Optional[str] = None,
+        on_status: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        끝날 때까지 상태 조회 (간격은 점점 늘림, webhook이 오면 그 payload로 즉시 완료)
+
+        generation_timeout을 넘기면 GenerationTimeout.
+        """
+        deadline = time.time() + self.generation_timeout
+        interval, max_interval = (
+            (POLL_INITIAL, POLL_MAX) if token is None else (WEBHOOK_POLL_INITIAL, WEBHOOK_POLL_MAX)
+        )
+        while True:
+            status = fetch()
+            if on_status is not None:
+                on_status(status)
+            if is_done(status):
+                return status
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise GenerationTimeout(f"{self.name}: {self.generation_timeout:.0f}s 안에 끝나지 않음")
+            pushed = self._sleep(min(interval, remaining), cancel, token)
+            if pushed is not None:
+                if on_status is not None:
+                    on_status(pushed)
+                if is_done(pushed):
+                    return pushed
+            interval = min(interval * POLL_BACKOFF, max_interval)
+
+    def generate(
+        self,
+        positive_prompt: str,
+        negative_prompt: str,
+        output_path: Union[str, List[str]],
+        cancel: Optional[threading.Event] = None
+    ) -> List[str]:
+        raise NotImplementedError
 
-    return positive, negative
+    def run(
+        self,
+        positive_prompt: str,
+        negative_prompt: str,
+        output_path: Union[str, List[str]],
+        cancel: Optional[threading.Event] = None,
+        **kwargs
+    ) -> List[str]:
+        """동시 실행 슬롯을 잡고 generate() 실행 (슬롯 대기 중에도 cancel 확인, kwargs는 generate()로)"""
+        images = len(as_paths(output_path))
+        if images > self.max_outputs:
+            raise ValueError(f"{self.name}: 요청당 최대 {self.max_outputs}장 ({images}장 요청)")
+        while not self.slots.acquire(timeout=0.5):
+            if cancel is not None and cancel.is_set():
+                raise GenerationCancelled()
+        self._timing.phases = {}
+        self._timing.last = time.time()
+        try:
+            if cancel is not None and cancel.is_set():
+                raise GenerationCancelled()
+            result = self.generate(positive_prompt, negative_prompt, output_path, cancel=cancel, **kwargs)
+        except GenerationCancelled:
+            raise
+        except Exception:
+            self._record("error", images)
+            raise
+        finally:
+            self.slots.release()
+        self._record("success", images)
+        return result
+
+    def _record(self, status: str, images: int):
+        if self.stats_store is not None:
+            self.stats_store.record(self.name, status, self._timing.phases, self.unit_cost, images)
+
+    # ---- 생성 백엔드 프로토콜 ----
+
+    @property
+    def max_in_flight(self) -> int:
+        return self.max_concurrency
+
+    @property
+    def job_timeout(self) -> float:
+        return self.generation_timeout
+
+    def generate_job(self, job: Dict, paths: List[str], cancel: threading.Event) -> List[str]:
+        """build_jobs() 작업 하나 생성 (프롬프트 텍스트로 run())"""
+        positive, negative = job["texts"]
+        return self.run(positive, negative, paths, cancel)
+
+    def submit(self, job: Dict, client_id: Optional[str] = None) -> str:
+        handle = uuid.uuid4().hex
+        with self._handles_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+                self._staging = Path(tempfile.mkdtemp(prefix=f"{self.name}-"))
+            stage = self._staging / handle
+            entry = {
+                "cancel": threading.Event(),
+                "paths": [str(stage / f"{name}.png") for name in job["images"]],
+                "started": False,
+            }
+            self._handles[handle] = entry
+
+        def work() -> List[str]:
+            entry["started"] = True
+            return self.generate_job(job, entry["paths"], entry["cancel"])
+
+        entry["future"] = self._executor.submit(work)
+        return handle
+
+    def poll(self, handles: List[str]) -> Dict[str, Dict]:
+        with self._handles_lock:
+            entries = {handle: self._handles.get(handle) for handle in handles}
+
+        statuses, queued = {}, 0
+        for handle, entry in entries.items():
+            if entry is None:
+                continue
+            future = entry["future"]
+            if not future.done():
+                state = STATE_RUNNING if entry["started"] else STATE_QUEUED
+                queued += state == STATE_QUEUED
+                statuses[handle] = {"state": state}
+            elif future.exception() is None:
+                statuses[handle] = {"state": STATE_SUCCESS, "outputs": entry["paths"]}
+            else:
+                statuses[handle] = {"state": STATE_ERROR, "error": str(future.exception())}
+                self._discard_handle(handle)
+        self.queue_depth = queued
+        return statuses
+
+    def fetch(self, result: Dict, dest_paths: List[Path]) -> int:
+        """임시 폴더의 출력을 dest_paths로 이동 (<dest>.part를 거쳐 rename)"""
+        with self._handles_lock:
+            entry = self._handles.pop(result["prompt_id"], None)
+        if entry is None:
+            raise ValueError("출력 이미지를 찾을 수 없습니다 (이미 가져갔거나 취소된 작업)")
+        size = 0
+        for src, dest in zip(entry["paths"], dest_paths):
+            dest = Path(dest)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = dest.with_name(dest.name + ".part")
+            shutil.move(src, tmp_path)
+            os.replace(tmp_path, dest)
+            size += dest.stat().st_size
+        shutil.rmtree(Path(entry["paths"][0]).parent, ignore_errors=True)
+        return size
+
+    def cancel(self, handle: str) -> Optional[str]:
+        with self._handles_lock:
+            entry = self._handles.get(handle)
+        if entry is None or entry["future"].done():
+            return None
+        state = "running" if entry["started"] else "pending"
+        entry["cancel"].set()
+        entry["future"].cancel()
+        self._discard_handle(handle)
+        return state
+
+    def _discard_handle(self, handle: str):
+        """handle 정리, 생성 스레드가 끝나면 임시 출력 삭제"""
+        with self._handles_lock:
+            entry = self._handles.pop(handle, None)
+        if entry is not None:
+            stage = Path(entry["paths"][0]).parent
+            entry["future"].add_done_callback(lambda f: shutil.rmtree(stage, ignore_errors=True))
+
+    def close(self):
+        """생성 스레드 종료 + 임시 폴더 삭제"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            shutil.rmtree(self._staging, ignore_errors=True)
+            self._executor = None
 
 
 # =============================================================================
 # Replicate API
 # =============================================================================
 
-class ReplicateAPI:
+REPLICATE_TERMINAL = ("succeeded", "failed", "canceled")
+RUNPOD_TERMINAL = ("COMPLETED", "FAILED", "CANCELLED", "TIMED_OUT")
+
+
+class ReplicateAPI(CloudProvider):
     """
     Replicate API를 사용한 이미지 생성
 
@@ -57,80 +554,138 @@ class ReplicateAPI:
     환경변수: REPLICATE_API_TOKEN
     """
 
-    def __init__(self, api_token: Optional[str] = None):
+    name = "replicate"
+    capabilities = frozenset({CAP_TXT2IMG, CAP_CANCEL})
+    rate_limit = 5.0
+    burst = 10
+    max_concurrency = 8
+    max_outputs = 4
+    sync_wait = 60        # Prefer: wait (최대 60초)
+    unit_cost = 0.0045
+    default_latency = 20.0
+
+    def __init__(self, api_token: Optional[str] = None, base_url: Optional[str] = None):
+        super().__init__()
         self.api_token = api_token or os.environ.get("REPLICATE_API_TOKEN")
         if not self.api_token:
             raise ValueError("REPLICATE_API_TOKEN 환경변수를 설정하세요")
 
-        self.base_url = "https://api.replicate.com/v1"
+        self.base_url = (base_url or REPLICATE_BASE_URL).rstrip("/")
         self.headers = {
             "Authorization": f"Token {self.api_token}",
             "Content-Type": "application/json"
         }
 
+    def cancel_prediction(self, prediction_id: str):
+        """진행 중인 prediction 취소 (실패해도 무시)"""
+        try:
+            self.request(
+                "POST",
+                f"{self.base_url}/predictions/{prediction_id}/cancel",
+                headers=self.headers
+            )
+        except requests.RequestException:
+            pass
+
     def generate(
         self,
         positive_prompt: str,
         negative_prompt: str,
-        output_path: str,
-        model: str = "stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b"
-    ) -> str:
-        """이미지 생성"""
-
-        # 모델 실행 요청
-        response = requests.post(
-            f"{self.base_url}/predictions",
-            headers=self.headers,
-            json={
-                "version": model.split(":")[1] if ":" in model else model,
-                "input": {
-                    "prompt": positive_prompt,
-                    "negative_prompt": negative_prompt,
-                    "width": 1024,
-                    "height": 1024,
-                    "num_inference_steps": 30,
-                    "guidance_scale": 7.0,
-                    "scheduler": "DPMSolver++",
-                }
+        output_path: Union[str, List[str]],
+        model: str = "stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b",
+        cancel: Optional[threading.Event] = None
+    ) -> List[str]:
+        """
+        이미지 생성 (경로 수만큼 num_outputs)
+
+        Prefer: wait로 최대 sync_wait초 동안 응답에서 바로 결과를 받고, 그 안에 끝나지 않으면
+        webhook(설정 시) 또는 폴링으로 완료를 기다린다.
+        """
+        paths = as_paths(output_path)
+        body = {
+            "version": model.split(":")[1] if ":" in model else model,
+            "input": {
+                "prompt": positive_prompt,
+                "negative_prompt": negative_prompt,
+                "width": 1024,
+                "height": 1024,
+                "num_inference_steps": 30,
+                "guidance_scale": 7.0,
+                "scheduler": "DPMSolver++",
+                "num_outputs": len(paths),
             }
-        )
-
-        if response.status_code != 201:
-            raise Exception(f"Failed to create prediction: {response.text}")
-
-        prediction = response.json()
-        prediction_id = prediction["id"]
-
-        # 완료 대기
-        while True:
-            response = requests.get(
+        }
+        headers = dict(self.headers)
+        if self.sync_wait:
+            headers["Prefer"] = f"wait={int(min(self.sync_wait, REPLICATE_MAX_SYNC_WAIT))}"
+        token = self.webhook.expect() if self.webhook is not None else None
+        if token:
+            body["webhook"] = self.webhook.url_for(token)
+            body["webhook_events_filter"] = ["completed"]
+
+        started = False
+
+        def track(prediction: Dict):
+            nonlocal started
+            if not started and prediction["status"] != "starting":
+                self.mark("queue_time")
+                started = True
+
+        def fetch() -> Dict:
+            return self.request(
+                "GET",
                 f"{self.base_url}/predictions/{prediction_id}",
                 headers=self.headers
+            ).json()
+
+        try:
+            # 모델 실행 요청
+            response = self.request(
+                "POST",
+                f"{self.base_url}/predictions",
+                headers=headers,
+                json=body,
+                timeout=(10, self.sync_wait + 30)
             )
-            prediction = response.json()
 
-            if prediction["status"] == "succeeded":
-                image_url = prediction["output"][0]
-                break
-            elif prediction["status"] == "failed":
-                raise Exception(f"Generation failed: {prediction.get('error')}")
+            if response.status_code not in (200, 201):
+                raise Exception(f"Failed to create prediction: {response.text}")
 
-            time.sleep(2)
+            prediction = response.json()
+            prediction_id = prediction["id"]
+            track(prediction)
+
+            # 완료 대기 (starting → processing → succeeded)
+            if prediction["status"] not in REPLICATE_TERMINAL:
+                try:
+                    prediction = self.poll_until(
+                        fetch, lambda p: p["status"] in REPLICATE_TERMINAL, cancel, token, track
+                    )
+                except (GenerationCancelled, GenerationTimeout):
+                    self.cancel_prediction(prediction_id)
+                    raise
+        finally:
+            if token:
+                self.webhook.discard(token)
+
+        if prediction["status"] != "succeeded":
+            raise Exception(f"Generation {prediction['status']}: {prediction.get('error')}")
+        self.mark("run_time")
+        image_urls = prediction["output"]
 
         # 이미지 다운로드
-        img_response = requests.get(image_url)
-        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "wb") as f:
-            f.write(img_response.content)
+        self.check_outputs(image_urls, paths)
+        self.download_outputs(image_urls, paths)
+        self.mark("download_time")
 
-        return output_path
+        return paths
 
 
 # =============================================================================
 # Together AI (SDXL)
 # =============================================================================
 
-class TogetherAI:
+class TogetherAI(CloudProvider):
     """
     Together AI API를 사용한 이미지 생성
 
@@ -138,23 +693,35 @@ class TogetherAI:
     환경변수: TOGETHER_API_KEY
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    name = "together"
+    rate_limit = 1.0
+    burst = 2
+    max_concurrency = 2
+    max_outputs = 4
+    unit_cost = 0.002
+    default_latency = 8.0
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        super().__init__()
         self.api_key = api_key or os.environ.get("TOGETHER_API_KEY")
         if not self.api_key:
             raise ValueError("TOGETHER_API_KEY 환경변수를 설정하세요")
 
-        self.base_url = "https://api.together.xyz/v1"
+        self.base_url = (base_url or TOGETHER_BASE_URL).rstrip("/")
 
     def generate(
         self,
         positive_prompt: str,
         negative_prompt: str,
-        output_path: str,
-        model: str = "stabilityai/stable-diffusion-xl-base-1.0"
-    ) -> str:
-        """이미지 생성"""
-
-        response = requests.post(
+        output_path: Union[str, List[str]],
+        model: str = "stabilityai/stable-diffusion-xl-base-1.0",
+        cancel: Optional[threading.Event] = None
+    ) -> List[str]:
+        """이미지 생성 (경로 수만큼 n)"""
+        paths = as_paths(output_path)
+
+        response = self.request(
+            "POST",
             f"{self.base_url}/images/generations",
             headers={
                 "Authorization": f"Bearer {self.api_key}",
@@ -167,30 +734,31 @@ class TogetherAI:
                 "width": 1024,
                 "height": 1024,
                 "steps": 30,
-                "n": 1,
+                "n": len(paths),
                 "response_format": "b64_json"
             }
         )
 
         if response.status_code != 200:
             raise Exception(f"Generation failed: {response.text}")
+        self.mark("run_time")
 
-        result = response.json()
-        image_b64 = result["data"][0]["b64_json"]
+        images_b64 = [item["b64_json"] for item in response.json()["data"]]
+        del response
 
         # 이미지 저장
-        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "wb") as f:
-            f.write(base64.b64decode(image_b64))
+        self.check_outputs(images_b64, paths)
+        self.decode_outputs(images_b64, paths)
+        self.mark("download_time")
 
-        return output_path
+        return paths
 
 
 # =============================================================================
 # Stability AI
 # =============================================================================
 
-class StabilityAI:
+class StabilityAI(CloudProvider):
     """
     Stability AI API를 사용한 이미지 생성
 
@@ -198,23 +766,35 @@ class StabilityAI:
     환경변수: STABILITY_API_KEY
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    name = "stability"
+    rate_limit = 10.0
+    burst = 10
+    max_concurrency = 4
+    max_outputs = 10
+    unit_cost = 0.004
+    default_latency = 10.0
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        super().__init__()
         self.api_key = api_key or os.environ.get("STABILITY_API_KEY")
         if not self.api_key:
             raise ValueError("STABILITY_API_KEY 환경변수를 설정하세요")
 
-        self.base_url = "https://api.stability.ai/v1"
+        self.base_url = (base_url or STABILITY_BASE_URL).rstrip("/")
 
     def generate(
         self,
         positive_prompt: str,
         negative_prompt: str,
-        output_path: str,
-        engine: str = "stable-diffusion-xl-1024-v1-0"
-    ) -> str:
-        """이미지 생성"""
-
-        response = requests.post(
+        output_path: Union[str, List[str]],
+        engine: str = "stable-diffusion-xl-1024-v1-0",
+        cancel: Optional[threading.Event] = None
+    ) -> List[str]:
+        """이미지 생성 (경로 수만큼 samples)"""
+        paths = as_paths(output_path)
+
+        response = self.request(
+            "POST",
             f"{self.base_url}/generation/{engine}/text-to-image",
             headers={
                 "Authorization": f"Bearer {self.api_key}",
@@ -229,38 +809,59 @@ class StabilityAI:
                 "cfg_scale": 7,
                 "width": 1024,
                 "height": 1024,
-                "samples": 1,
+                "samples": len(paths),
                 "steps": 30
             }
         )
 
         if response.status_code != 200:
             raise Exception(f"Generation failed: {response.text}")
+        self.mark("run_time")
 
-        result = response.json()
-        image_b64 = result["artifacts"][0]["base64"]
+        images_b64 = [item["base64"] for item in response.json()["artifacts"]]
+        del response
 
         # 이미지 저장
-        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "wb") as f:
-            f.write(base64.b64decode(image_b64))
+        self.check_outputs(images_b64, paths)
+        self.decode_outputs(images_b64, paths)
+        self.mark("download_time")
 
-        return output_path
+        return paths
 
 
 # =============================================================================
 # RunPod (ComfyUI Serverless)
 # =============================================================================
 
-class RunPodAPI:
+class RunPodAPI(CloudProvider):
     """
     RunPod Serverless API를 사용한 ComfyUI 실행
 
     API Key: https://www.runpod.io/console/serverless
     환경변수: RUNPOD_API_KEY
+
+    엔드포인트가 ComfyUI 워커라 batch_generate 작업의 워크플로우(img2img, hires, rembg 포함)를
+    그대로 실행한다 (워크플로우의 체크포인트/커스텀 노드가 워커 이미지에 있어야 함).
     """
 
-    def __init__(self, api_key: Optional[str] = None, endpoint_id: Optional[str] = None):
+    name = "runpod"
+    capabilities = frozenset({CAP_WORKFLOW, CAP_TXT2IMG, CAP_CANCEL})
+    rate_limit = 10.0
+    burst = 10
+    max_concurrency = 4   # 엔드포인트 max workers에 맞춤
+    max_outputs = 8
+    sync_wait = 90        # /runsync (서버 측 대기 ~90초, 여기서는 읽기 타임아웃)
+    unit_cost = 0.003
+    default_latency = 30.0
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        endpoint_id: Optional[str] = None,
+        base_url: Optional[str] = None
+    ):
+        """base_url: API 루트 (엔드포인트 ID는 뒤에 붙음)"""
+        super().__init__()
         self.api_key = api_key or os.environ.get("RUNPOD_API_KEY")
         self.endpoint_id = endpoint_id or os.environ.get("RUNPOD_ENDPOINT_ID")
 
@@ -269,18 +870,22 @@ class RunPodAPI:
         if not self.endpoint_id:
             raise ValueError("RUNPOD_ENDPOINT_ID 환경변수를 설정하세요")
 
-        self.base_url = f"https://api.runpod.ai/v2/{self.endpoint_id}"
+        self.base_url = f"{(base_url or RUNPOD_BASE_URL).rstrip('/')}/{self.endpoint_id}"
 
-    def generate(
-        self,
-        positive_prompt: str,
-        negative_prompt: str,
-        output_path: str
-    ) -> str:
-        """이미지 생성 (ComfyUI 워크플로우 사용)"""
+    def cancel_job(self, job_id: str):
+        """진행 중인 작업 취소 (실패해도 무시)"""
+        try:
+            self.request(
+                "POST",
+                f"{self.base_url}/cancel/{job_id}",
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+        except requests.RequestException:
+            pass
 
-        # ComfyUI 워크플로우 구성
-        workflow = {
+    def build_workflow(self, positive: str, negative: str, batch_size: int = 1) -> Dict:
+        """프롬프트 텍스트만 받았을 때 쓰는 기본 txt2img 워크플로우"""
+        return {
             "3": {
                 "inputs": {
                     "seed": -1,
@@ -303,15 +908,15 @@ class RunPodAPI:
                 "class_type": "CheckpointLoaderSimple"
             },
             "5": {
-                "inputs": {"width": 1024, "height": 1024, "batch_size": 1},
+                "inputs": {"width": 1024, "height": 1024, "batch_size": batch_size},
                 "class_type": "EmptyLatentImage"
             },
             "6": {
-                "inputs": {"text": positive_prompt, "clip": ["4", 1]},
+                "inputs": {"text": positive, "clip": ["4", 1]},
                 "class_type": "CLIPTextEncode"
             },
             "7": {
-                "inputs": {"text": negative_prompt, "clip": ["4", 1]},
+                "inputs": {"text": negative, "clip": ["4", 1]},
                 "class_type": "CLIPTextEncode"
             },
             "8": {
@@ -324,45 +929,268 @@ class RunPodAPI:
             }
         }
 
-        # RunPod 실행 요청
-        response = requests.post(
-            f"{self.base_url}/run",
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            },
-            json={"input": {"workflow": workflow}}
+    def generate_job(self, job: Dict, paths: List[str], cancel: threading.Event) -> List[str]:
+        """작업의 ComfyUI 워크플로우를 그대로 실행"""
+        positive, negative = job.get("texts", ("", ""))
+        return self.run(positive, negative, paths, cancel, workflow=job["prompt"], names=job["images"])
+
+    @staticmethod
+    def output_sources(images: List, names: Optional[List[str]] = None) -> List[str]:
+        """
+        output.images → 저장 순서의 URL/data URI
+
+        worker-comfyui의 {"filename", "type", "data"} 형식이면 names 순서로
+        파일명(<name>_00001_.png)을 맞춘다.
+        """
+        sources, filenames = [], []
+        for image in images:
+            if isinstance(image, str):
+                sources.append(image)
+                filenames.append(None)
+                continue
+            data = image.get("data") or image.get("url", "")
+            if image.get("type") == "base64" and not data.startswith("data:"):
+                data = f"data:image/png;base64,{data}"
+            sources.append(data)
+            filenames.append(image.get("filename"))
+
+        if not names or not all(filenames):
+            return sources
+        matched = match_outputs(names, filenames)
+        if matched is None:
+            raise Exception(f"Outputs do not match job images: {filenames}")
+        by_name = dict(zip(filenames, sources))
+        return [by_name[filename] for filename in matched]
+
+    def generate(
+        self,
+        positive_prompt: str,
+        negative_prompt: str,
+        output_path: Union[str, List[str]],
+        cancel: Optional[threading.Event] = None,
+        workflow: Optional[Dict] = None,
+        names: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        이미지 생성 (ComfyUI 워크플로우 사용, 경로 수만큼 batch_size)
+
+        workflow가 있으면 프롬프트 대신 그 워크플로우를 실행하고 출력은 names 순서로 저장한다.
+        """
+        paths = as_paths(output_path)
+        if workflow is None:
+            workflow = self.build_workflow(positive_prompt, negative_prompt, len(paths))
+
+        # RunPod 실행 요청: webhook 설정 시 /run + webhook, 아니면 /runsync (sync_wait=0이면 /run)
+        body = {"input": {"workflow": workflow}}
+        token = self.webhook.expect() if self.webhook is not None else None
+        if token:
+            body["webhook"] = self.webhook.url_for(token)
+        endpoint = "runsync" if self.sync_wait and not token else "run"
+        auth = {"Authorization": f"Bearer {self.api_key}"}
+
+        started = False
+
+        def track(status: Dict):
+            nonlocal started
+            if not started and status["status"] != "IN_QUEUE":
+                self.mark("queue_time")
+                started = True
+
+        def fetch() -> Dict:
+            return self.request("GET", f"{self.base_url}/status/{job_id}", headers=auth).json()
+
+        try:
+            response = self.request(
+                "POST",
+                f"{self.base_url}/{endpoint}",
+                headers=dict(auth, **{"Content-Type": "application/json"}),
+                json=body,
+                timeout=(10, self.sync_wait + 30)
+            )
+
+            if response.status_code != 200:
+                raise Exception(f"Failed to start job: {response.text}")
+
+            status = response.json()
+            job_id = status["id"]
+            track(status)
+
+            # 완료 대기 (IN_QUEUE → IN_PROGRESS → COMPLETED)
+            if status["status"] not in RUNPOD_TERMINAL:
+                try:
+                    status = self.poll_until(
+                        fetch, lambda st: st["status"] in RUNPOD_TERMINAL, cancel, token, track
+                    )
+                except (GenerationCancelled, GenerationTimeout):
+                    self.cancel_job(job_id)
+                    raise
+        finally:
+            if token:
+                self.webhook.discard(token)
+
+        if status["status"] != "COMPLETED":
+            raise Exception(f"Job {status['status']}: {status.get('error')}")
+        self.mark("run_time")
+        # 결과 이미지 URL 가져오기
+        image_urls = self.output_sources(status["output"]["images"], names)
+
+        # 이미지 다운로드
+        self.check_outputs(image_urls, paths)
+        self.download_outputs(image_urls, paths)
+        self.mark("download_time")
+
+        return paths
+
+
+# =============================================================================
+# Mock (로컬 테스트)
+# =============================================================================
+
+# 1x1 투명 PNG
+PLACEHOLDER_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+class MockProvider(CloudProvider):
+    """
+    네트워크 없이 지연/실패만 흉내 내는 서비스 (라우터/자동 선택 테스트용)
+
+    queue_time, run_time 동안 대기한 뒤 failure_rate 확률로 실패하고,
+    성공하면 1x1 PNG를 저장한다.
+    """
+
+    def __init__(
+        self,
+        name: str = "mock",
+        queue_time: float = 0.0,
+        run_time: float = 1.0,
+        failure_rate: float = 0.0,
+        unit_cost: float = 0.0,
+        max_concurrency: int = 4,
+        max_outputs: int = 4
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_outputs = max_outputs
+        self.rate_limit = self.burst = max_concurrency * 10
+        self.unit_cost = unit_cost
+        self.default_latency = queue_time + run_time
+        self.queue_time = queue_time
+        self.run_time = run_time
+        self.failure_rate = failure_rate
+        self.random = random.Random(name)
+        super().__init__()
+
+    def generate(
+        self,
+        positive_prompt: str,
+        negative_prompt: str,
+        output_path: Union[str, List[str]],
+        cancel: Optional[threading.Event] = None
+    ) -> List[str]:
+        paths = as_paths(output_path)
+        self.wait(self.queue_time, cancel)
+        self.mark("queue_time")
+        self.wait(self.run_time, cancel)
+        self.mark("run_time")
+        if self.random.random() < self.failure_rate:
+            raise Exception(f"{self.name}: simulated failure")
+
+        for path in paths:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(PLACEHOLDER_PNG)
+        self.mark("download_time")
+        return paths
+
+
+# =============================================================================
+# Batch
+# =============================================================================
+
+PROVIDERS = {
+    "replicate": ReplicateAPI,
+    "together": TogetherAI,
+    "stability": StabilityAI,
+    "runpod": RunPodAPI,
+}
+
+
+def parse_mock_providers(spec: str) -> Dict[str, MockProvider]:
+    """
+    "name=run_time[:unit_cost[:failure_rate]],..." → 이름별 MockProvider
+
+    실제 서비스와 같은 이름은 쓸 수 없다 (자동 선택/라우터 테스트에서 API 키 없이 섞어 쓰기 위한 것).
+    """
+    providers = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, sep, values = item.partition("=")
+        name = name.strip()
+        try:
+            numbers = [float(v) for v in values.split(":")] if sep else []
+        except ValueError:
+            numbers = []
+        if not name or not 1 <= len(numbers) <= 3:
+            raise ValueError(f"Invalid mock provider: {item} (name=run_time[:unit_cost[:failure_rate]])")
+        if name in PROVIDERS:
+            raise ValueError(f"Mock provider name is a real service: {name}")
+        run_time, unit_cost, failure_rate = numbers + [0.0, 0.0][len(numbers) - 1:]
+        providers[name] = MockProvider(
+            name, run_time=run_time, unit_cost=unit_cost, failure_rate=failure_rate
         )
+    return providers
 
-        if response.status_code != 200:
-            raise Exception(f"Failed to start job: {response.text}")
 
-        job_id = response.json()["id"]
+def output_path_for(output_dir: str, character_name: str, expression: str) -> str:
+    return f"{output_dir}/{character_name}/full/{character_name}_{expression}.png"
 
-        # 완료 대기
-        while True:
-            status_response = requests.get(
-                f"{self.base_url}/status/{job_id}",
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            )
-            status = status_response.json()
 
-            if status["status"] == "COMPLETED":
-                # 결과 이미지 URL 가져오기
-                image_url = status["output"]["images"][0]
-                break
-            elif status["status"] == "FAILED":
-                raise Exception(f"Job failed: {status.get('error')}")
+def split_outputs(jobs: List[Dict], max_outputs: int) -> List[Dict]:
+    """출력 경로가 요청당 최대 이미지 수보다 많은 작업을 나눔 (이름 번호는 유지)"""
+    split = []
+    for job in jobs:
+        paths = as_paths(job["output"])
+        for i in range(0, len(paths), max_outputs):
+            split.append(dict(job, output=paths[i:i + max_outputs]))
+    return split
 
-            time.sleep(3)
 
-        # 이미지 다운로드
-        img_response = requests.get(image_url)
-        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "wb") as f:
-            f.write(img_response.content)
+def run_job(api: CloudProvider, job: Dict) -> Dict:
+    """작업 하나 실행 (예외는 결과 dict로 변환)"""
+    result = dict(job, status="success", error=None)
+    start = time.time()
+    try:
+        api.run(job["positive"], job["negative"], job["output"])
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["elapsed"] = time.time() - start
+    return result
+
 
-        return output_path
+def generate_batch(api: CloudProvider, jobs: List[Dict]) -> List[Dict]:
+    """
+    여러 작업을 동시에 실행
+
+    스레드 수는 동시 실행 상한과 같고, 실제 요청 속도는 서비스의 토큰 버킷이 맞춘다.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=api.max_concurrency) as executor:
+        futures = [executor.submit(run_job, api, job) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            label = f"{result['character']}/{result['expression']}"
+            if result["status"] == "success":
+                outputs = as_paths(result["output"])
+                target = outputs[0] if len(outputs) == 1 else f"{len(outputs)} images"
+                print(f"  ✓ {label} ({result['elapsed']:.1f}s) → {target}")
+            else:
+                print(f"  ✗ {label}: {result['error']}")
+    return results
 
 
 # =============================================================================
@@ -374,72 +1202,248 @@ def main():
 
     parser.add_argument(
         "--service", "-s",
-        choices=["replicate", "together", "stability", "runpod"],
         default="replicate",
-        help="사용할 클라우드 서비스"
+        help=f"사용할 클라우드 서비스 (콤마 구분 시 순서대로 hedge/failover, "
+             f"auto: 기록 기반 자동 선택): {', '.join(PROVIDERS)}"
+    )
+    parser.add_argument(
+        "--optimize",
+        choices=OBJECTIVES,
+        default="time",
+        help="--service auto 선택 기준 (기본: time)"
+    )
+    parser.add_argument(
+        "--unit-cost",
+        help="이미지당 비용 설정 (예: replicate=0.0045,stability=0.004)"
+    )
+    parser.add_argument(
+        "--mock-providers",
+        help="로컬 모의 서비스 추가 (예: fast=1:0.01,cheap=4:0.001:0.1 → 이름=요청 시간[:이미지당 비용[:실패율]], "
+             "-s와 auto 선택 대상에 포함)"
+    )
+    parser.add_argument(
+        "--base-url",
+        help="서비스별 API 주소 (예: replicate=http://localhost:8199/v1,runpod=http://localhost:8199/v2, "
+             "로컬 대역 서버 mock_cloud.py용)"
     )
     parser.add_argument(
         "--character", "-c",
-        required=True,
-        help="캐릭터 이름"
+        help="캐릭터 이름 (콤마 구분)"
+    )
+    parser.add_argument(
+        "--all", "-a",
+        action="store_true",
+        help="모든 캐릭터 생성"
     )
     parser.add_argument(
-        "--expression", "-e",
+        "--expression",
         default="idle",
         help="표정 (기본: idle)"
     )
+    parser.add_argument(
+        "--expressions", "-e",
+        help="표정 목록 (콤마 구분, 지정 시 --expression 대신 사용)"
+    )
+    parser.add_argument(
+        "--variants", "-n",
+        type=int,
+        default=1,
+        help="표정당 후보 수 (요청 하나의 다중 출력으로 생성, <char>_<expr>_v{i} 저장)"
+    )
     parser.add_argument(
         "--output", "-o",
         default="D:/AI/SpineAtlas/characters",
         help="출력 디렉토리"
     )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="초당 API 요청 수 (기본: 서비스별 값)"
+    )
+    parser.add_argument(
+        "--concurrency", "-j",
+        type=int,
+        help="동시 생성 수 (기본: 서비스별 값)"
+    )
+    parser.add_argument(
+        "--no-hedge",
+        action="store_true",
+        help="여러 서비스 지정 시 hedge 없이 실패할 때만 failover"
+    )
+    parser.add_argument(
+        "--sync-wait",
+        type=float,
+        help="동기 대기 초 (Replicate Prefer: wait / RunPod /runsync, 0이면 바로 폴링)"
+    )
+    parser.add_argument(
+        "--webhook-url",
+        help="완료 webhook을 받을 외부 주소 (로컬 --webhook-port로 전달돼야 함, Replicate/RunPod)"
+    )
+    parser.add_argument(
+        "--webhook-port",
+        type=int,
+        default=8765,
+        help="webhook 수신 포트 (기본: 8765)"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=GENERATION_TIMEOUT,
+        help=f"요청당 최대 대기 초 (기본: {GENERATION_TIMEOUT:.0f})"
+    )
 
     args = parser.parse_args()
 
     # 프롬프트 로드
     prompts = load_prompts()
 
-    if args.character not in prompts["characters"]:
-        print(f"Error: Unknown character '{args.character}'")
-        print(f"Available: {', '.join(prompts['characters'].keys())}")
+    if args.all:
+        char_list = list(prompts["characters"].keys())
+    elif args.character:
+        char_list = [c.strip() for c in args.character.split(",")]
+    else:
+        print("Error: --character 또는 --all을 지정하세요")
         return
 
-    # 프롬프트 구성
-    positive, negative = build_prompt(args.character, args.expression, prompts)
-
-    # 출력 경로
-    output_path = f"{args.output}/{args.character}/full/{args.character}_{args.expression}.png"
+    unknown = [c for c in char_list if c not in prompts["characters"]]
+    if unknown:
+        print(f"Error: Unknown character '{', '.join(unknown)}'")
+        print(f"Available: {', '.join(prompts['characters'].keys())}")
+        return
 
-    print(f"Service: {args.service}")
-    print(f"Character: {args.character}")
-    print(f"Expression: {args.expression}")
-    print(f"Output: {output_path}")
-    print()
+    if args.expressions:
+        expressions = [e.strip() for e in args.expressions.split(",")]
+    else:
+        expressions = [args.expression]
+
+    # 작업 구성
+    jobs = []
+    for character_name in char_list:
+        for expression in expressions:
+            positive, negative = build_prompt_texts(character_name, expression, prompts)
+            jobs.append({
+                "character": character_name,
+                "expression": expression,
+                "positive": positive,
+                "negative": negative,
+                "output": variant_paths(
+                    output_path_for(args.output, character_name, expression), args.variants
+                ),
+            })
+    total_images = len(jobs) * max(1, args.variants)
 
-    # API 초기화 및 생성
     try:
-        if args.service == "replicate":
-            api = ReplicateAPI()
-        elif args.service == "together":
-            api = TogetherAI()
-        elif args.service == "stability":
-            api = StabilityAI()
-        elif args.service == "runpod":
-            api = RunPodAPI()
-
-        print("Generating...")
-        result_path = api.generate(positive, negative, output_path)
-        print(f"✓ Saved to: {result_path}")
-
+        mock_providers = parse_mock_providers(args.mock_providers or "")
     except ValueError as e:
         print(f"Error: {e}")
+        return
+    available = list(PROVIDERS) + list(mock_providers)
+
+    auto = args.service == "auto"
+    services = available if auto else [name.strip() for name in args.service.split(",")]
+    unknown = [name for name in services if name not in available]
+    if unknown:
+        print(f"Error: Unknown service '{', '.join(unknown)}'")
+        print(f"Available: {', '.join(available)}, auto")
+        return
+
+    unit_costs = {}
+    if args.unit_cost:
+        for item in args.unit_cost.split(","):
+            name, _, value = item.partition("=")
+            unit_costs[name.strip()] = float(value)
+    base_urls = {}
+    if args.base_url:
+        for item in args.base_url.split(","):
+            name, _, value = item.partition("=")
+            base_urls[name.strip()] = value.strip()
+
+    webhook = None
+    if args.webhook_url:
+        from cloud_webhook import WebhookReceiver
+        webhook = WebhookReceiver(args.webhook_url, args.webhook_port).start()
+
+    # API 초기화 (여러 서비스면 키가 없는 서비스는 건너뜀)
+    stats_store = ProviderStatsStore(Path(args.output) / STATS_FILENAME)
+    providers = []
+    for name in services:
+        try:
+            provider = (mock_providers[name] if name in mock_providers
+                        else PROVIDERS[name](base_url=base_urls.get(name)))
+        except ValueError as e:
+            if not auto:
+                print(f"Error: {e}")
+            continue
+        provider.configure_limits(args.rate, args.concurrency)
+        provider.unit_cost = unit_costs.get(name, provider.unit_cost)
+        provider.stats_store = stats_store
+        provider.webhook = webhook
+        provider.generation_timeout = args.timeout
+        if args.sync_wait is not None:
+            provider.sync_wait = args.sync_wait
+        providers.append(provider)
+
+    if providers and auto:
+        chosen, estimates = choose_provider(
+            providers, stats_store, total_images, args.optimize, images_per_request=args.variants
+        )
+        print(f"Auto select ({args.optimize}, {total_images} images):")
+        print_estimates(estimates)
+        print()
+        providers = [chosen]
+
+    if not providers:
         print("\nAPI Key 설정 방법:")
         print("  Windows: set REPLICATE_API_TOKEN=your_token")
         print("  PowerShell: $env:REPLICATE_API_TOKEN='your_token'")
         print("  Linux/Mac: export REPLICATE_API_TOKEN=your_token")
+        return
 
-    except Exception as e:
-        print(f"Error: {e}")
+    if len(providers) == 1:
+        api = providers[0]
+    else:
+        from cloud_router import ProviderRouter
+        api = ProviderRouter(providers, hedge=not args.no_hedge)
+        # 이전 실행 기록으로 p90 초기화
+        for provider in providers:
+            for seconds in stats_store.recent_totals(provider.name):
+                api.latency[provider.name].add(seconds)
+
+    jobs = split_outputs(jobs, api.max_outputs)
+
+    print(f"Service: {', '.join(p.name for p in providers)}")
+    print(f"Characters: {', '.join(char_list)}")
+    print(f"Expressions: {', '.join(expressions)}")
+    print(f"Jobs: {len(jobs)} requests, {total_images} images (concurrency {api.max_concurrency})")
+    for provider in providers:
+        print(f"  {provider.name}: rate {provider.rate_limit:g}/s, concurrency {provider.max_concurrency}")
+    if webhook is not None:
+        print(f"Webhook: {args.webhook_url} → :{webhook.port}")
+    print(f"Output: {args.output}")
+    print()
+
+    print("Generating...")
+    start = time.time()
+    results = generate_batch(api, jobs)
+    elapsed = time.time() - start
+
+    success = sum(len(as_paths(r["output"])) for r in results if r["status"] == "success")
+    print()
+    print("=" * 60)
+    print(f"Completed: {success}/{total_images} images in {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Throughput: {success / elapsed * 60:.1f} images/min")
+
+    if len(providers) > 1:
+        print("Providers:")
+        for name, stats in api.provider_stats().items():
+            p90 = f"{stats['p90']:.1f}s" if stats["p90"] is not None else "-"
+            print(f"  {name}: won {stats['won']}, failed {stats['failed']}, "
+                  f"hedged {stats['hedged']}, cancelled {stats['cancelled']}, p90 {p90}")
+        api.close()
+
+    if webhook is not None:
+        webhook.stop()
 
 
 if __name__ == "__main__":
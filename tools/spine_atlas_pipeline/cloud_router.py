@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Cloud Provider Router
+=====================
+여러 클라우드 서비스에 걸친 hedged request + 자동 failover
+
+- 작업은 1순위 서비스로 보내고, 그 서비스의 관측 p90 생성 시간을 넘기면
+  다음 서비스에 같은 작업을 한 번 더 제출 (hedge)
+- 먼저 성공한 결과를 채택하고 나머지는 취소
+  (Replicate/RunPod은 취소 API 호출, Together/Stability는 결과 폐기)
+- 실패하면 다음 서비스로 즉시 failover, 연속 실패가 쌓인 서비스는 잠시 순서에서 제외
+
+각 시도는 출력 폴더의 .<service>.part/ 아래에 같은 이름으로 쓰고,
+채택된 시도의 파일만 출력 경로로 rename한다 (폴더를 감시하는 다음 단계는 완성본만 본다).
+그 폴더를 쓰는 시도가 모두 끝나면 빈 .<service>.part/ 폴더도 지운다.
+
+Usage:
+    python cloud_api_alternatives.py -s replicate,stability,together --all -e idle,happy
+"""
+
+import os
+import time
+import threading
+from pathlib import Path
+from collections import deque
+from typing import Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from cloud_api_alternatives import CloudProvider, GenerationCancelled, as_paths
+
+# hedge 기준 지연 (최근 LATENCY_WINDOW개 성공 중 p90, 샘플이 적으면 기본값)
+LATENCY_WINDOW = 50
+MIN_LATENCY_SAMPLES = 5
+HEDGE_PERCENTILE = 0.9
+DEFAULT_HEDGE_DELAY = 60.0
+
+# 연속 실패 시 일시 제외
+MAX_CONSECUTIVE_FAILURES = 3
+FAILURE_COOLDOWN = 120.0
+
+
+class LatencyTracker:
+    """서비스별 최근 생성 시간"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q 분위 생성 시간 (샘플이 부족하면 None)"""
+        with self.lock:
+            samples = sorted(self.samples)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(q * len(samples)))
+        return samples[index]
+
+
+class ProviderRouter:
+    """CloudProvider 목록 위의 hedging + failover 라우터 (CloudProvider처럼 run() 제공)"""
+
+    name = "router"
+
+    def __init__(
+        self,
+        providers: List[CloudProvider],
+        hedge: bool = True,
+        hedge_delay: float = DEFAULT_HEDGE_DELAY,
+        max_failures: int = MAX_CONSECUTIVE_FAILURES,
+        cooldown: float = FAILURE_COOLDOWN
+    ):
+        if not providers:
+            raise ValueError("사용할 클라우드 서비스가 없습니다")
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+
+        # 배치 스레드 수 = 모든 서비스 동시 실행 수 합 (hedge 중복 시도는 별도 풀)
+        # 요청당 이미지 수는 어느 서비스로 가도 되도록 가장 작은 값
+        self.max_concurrency = sum(p.max_concurrency for p in self.providers)
+        self.max_outputs = min(p.max_outputs for p in self.providers)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency * 2)
+
+        self.lock = threading.Lock()
+        self.latency = {p.name: LatencyTracker() for p in self.providers}
+        self.failures = {p.name: 0 for p in self.providers}
+        self.down_until = {p.name: 0.0 for p in self.providers}
+        self.counts = {
+            p.name: {"won": 0, "failed": 0, "hedged": 0, "cancelled": 0}
+            for p in self.providers
+        }
+        self.part_dirs = {}   # .<service>.part 폴더 -> 아직 정리되지 않은 시도 수
+
+    def hedge_delay_for(self, provider: CloudProvider) -> float:
+        p90 = self.latency[provider.name].percentile(HEDGE_PERCENTILE)
+        return p90 if p90 is not None else self.hedge_delay
+
+    def available(self) -> List[CloudProvider]:
+        """일시 제외되지 않은 서비스 (모두 제외됐으면 전체)"""
+        now = time.time()
+        with self.lock:
+            providers = [p for p in self.providers if now >= self.down_until[p.name]]
+        return providers or list(self.providers)
+
+    def _count(self, provider: CloudProvider, field: str):
+        with self.lock:
+            self.counts[provider.name][field] += 1
+
+    def _record_success(self, provider: CloudProvider, elapsed: float):
+        self.latency[provider.name].add(elapsed)
+        with self.lock:
+            self.failures[provider.name] = 0
+            self.counts[provider.name]["won"] += 1
+
+    def _record_failure(self, provider: CloudProvider):
+        with self.lock:
+            self.failures[provider.name] += 1
+            self.counts[provider.name]["failed"] += 1
+            if self.failures[provider.name] >= self.max_failures:
+                self.failures[provider.name] = 0
+                if time.time() >= self.down_until[provider.name]:
+                    print(f"  ⚠ {provider.name}: 연속 실패, {self.cooldown:.0f}s 동안 제외")
+                self.down_until[provider.name] = time.time() + self.cooldown
+
+    def _part_paths(self, provider: CloudProvider, paths: List[str]) -> List[str]:
+        """시도 하나의 임시 경로 (_release로 돌려줄 때까지 그 폴더를 지우지 않는다)"""
+        part_paths = [str(Path(path).parent / f".{provider.name}.part" / Path(path).name) for path in paths]
+        with self.lock:
+            for part_dir in {str(Path(p).parent) for p in part_paths}:
+                self.part_dirs[part_dir] = self.part_dirs.get(part_dir, 0) + 1
+        return part_paths
+
+    def _release(self, part_paths: List[str]):
+        """시도가 끝남: 그 폴더를 쓰는 시도가 더 없으면 빈 .<service>.part 폴더 삭제"""
+        with self.lock:
+            for part_dir in {str(Path(p).parent) for p in part_paths}:
+                self.part_dirs[part_dir] -= 1
+                if self.part_dirs[part_dir]:
+                    continue
+                del self.part_dirs[part_dir]
+                try:
+                    os.rmdir(part_dir)
+                except OSError:
+                    pass   # 시도가 파일을 만들기 전에 실패했거나, 다른 프로그램이 남긴 파일이 있음
+
+    def _discard(self, part_paths: List[str]):
+        for part_path in part_paths:
+            try:
+                Path(part_path).unlink()
+            except FileNotFoundError:
+                pass
+        self._release(part_paths)
+
+    def _discard_loser(self, future, provider: CloudProvider, part_paths: List[str]):
+        """채택되지 않은 시도가 끝나면 임시 파일 삭제"""
+        if future.cancelled() or isinstance(future.exception(), GenerationCancelled):
+            self._count(provider, "cancelled")
+        self._discard(part_paths)
+
+    def run(
+        self,
+        positive_prompt: str,
+        negative_prompt: str,
+        output_path: Union[str, List[str]]
+    ) -> List[str]:
+        """첫 성공 결과를 출력 경로(들)에 저장 (모든 서비스가 실패하면 예외)"""
+        paths = as_paths(output_path)
+        candidates = self.available()
+        cancel = threading.Event()
+        pending = {}   # future -> (provider, part_paths, start)
+        errors = []
+        next_index = 0
+        hedged = False
+
+        def launch() -> CloudProvider:
+            nonlocal next_index
+            provider = candidates[next_index]
+            next_index += 1
+            part_paths = self._part_paths(provider, paths)
+            future = self.executor.submit(
+                provider.run, positive_prompt, negative_prompt, part_paths, cancel
+            )
+            pending[future] = (provider, part_paths, time.time())
+            return provider
+
+        launch()
+        try:
+            while pending:
+                # 시도가 하나뿐이고 아직 hedge 전이면 그 서비스의 p90까지만 대기
+                timeout = None
+                if self.hedge and not hedged and len(pending) == 1 and next_index < len(candidates):
+                    provider, _, start = next(iter(pending.values()))
+                    timeout = max(0.0, start + self.hedge_delay_for(provider) - time.time())
+
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    self._count(launch(), "hedged")
+                    hedged = True
+                    continue
+
+                for future in done:
+                    provider, part_paths, start = pending.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self._record_failure(provider)
+                        self._discard(part_paths)
+                        errors.append(f"{provider.name}: {e}")
+                        # 남은 시도가 없으면 다음 서비스로 failover
+                        if not pending and next_index < len(candidates):
+                            launch()
+                        continue
+
+                    self._record_success(provider, time.time() - start)
+                    try:
+                        for part_path, path in zip(part_paths, paths):
+                            os.replace(part_path, path)
+                    finally:
+                        self._release(part_paths)
+                    return paths
+        finally:
+            cancel.set()
+            for future, (provider, part_paths, _) in pending.items():
+                future.add_done_callback(
+                    lambda f, provider=provider, part_paths=part_paths:
+                        self._discard_loser(f, provider, part_paths)
+                )
+
+        raise Exception(f"All providers failed: {'; '.join(errors)}")
+
+    def provider_stats(self) -> Dict[str, Dict]:
+        """서비스별 채택/실패/hedge/취소 횟수 + p90"""
+        with self.lock:
+            stats = {name: dict(counts) for name, counts in self.counts.items()}
+        for name, tracker in self.latency.items():
+            stats[name]["p90"] = tracker.percentile(HEDGE_PERCENTILE)
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Cloud Webhook Receiver
+======================
+클라우드 서비스 완료 알림(webhook)을 받는 로컬 HTTP 서버
+
+Replicate(webhook + webhook_events_filter=["completed"])와 RunPod(/run의 "webhook")은
+작업이 끝나면 결과 JSON을 지정한 URL로 POST한다. 요청마다 토큰을 발급해 URL 경로
+(/webhook/<token>)에 넣고, 그 토큰으로 POST가 오면 기다리던 생성 스레드를 바로 깨운다.
+webhook이 오지 않는 경우를 위해 provider는 긴 간격의 폴링을 계속한다.
+
+클라우드에서 이 서버에 닿아야 하므로 포트 포워딩/터널 등 외부 주소를 public_url로 준다.
+
+Usage:
+    python cloud_api_alternatives.py -s replicate --all --webhook-url https://my-tunnel.example.com
+    python cloud_webhook.py --port 8765   # 수신 확인용으로 단독 실행 (받은 내용 출력)
+"""
+
+import json
+import uuid
+import argparse
+import threading
+from typing import Dict, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_WEBHOOK_PORT = 8765
+WEBHOOK_PATH = "/webhook/"
+MAX_PAYLOAD_BYTES = 16 * 1024 * 1024
+
+
+class WebhookReceiver:
+    """토큰별 webhook 수신 대기"""
+
+    def __init__(
+        self,
+        public_url: str,
+        port: int = DEFAULT_WEBHOOK_PORT,
+        bind: str = "0.0.0.0"
+    ):
+        self.public_url = public_url.rstrip("/")
+        self.lock = threading.Lock()
+        self.events = {}     # token -> threading.Event
+        self.payloads = {}   # token -> 마지막으로 받은 JSON
+        self.server = ThreadingHTTPServer((bind, port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_port
+        self.thread = None
+
+    def _handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, code: int):
+                self.send_response(code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                if not self.path.startswith(WEBHOOK_PATH):
+                    return self._reply(404)
+                token = self.path[len(WEBHOOK_PATH):].split("?", 1)[0].strip("/")
+
+                length = int(self.headers.get("Content-Length", 0))
+                if length > MAX_PAYLOAD_BYTES:
+                    return self._reply(413)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    return self._reply(400)
+
+                self._reply(200 if receiver.deliver(token, payload) else 404)
+
+        return Handler
+
+    def start(self) -> "WebhookReceiver":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def expect(self) -> str:
+        """새 토큰 발급 (요청에 넣을 URL은 url_for(token))"""
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.events[token] = threading.Event()
+        return token
+
+    def url_for(self, token: str) -> str:
+        return f"{self.public_url}{WEBHOOK_PATH}{token}"
+
+    def deliver(self, token: str, payload: Dict) -> bool:
+        """수신한 payload 저장 후 대기 중인 스레드 깨움 (모르는 토큰이면 False)"""
+        with self.lock:
+            event = self.events.get(token)
+            if event is None:
+                return False
+            self.payloads[token] = payload
+        event.set()
+        return True
+
+    def wait(self, token: str, timeout: float) -> Optional[Dict]:
+        """timeout 안에 온 payload (없으면 None, 받은 payload는 한 번만 반환)"""
+        with self.lock:
+            event = self.events.get(token)
+        if event is None or not event.wait(timeout):
+            return None
+        with self.lock:
+            event.clear()
+            return self.payloads.pop(token, None)
+
+    def discard(self, token: str):
+        with self.lock:
+            self.events.pop(token, None)
+            self.payloads.pop(token, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a standalone webhook receiver and print deliveries"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_WEBHOOK_PORT,
+        help=f"수신 포트 (기본: {DEFAULT_WEBHOOK_PORT})"
+    )
+    parser.add_argument(
+        "--public-url",
+        default=None,
+        help="외부에서 접근하는 주소 (기본: http://localhost:<port>)"
+    )
+
+    args = parser.parse_args()
+
+    receiver = WebhookReceiver(args.public_url or f"http://localhost:{args.port}", args.port)
+    token = receiver.expect()
+    receiver.start()
+    print(f"Webhook URL: {receiver.url_for(token)}")
+    print("Waiting for deliveries (Ctrl+C to stop)...")
+    try:
+        while True:
+            payload = receiver.wait(token, 1.0)
+            if payload is not None:
+                print(json.dumps(payload, indent=2, ensure_ascii=False)[:2000])
+    except KeyboardInterrupt:
+        receiver.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+ComfyUI HTTP Client
+===================
+파이프라인 스크립트가 공유하는 ComfyUI API 클라이언트
+
+- 호스트별 requests.Session 하나를 재사용 (keep-alive 커넥션 풀)
+- 모든 요청에 (connect, read) 타임아웃
+- 연결 실패 / 502·503·504에 jitter를 준 지수 백오프 재시도
+  (POST는 서버에 도달하지 않은 연결 실패만 재시도해서 프롬프트가 두 번 큐에 오르지 않게 한다)
+- 동기 메서드는 그대로, 비동기 코드는 AsyncComfyClient로 같은 메서드를 await
+- 생성 백엔드 프로토콜(generation_backend.py) 구현: submit / poll / fetch / cancel
+
+Usage:
+    from comfy_client import get_client
+    client = get_client("http://localhost:8188")
+    prompt_id = client.queue_prompt(workflow)
+    client.wait_for_completion(prompt_id)
+
+    python comfy_client.py --host http://localhost:8188   # 연결/큐 상태 확인
+"""
+
+import os
+import time
+import random
+import asyncio
+import argparse
+import threading
+import requests
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from generation_backend import (
+    GenerationBackend,
+    CAP_WORKFLOW,
+    CAP_CANCEL,
+    CAP_NODE_CACHE,
+    CAP_RESUME,
+    STATE_QUEUED,
+    STATE_RUNNING,
+    STATE_SUCCESS,
+    STATE_ERROR,
+)
+
+DEFAULT_COMFYUI_HOST = "http://localhost:8188"
+
+# 기본 타임아웃 (초)
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+
+# 재시도: backoff * 2^attempt (최대 max_backoff) 범위에서 무작위 대기
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 8.0
+RETRY_STATUS = {502, 503, 504}
+
+DEFAULT_POOL_SIZE = 8
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+
+def _connect_failed(error: requests.RequestException) -> bool:
+    """요청이 서버에 도달하기 전에 실패했는지 (POST도 안전하게 재시도 가능)"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError):
+        return False
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def history_output_files(history_entry: Dict) -> List[str]:
+    """history outputs의 출력 이미지 파일 경로 (subfolder/filename)"""
+    files = []
+    for node_output in history_entry.get("outputs", {}).values():
+        for image in node_output.get("images", []):
+            if image.get("type", "output") == "output":
+                files.append("/".join(filter(None, [image.get("subfolder"), image["filename"]])))
+    return files
+
+
+def cached_node_count(status: Dict) -> Optional[int]:
+    """history status의 execution_cached 메시지에서 캐시 재사용 노드 수 추출"""
+    messages = status.get("messages")
+    if messages is None:
+        return None
+    return sum(
+        len(data.get("nodes", []))
+        for event, data in messages
+        if event == "execution_cached"
+    )
+
+
+def match_outputs(images: List[str], outputs: List[str]) -> Optional[List[str]]:
+    """작업 이미지 이름 순서대로 SaveImage 출력 파일 매칭 (<name>_00001_.png), 빠진 게 있으면 None"""
+    matched = []
+    for name in images:
+        found = [
+            path for path in outputs
+            if path.rpartition("/")[2].startswith(f"{name}_")
+        ]
+        if not found:
+            return None
+        matched.append(found[-1])
+    return matched
+
+
+class ComfyClient(GenerationBackend):
+    """ComfyUI 호스트 하나에 대한 커넥션 풀 + 재시도 클라이언트"""
+
+    capabilities = frozenset({CAP_WORKFLOW, CAP_CANCEL, CAP_NODE_CACHE, CAP_RESUME})
+
+    def __init__(
+        self,
+        host: str = DEFAULT_COMFYUI_HOST,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        client_id: str = "spine-atlas-pipeline",
+    ):
+        """
+        Args:
+            host: ComfyUI 주소 (예: http://localhost:8188)
+            connect_timeout / read_timeout: 요청 타임아웃 (초)
+            retries: 재시도 횟수 (0이면 재시도 안 함)
+            backoff / max_backoff: 재시도 대기 기준/상한 (초)
+            pool_size: keep-alive 커넥션 풀 크기 (동시 요청 수에 맞춤)
+            client_id: 기본 ComfyUI client_id
+        """
+        self.host = host.rstrip("/")
+        self.name = self.host
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.client_id = client_id
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 저수준 요청 ----
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        retries: Optional[int] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        재시도 포함 HTTP 요청
+
+        idempotent가 아니면(기본: POST) 연결 자체가 실패한 경우만 재시도한다.
+        502/503/504 응답도 idempotent 요청만 재시도한다 (서버가 이미 처리했을 수 있음).
+        재시도 후에도 실패하면 마지막 예외를 올리고, 5xx 응답은 마지막 응답을 반환한다.
+        """
+        retries = self.retries if retries is None else retries
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD")
+        kwargs.setdefault("timeout", self.timeout)
+        url = path if path.startswith("http") else f"{self.host}{path}"
+
+        for attempt in range(retries + 1):
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                retryable = isinstance(e, (requests.ConnectionError, requests.Timeout))
+                if not retryable or attempt == retries or not (idempotent or _connect_failed(e)):
+                    raise
+            else:
+                if (response.status_code not in RETRY_STATUS
+                        or not idempotent or attempt == retries):
+                    return response
+                response.close()
+            self._sleep_before_retry(attempt)
+
+    def _sleep_before_retry(self, attempt: int):
+        """full jitter 지수 백오프"""
+        time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def head(self, path: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", path, **kwargs)
+
+    # ---- ComfyUI API ----
+
+    def check(self) -> bool:
+        """서버 상태 확인 (/system_stats, 재시도 없음)"""
+        try:
+            return self.get("/system_stats", retries=0, timeout=5).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def system_stats(self) -> Dict:
+        response = self.get("/system_stats")
+        response.raise_for_status()
+        return response.json()
+
+    def post_prompt(self, prompt: Dict, client_id: Optional[str] = None) -> Dict:
+        """/prompt 응답 전체 (검증 실패 시 error/node_errors 포함)"""
+        payload = {"prompt": prompt, "client_id": client_id or self.client_id}
+        return self.post("/prompt", json=payload).json()
+
+    def queue_prompt(self, prompt: Dict, client_id: Optional[str] = None) -> Optional[str]:
+        """프롬프트 큐 등록, prompt_id 반환 (검증 실패 시 None)"""
+        return self.post_prompt(prompt, client_id).get("prompt_id")
+
+    def get_queue(self) -> Dict[str, set]:
+        """{"running": prompt_id 집합, "pending": prompt_id 집합}"""
+        queue = self.get("/queue", timeout=(self.timeout[0], 10)).json()
+        return {
+            "running": {item[1] for item in queue.get("queue_running", [])},
+            "pending": {item[1] for item in queue.get("queue_pending", [])},
+        }
+
+    def get_history(self, prompt_id: str) -> Optional[Dict]:
+        """완료된 프롬프트의 history 항목 (아직이면 None)"""
+        response = self.get(f"/history/{prompt_id}", timeout=(self.timeout[0], 10))
+        if response.status_code != 200:
+            return None
+        return response.json().get(prompt_id)
+
+    def wait_for_completion(
+        self,
+        prompt_id: str,
+        timeout: float = 120,
+        poll_interval: float = 2.0
+    ) -> Optional[Dict]:
+        """history에 나타날 때까지 폴링 (타임아웃 시 None)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            entry = self.get_history(prompt_id)
+            if entry is not None:
+                return entry
+            time.sleep(poll_interval)
+        return None
+
+    def cancel_prompt(self, prompt_id: str) -> Optional[str]:
+        """
+        타임아웃된 프롬프트를 GPU에서 내림
+
+        대기 중이면 /queue에서 삭제하고, 실행 중이면 /interrupt로 중단한다.
+        삭제 직전에 실행으로 넘어간 경우를 위해 한 번 더 확인한다.
+
+        Returns:
+            "pending" (큐에서 삭제), "running" (실행 중단), None (이미 끝났거나 큐에 없음)
+        """
+        for _ in range(2):
+            queue = self.get_queue()
+            if prompt_id in queue["running"]:
+                # 최신 ComfyUI는 prompt_id가 일치할 때만 중단 (구버전은 현재 작업 중단)
+                self.post("/interrupt", json={"prompt_id": prompt_id}, timeout=5)
+                return "running"
+            if prompt_id not in queue["pending"]:
+                return None
+
+            self.post("/queue", json={"delete": [prompt_id]}, timeout=5, idempotent=True)
+            if prompt_id not in self.get_queue()["running"]:
+                return "pending"
+
+        return None
+
+    def view(self, filename: str, subfolder: str = "", folder_type: str = "output",
+             **kwargs) -> requests.Response:
+        """/view 이미지 요청 (stream=True면 with 문으로 받아 iter_content 사용)"""
+        return self.get(
+            "/view",
+            params={"filename": filename, "subfolder": subfolder, "type": folder_type},
+            **kwargs
+        )
+
+    def download_output(self, output_file: str, dest: Path, timeout: int = 60) -> int:
+        """
+        출력 이미지를 dest로 스트리밍 다운로드 (/view, output_file = "subfolder/filename")
+
+        <dest>.part에 청크 단위로 쓴 뒤 rename하므로, 폴더를 감시하는 다음 단계는
+        완성된 PNG만 보게 된다. 받은 바이트 수 반환.
+        """
+        subfolder, _, filename = output_file.rpartition("/")
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dest.with_name(dest.name + ".part")
+        size = 0
+        try:
+            with self.view(filename, subfolder, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        size += len(chunk)
+            os.replace(tmp_path, dest)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        return size
+
+    # ---- 생성 백엔드 프로토콜 ----
+
+    def healthy(self) -> bool:
+        return self.check()
+
+    def submit(self, job: Dict, client_id: Optional[str] = None) -> Optional[str]:
+        return self.queue_prompt(job["prompt"], client_id)
+
+    def poll(self, handles: List[str]) -> Dict[str, Dict]:
+        """/queue 한 번으로 진행 상태, 큐에서 빠진 작업은 /history로 결과 확인"""
+        queue = self.get_queue()
+        running, pending = queue["running"], queue["pending"]
+        self.queue_depth = len(running) + len(pending)
+
+        statuses = {}
+        for prompt_id in handles:
+            if prompt_id in running or prompt_id in pending:
+                statuses[prompt_id] = {"state": STATE_RUNNING if prompt_id in running else STATE_QUEUED}
+                continue
+            try:
+                entry = self.get_history(prompt_id)
+            except (requests.RequestException, ValueError):
+                continue
+            if entry is None:
+                continue
+            status = entry.get("status", {})
+            if status.get("status_str", "success") == "success":
+                statuses[prompt_id] = {
+                    "state": STATE_SUCCESS,
+                    "outputs": history_output_files(entry),
+                    "cached_nodes": cached_node_count(status),
+                }
+            else:
+                statuses[prompt_id] = {"state": STATE_ERROR, "error": "Execution failed"}
+        return statuses
+
+    def fetch(self, result: Dict, dest_paths: List[Path]) -> int:
+        """history outputs에서 작업 이미지를 찾아 /view로 다운로드"""
+        matched = match_outputs(result["images"], result.get("outputs", []))
+        if not matched:
+            raise ValueError("출력 이미지를 history에서 찾을 수 없습니다")
+        return sum(
+            self.download_output(output_file, path)
+            for output_file, path in zip(matched, dest_paths)
+        )
+
+    def cancel(self, handle: str) -> Optional[str]:
+        return self.cancel_prompt(handle)
+
+
+class AsyncComfyClient:
+    """
+    ComfyClient의 asyncio 래퍼
+
+    같은 메서드 이름을 await로 호출하면 블로킹 HTTP 호출을 asyncio.to_thread로
+    이벤트 루프 밖에서 실행한다 (커넥션 풀은 동기 클라이언트와 공유).
+    """
+
+    def __init__(self, client: ComfyClient):
+        self.client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(attr, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    async def wait_for_completion(
+        self,
+        prompt_id: str,
+        timeout: float = 120,
+        poll_interval: float = 2.0
+    ) -> Optional[Dict]:
+        """비블로킹 폴링 (대기 중에는 스레드를 잡지 않음)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            entry = await asyncio.to_thread(self.client.get_history, prompt_id)
+            if entry is not None:
+                return entry
+            await asyncio.sleep(poll_interval)
+        return None
+
+
+_clients: Dict[str, ComfyClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host: str = DEFAULT_COMFYUI_HOST) -> ComfyClient:
+    """호스트별 공유 클라이언트 (같은 프로세스 안에서 커넥션 풀 재사용)"""
+    key = host.rstrip("/")
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = ComfyClient(key)
+        return _clients[key]
+
+
+# ---- 스크립트 공용 함수 (기본 공유 클라이언트 사용) ----
+
+def check_comfyui(host: str) -> bool:
+    """ComfyUI 서버 상태 확인"""
+    return get_client(host).check()
+
+
+def queue_prompt(host: str, prompt: Dict, client_id: str = "batch-generator") -> Optional[str]:
+    """ComfyUI에 프롬프트 큐 등록"""
+    return get_client(host).queue_prompt(prompt, client_id)
+
+
+def wait_for_completion(host: str, prompt_id: str, timeout: int = 120) -> bool:
+    """생성 완료 대기"""
+    return get_client(host).wait_for_completion(prompt_id, timeout) is not None
+
+
+def cancel_prompt(host: str, prompt_id: str) -> Optional[str]:
+    """타임아웃된 프롬프트 취소 (ComfyClient.cancel_prompt 참고)"""
+    return get_client(host).cancel_prompt(prompt_id)
+
+
+def estimate_reclaimed(state: Optional[str], durations: list) -> float:
+    """
+    취소로 아낀 GPU 시간 추정 (초)
+
+    대기 중 삭제는 평균 작업 시간 전체, 실행 중 중단은 평균의 절반을 아낀 것으로 본다.
+    """
+    if not state or not durations:
+        return 0.0
+    expected = sum(durations) / len(durations)
+    return expected if state == "pending" else expected / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ComfyUI connection check"
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_COMFYUI_HOST,
+        help=f"ComfyUI 호스트 (기본: {DEFAULT_COMFYUI_HOST})"
+    )
+
+    args = parser.parse_args()
+
+    client = get_client(args.host)
+    if not client.check():
+        print(f"오류: ComfyUI에 연결할 수 없습니다. ({args.host})")
+        return
+
+    stats = client.system_stats()
+    queue = client.get_queue()
+    print(f"ComfyUI: {args.host}")
+    for device in stats.get("devices", []):
+        vram = device.get("vram_total", 0) / 1024 ** 3
+        print(f"  GPU: {device.get('name', '?')} ({vram:.1f} GB)")
+    print(f"  Queue: running {len(queue['running'])}, pending {len(queue['pending'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Fast Parts Segmentation (CPU)
+=============================
+ComfyUI/GPU 없이 NumPy만으로 수행하는 단색 배경 치비 캐릭터 파츠 분리
+
+생성 프롬프트가 (solid white background:1.4) + rembg로 배경을 강제하므로,
+알파/색상 클러스터링 + 연결 요소 + 영역 휴리스틱만으로 head/body/hair를 나눈다.
+weapon/accessory처럼 의미 검출이 필요한 파츠는 parts_segment.py(SAM)를 사용한다.
+
+Usage:
+    python fast_segment.py --image arcana_idle.png --output parts/arcana/
+    python parts_segment.py --image arcana_idle.png --backend fast
+
+Requirements:
+    pip install pillow numpy
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    print("NumPy가 필요합니다: pip install numpy")
+    sys.exit(1)
+
+try:
+    from PIL import Image
+except ImportError:
+    print("Pillow가 필요합니다: pip install pillow")
+    sys.exit(1)
+
+
+# fast 백엔드가 분리할 수 있는 파츠
+FAST_PARTS = ["head", "body", "hair"]
+
+# 2.5 head ratio 치비 → 머리가 전신 높이의 약 40%
+DEFAULT_HEAD_RATIO = 1 / 2.5
+
+
+def load_rgba(image_path: str) -> np.ndarray:
+    """이미지를 (H, W, 4) uint8 배열로 로드"""
+    with Image.open(image_path) as img:
+        return np.asarray(img.convert("RGBA")).copy()
+
+
+def label_components(mask: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    4-연결 연결 요소 라벨링 (run 기반, 완전 벡터화)
+
+    행 단위 run을 노드로, 세로로 맞닿은 run 쌍을 간선으로 보고
+    최소 라벨 전파 + pointer jumping으로 병합한다.
+
+    Returns:
+        (라벨 배열 (0 = 배경, 1..n), 요소 개수 n)
+    """
+    mask = np.asarray(mask, dtype=bool)
+    height, width = mask.shape
+    labels = np.zeros((height, width), dtype=np.int32)
+    if not mask.any():
+        return labels, 0
+
+    # 행 단위 run 검출 (row-major 순서 = mask.ravel()의 True 순서)
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    starts = np.argwhere(edges == 1)
+    ends = np.argwhere(edges == -1)
+    run_lengths = ends[:, 1] - starts[:, 1]
+    run_count = len(run_lengths)
+
+    # 픽셀별 run id
+    run_ids = np.full((height, width), -1, dtype=np.int64)
+    run_ids[mask] = np.repeat(np.arange(run_count), run_lengths)
+
+    # 세로로 맞닿은 run 쌍 = 간선 (row-major 연속 중복은 정렬 없이 제거)
+    touching = mask[:-1] & mask[1:]
+    a = run_ids[:-1][touching]
+    b = run_ids[1:][touching]
+    if len(a):
+        changed = np.ones(len(a), dtype=bool)
+        changed[1:] = (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+        a, b = a[changed], b[changed]
+
+    # 최소 라벨 전파
+    parent = np.arange(run_count)
+    while True:
+        lowest = np.minimum(parent[a], parent[b])
+        updated = parent.copy()
+        np.minimum.at(updated, a, lowest)
+        np.minimum.at(updated, b, lowest)
+        updated = updated[updated]
+        if np.array_equal(updated, parent):
+            break
+        parent = updated
+
+    _, run_labels = np.unique(parent, return_inverse=True)
+    labels[mask] = np.repeat(run_labels + 1, run_lengths)
+    return labels, int(run_labels.max()) + 1
+
+
+def remove_small_components(mask: np.ndarray, min_area: int) -> np.ndarray:
+    """min_area 미만 연결 요소(스펙클) 제거"""
+    labels, count = label_components(mask)
+    if count == 0:
+        return mask.copy()
+    areas = np.bincount(labels.ravel(), minlength=count + 1)
+    keep = areas >= min_area
+    keep[0] = False
+    return keep[labels]
+
+
+def foreground_mask(rgba: np.ndarray, white_tolerance: int = 24) -> np.ndarray:
+    """
+    전경 마스크
+
+    알파가 있으면(rembg 출력) 알파로, 완전 불투명이면 테두리와 연결된
+    흰색 영역만 배경으로 본다 (흰 옷/하이라이트가 배경으로 빠지지 않도록).
+    """
+    alpha = rgba[..., 3]
+    if (alpha < 255).any():
+        return alpha > 16
+
+    whiteness = 255 - rgba[..., :3].min(axis=2)
+    white = whiteness <= white_tolerance
+    labels, count = label_components(white)
+    border = np.unique(np.concatenate([
+        labels[0], labels[-1], labels[:, 0], labels[:, -1]
+    ]))
+    background = np.isin(labels, border[border > 0])
+    return ~background
+
+
+def _nearest_center(pixels: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """가장 가까운 중심 인덱스 (|x|^2 항은 argmin에 무관하므로 생략한 행렬곱 형태)"""
+    scores = (centers ** 2).sum(axis=1)[None, :] - 2.0 * (pixels @ centers.T)
+    return scores.argmin(axis=1)
+
+
+def kmeans_colors(
+    pixels: np.ndarray,
+    k: int,
+    iterations: int = 12,
+    sample_size: int = 20000,
+    seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    RGB 픽셀 k-means (샘플로 중심을 학습한 뒤 전체 픽셀 할당)
+
+    Returns:
+        (중심 (k, 3), 픽셀별 클러스터 인덱스)
+    """
+    pixels = pixels.astype(np.float32)
+    rng = np.random.default_rng(seed)
+    sample = pixels
+    if len(pixels) > sample_size:
+        sample = pixels[rng.choice(len(pixels), sample_size, replace=False)]
+
+    k = min(k, len(sample))
+    centers = sample[rng.choice(len(sample), k, replace=False)]
+    for _ in range(iterations):
+        nearest = _nearest_center(sample, centers)
+        counts = np.bincount(nearest, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, nearest, sample)
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+
+    return centers, _nearest_center(pixels, centers)
+
+
+def is_skin_color(rgb: np.ndarray) -> np.ndarray:
+    """RGB 피부색 규칙 (Kovac et al.) — 애니메 채색의 밝은 피부톤 포함"""
+    r, g, b = (rgb[..., i].astype(np.int32) for i in range(3))
+    spread = rgb.max(axis=-1).astype(np.int32) - rgb.min(axis=-1)
+    return (
+        (r > 95) & (g > 40) & (b > 20)
+        & (spread > 15) & (np.abs(r - g) > 15)
+        & (r > g) & (r > b)
+    )
+
+
+def segment_image(
+    rgba: np.ndarray,
+    head_ratio: float = DEFAULT_HEAD_RATIO,
+    n_colors: int = 6,
+    min_area_ratio: float = 0.0005,
+    crown_ratio: float = 0.12
+) -> Dict[str, np.ndarray]:
+    """
+    head/body/hair 마스크 추정
+
+    - 전경: 알파/배경색 + 스펙클 제거
+    - hair: 정수리 띠(상단 crown_ratio)를 가장 많이 차지하는 비피부색 클러스터 중
+      정수리와 연결된 영역 (트윈테일처럼 아래로 내려오는 머리 포함)
+    - head: 머리선(상단 head_ratio) 위 전경 - hair
+    - body: 머리선 아래 전경 - hair
+
+    세 마스크는 서로 겹치지 않는다.
+    """
+    height, width = rgba.shape[:2]
+    fg = foreground_mask(rgba)
+    fg = remove_small_components(fg, max(1, int(height * width * min_area_ratio)))
+
+    empty = np.zeros((height, width), dtype=bool)
+    if not fg.any():
+        return {"head": empty, "body": empty.copy(), "hair": empty.copy()}
+
+    rows = np.flatnonzero(fg.any(axis=1))
+    top, bottom = rows[0], rows[-1] + 1
+    figure_height = bottom - top
+    head_line = top + int(round(figure_height * head_ratio))
+    crown_line = top + max(1, int(round(figure_height * crown_ratio)))
+    y_index = np.arange(height)[:, None]
+
+    # 전경 색상 클러스터링
+    fg_pixels = rgba[..., :3][fg]
+    centers, assignment = kmeans_colors(fg_pixels, n_colors)
+    clusters = np.full((height, width), -1, dtype=np.int32)
+    clusters[fg] = assignment
+
+    skin_clusters = is_skin_color(centers.round().astype(np.uint8))
+    crown = clusters[top:crown_line]
+    crown_counts = np.bincount(crown[crown >= 0], minlength=len(centers))
+    crown_counts[skin_clusters] = 0
+
+    hair = empty.copy()
+    if crown_counts.any():
+        hair_cluster = int(crown_counts.argmax())
+        candidate = clusters == hair_cluster
+        labels, _ = label_components(candidate)
+        crown_labels = np.unique(labels[top:crown_line])
+        hair = np.isin(labels, crown_labels[crown_labels > 0])
+
+    head = fg & (y_index < head_line) & ~hair
+    body = fg & (y_index >= head_line) & ~hair
+    return {"head": head, "body": body, "hair": hair}
+
+
+def save_part(rgba: np.ndarray, mask: np.ndarray, output_path: str):
+    """마스크 밖을 완전 투명(RGB 포함 0)으로 만든 원본 크기 RGBA 저장"""
+    part = rgba.copy()
+    part[~mask] = 0
+    Image.fromarray(part, "RGBA").save(output_path, "PNG")
+
+
+def segment_parts_fast(
+    image_path: str,
+    output_dir: str,
+    parts: Optional[List[str]] = None,
+    head_ratio: float = DEFAULT_HEAD_RATIO,
+    n_colors: int = 6
+) -> dict:
+    """
+    이미지에서 파츠 분리 (CPU), <output_dir>/<part>.png 저장
+
+    결과 형식은 parts_segment.segment_parts와 같다.
+    """
+    results = {
+        "image": image_path,
+        "parts": {},
+        "errors": []
+    }
+
+    if parts is None:
+        parts = list(FAST_PARTS)
+
+    start_time = time.time()
+    rgba = load_rgba(image_path)
+    masks = segment_image(rgba, head_ratio=head_ratio, n_colors=n_colors)
+
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    for part_name in parts:
+        if part_name not in masks:
+            print(f"  [SKIP] {part_name}: fast 백엔드 미지원 (SAM 백엔드 사용)")
+            results["parts"][part_name] = "unsupported"
+            results["errors"].append(f"{part_name}: Not supported by fast backend")
+            continue
+
+        mask = masks[part_name]
+        if not mask.any():
+            results["parts"][part_name] = "empty"
+            results["errors"].append(f"{part_name}: Empty mask")
+            print(f"    [FAIL] {part_name} empty")
+            continue
+
+        save_part(rgba, mask, os.path.join(output_dir, f"{part_name}.png"))
+        results["parts"][part_name] = "success"
+        print(f"    [OK] {part_name} ({int(mask.sum())} px)")
+
+    results["elapsed"] = time.time() - start_time
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CPU-only Parts Segmentation (solid background chibi)"
+    )
+    parser.add_argument(
+        "--image", "-i",
+        required=True,
+        help="입력 이미지 경로"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        required=True,
+        help="출력 디렉토리"
+    )
+    parser.add_argument(
+        "--parts", "-p",
+        default=",".join(FAST_PARTS),
+        help=f"분리할 파츠 (콤마 구분, 기본: {','.join(FAST_PARTS)})"
+    )
+    parser.add_argument(
+        "--head-ratio",
+        type=float,
+        default=DEFAULT_HEAD_RATIO,
+        help=f"전신 대비 머리 높이 비율 (기본: {DEFAULT_HEAD_RATIO:.2f})"
+    )
+    parser.add_argument(
+        "--colors",
+        type=int,
+        default=6,
+        help="색상 클러스터 수 (기본: 6)"
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.image):
+        print(f"Error: Image not found: {args.image}")
+        sys.exit(1)
+
+    parts = [p.strip() for p in args.parts.split(",")]
+    result = segment_parts_fast(
+        args.image, args.output, parts,
+        head_ratio=args.head_ratio, n_colors=args.colors
+    )
+
+    success_count = sum(1 for v in result["parts"].values() if v == "success")
+    print(f"\n  Success: {success_count}/{len(parts)} ({result['elapsed'] * 1000:.0f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Generation Backend
+==================
+로컬 ComfyUI와 클라우드 서비스가 공통으로 구현하는 생성 백엔드 프로토콜
+
+JobScheduler(batch_generate.py)는 이 인터페이스만 사용하므로, 한 배치를
+로컬 GPU(ComfyClient)와 클라우드(CloudProvider 하위 클래스)에 동시에 나눠 실행할 수 있다.
+
+    handle = backend.submit(job)                 # 작업 제출 (build_jobs() 형식)
+    statuses = backend.poll([handle, ...])       # 여러 작업 상태를 한 번에 확인
+    backend.fetch(result, dest_paths)            # 끝난 작업의 이미지를 로컬 경로로
+    backend.wait_for(handle, timeout)            # 작업 하나를 끝날 때까지 대기
+
+poll() 상태: {"state": queued|running|success|error, "error", "outputs", "cached_nodes"}
+(아직 판단할 수 없는 작업은 결과에서 빠진다)
+
+capability:
+    workflow    작업의 ComfyUI 워크플로우를 그대로 실행 (img2img, hires, rembg, 고정 seed → 출력 캐시 가능)
+    txt2img     프롬프트 텍스트만으로 생성 (build_jobs()가 "texts"를 넣은 작업만)
+    cancel      실행 중인 작업을 서버에서 중단
+    node_cache  연속 프롬프트 간 노드 캐시 재사용
+    resume      재시작 후 제출 ID로 이전 작업에 다시 연결
+
+Usage:
+    python generation_backend.py --host http://localhost:8188 --cloud replicate,runpod   # 백엔드 목록
+"""
+
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CAP_WORKFLOW = "workflow"
+CAP_TXT2IMG = "txt2img"
+CAP_CANCEL = "cancel"
+CAP_NODE_CACHE = "node_cache"
+CAP_RESUME = "resume"
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_SUCCESS = "success"
+STATE_ERROR = "error"
+FINAL_STATES = (STATE_SUCCESS, STATE_ERROR)
+
+# 스케줄러는 priority가 낮은 백엔드부터 채운다 (로컬 GPU → 남는 작업만 클라우드)
+PRIORITY_LOCAL = 0
+PRIORITY_CLOUD = 1
+
+
+class GenerationBackend:
+    """생성 백엔드 공통 인터페이스 (하위 클래스가 submit/poll/fetch 구현)"""
+
+    name = "backend"
+    capabilities = frozenset()
+    max_outputs = None     # 작업 하나의 최대 이미지 수 (None: 제한 없음)
+    max_in_flight = None   # 동시에 맡길 작업 수 (None: 스케줄러 설정)
+    job_timeout = None     # 작업당 제한 시간 (None: 스케줄러 설정)
+    priority = PRIORITY_LOCAL
+    queue_depth = 0        # 마지막 poll() 기준 대기 중인 작업 수
+
+    def can_run(self, job: Dict) -> bool:
+        """이 백엔드가 작업을 그대로 실행할 수 있는지"""
+        if self.max_outputs is not None and len(job.get("images", [job["key"]])) > self.max_outputs:
+            return False
+        if CAP_WORKFLOW in self.capabilities:
+            return True
+        return CAP_TXT2IMG in self.capabilities and "texts" in job
+
+    def healthy(self) -> bool:
+        return True
+
+    def submit(self, job: Dict, client_id: Optional[str] = None) -> Optional[str]:
+        """작업 제출, handle 반환 (검증 실패 등으로 받지 않으면 None)"""
+        raise NotImplementedError
+
+    def poll(self, handles: List[str]) -> Dict[str, Dict]:
+        """handle별 상태 (백엔드 자체에 닿지 못하면 requests.RequestException)"""
+        raise NotImplementedError
+
+    def fetch(self, result: Dict, dest_paths: List[Path]) -> int:
+        """끝난 작업(result["prompt_id"] = handle)의 이미지를 dest_paths에 저장, 바이트 수 반환"""
+        raise NotImplementedError
+
+    def cancel(self, handle: str) -> Optional[str]:
+        """작업 취소: "pending"(대기 중 삭제), "running"(실행 중단), None(이미 끝남)"""
+        return None
+
+    def wait_for(self, handle: str, timeout: float = 120, poll_interval: float = 1.0) -> Optional[Dict]:
+        """작업 하나가 끝날 때까지 poll (타임아웃 시 None)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = self.poll([handle]).get(handle)
+            if status is not None and status["state"] in FINAL_STATES:
+                return status
+            time.sleep(poll_interval)
+        return None
+
+
+def describe(backend: GenerationBackend) -> str:
+    """백엔드 한 줄 설명 (목록 출력용)"""
+    limits = []
+    if backend.max_in_flight is not None:
+        limits.append(f"in-flight {backend.max_in_flight}")
+    if backend.max_outputs is not None:
+        limits.append(f"{backend.max_outputs} images/job")
+    caps = ", ".join(sorted(backend.capabilities))
+    return f"{backend.name} [{caps}]" + (f" ({', '.join(limits)})" if limits else "")
+
+
+def main():
+    from comfy_client import get_client
+    from cloud_api_alternatives import PROVIDERS
+
+    parser = argparse.ArgumentParser(
+        description="List generation backends and their capabilities"
+    )
+    parser.add_argument(
+        "--host",
+        default="http://localhost:8188",
+        help="ComfyUI 호스트, 여러 대면 콤마 구분"
+    )
+    parser.add_argument(
+        "--cloud",
+        default="",
+        help=f"클라우드 서비스, 콤마 구분 ({', '.join(PROVIDERS)})"
+    )
+
+    args = parser.parse_args()
+
+    for host in filter(None, (h.strip() for h in args.host.split(","))):
+        client = get_client(host)
+        print(f"  {describe(client)}: {'up' if client.healthy() else 'DOWN'}")
+    for name in filter(None, (s.strip().lower() for s in args.cloud.split(","))):
+        if name not in PROVIDERS:
+            print(f"  {name}: unknown service")
+            continue
+        try:
+            print(f"  {describe(PROVIDERS[name]())}")
+        except ValueError as e:
+            print(f"  {name}: unavailable ({e})")
+
+
+if __name__ == "__main__":
+    main()
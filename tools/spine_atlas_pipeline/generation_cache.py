@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Generation Cache
+================
+워크플로우 해시 기반 로컬 출력 캐시 + 결정적 seed
+
+같은 워크플로우(체크포인트, 프롬프트, seed, 해상도, steps ...)는 같은 이미지를 만든다.
+seed를 (캐릭터, 표정, salt)에서 유도하면 재실행 시 워크플로우가 그대로 같아지므로,
+정규화한 워크플로우 JSON의 해시로 이전 출력을 찾아 GPU 생성 대신 파일 복사로 끝낸다.
+
+캐시 구조:
+    <cache_dir>/<hash[:2]>/<hash>/0.png, 1.png, ...
+    <cache_dir>/<hash[:2]>/<hash>/meta.json   # 마지막에 기록 (있으면 완전한 항목)
+
+Usage:
+    python generation_cache.py --cache-dir D:/AI/SpineAtlas/characters/.cache   # 캐시 통계
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CACHE_DIRNAME = ".cache"
+SEED_MAX = 2**32 - 1
+
+# 출력 이름만 바꾸고 픽셀에는 영향이 없는 입력 (해시에서 제외)
+NAME_ONLY_INPUTS = {
+    "SaveImage": ("filename_prefix",),
+}
+
+
+def derive_seed(*parts, salt: str = "") -> int:
+    """(캐릭터, 표정, ..., salt)에서 결정적 seed 유도"""
+    key = "\x1f".join([salt] + [str(part) for part in parts])
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % (SEED_MAX + 1)
+
+
+def canonical_workflow(workflow: Dict) -> Dict:
+    """해시용 정규화: 출력 파일명 입력 제거 (노드 ID/키 순서는 직렬화에서 정렬)"""
+    canonical = {}
+    for node_id, node in workflow.items():
+        inputs = dict(node.get("inputs", {}))
+        for name in NAME_ONLY_INPUTS.get(node.get("class_type"), ()):
+            inputs.pop(name, None)
+        canonical[str(node_id)] = {"class_type": node.get("class_type"), "inputs": inputs}
+    return canonical
+
+
+def workflow_hash(workflow: Dict) -> str:
+    """정규화한 워크플로우 JSON의 sha256"""
+    payload = json.dumps(
+        canonical_workflow(workflow),
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def atomic_copy(src: Path, dest: Path):
+    """임시 파일에 복사 후 rename (중단돼도 반쯤 쓴 파일이 남지 않음)"""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest.with_name(dest.name + ".part")
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+class GenerationCache:
+    """워크플로우 해시 → 출력 이미지 파일"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+
+    def entry_dir(self, digest: str) -> Path:
+        return self.cache_dir / digest[:2] / digest
+
+    def lookup(self, digest: str, count: Optional[int] = None) -> Optional[List[Path]]:
+        """캐시된 출력 파일 목록 (없거나 불완전하면 None)"""
+        entry = self.entry_dir(digest)
+        try:
+            with open(entry / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        files = [entry / name for name in meta.get("files", [])]
+        if not files or (count is not None and len(files) != count):
+            return None
+        if not all(path.exists() for path in files):
+            return None
+        return files
+
+    def store(self, digest: str, sources: List[Path], meta: Optional[Dict] = None) -> List[Path]:
+        """출력 이미지 파일 복사 저장 (파일을 모두 쓴 뒤 meta.json을 원자적으로 기록)"""
+        entry = self.entry_dir(digest)
+        entry.mkdir(parents=True, exist_ok=True)
+
+        names = []
+        for i, src in enumerate(sources):
+            name = f"{i}.png"
+            atomic_copy(src, entry / name)
+            names.append(name)
+
+        record = dict(meta or {}, files=names, created=time.time())
+        tmp_path = entry / "meta.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, entry / "meta.json")
+        return [entry / name for name in names]
+
+    def materialize(self, files: List[Path], dest_paths: List[Path]):
+        """캐시 파일을 출력 위치로 복사"""
+        for src, dest in zip(files, dest_paths):
+            atomic_copy(src, dest)
+
+    def stats(self) -> Dict[str, int]:
+        """캐시 항목 수 / 파일 수 / 전체 크기 (bytes)"""
+        entries, files, size = 0, 0, 0
+        for meta_path in self.cache_dir.glob("*/*/meta.json"):
+            entries += 1
+            for path in meta_path.parent.glob("*.png"):
+                files += 1
+                size += path.stat().st_size
+        return {"entries": entries, "files": files, "bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Show generation cache statistics"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        required=True,
+        help="캐시 디렉토리 (batch_generate.py 기본: <output>/.cache)"
+    )
+
+    args = parser.parse_args()
+
+    stats = GenerationCache(args.cache_dir).stats()
+    print(f"Cache: {args.cache_dir}")
+    print(f"  Entries: {stats['entries']}")
+    print(f"  Files: {stats['files']}")
+    print(f"  Size: {stats['bytes'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Batch Job Journal
+=================
+batch_generate.py 작업 상태를 출력 폴더의 JSON Lines 파일에 추가 기록
+
+한 줄이 이벤트 하나({"key", "status", "hash", "prompt_id", "host", "outputs", "time"})이고,
+키별 마지막 줄이 현재 상태다. 기록마다 flush + fsync하므로 프로세스가 죽어도
+마지막 줄 하나 외에는 잃지 않고, 잘린 마지막 줄은 읽을 때 무시한다.
+
+Usage:
+    python job_journal.py -o D:/AI/SpineAtlas/characters   # 저널 상태 요약
+"""
+
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+JOURNAL_FILENAME = ".batch_journal.jsonl"
+
+# 작업 상태
+STATUS_QUEUED = "queued"
+STATUS_SUCCESS = "success"
+
+
+class JobJournal:
+    """추가 전용 작업 저널 (JSON Lines)"""
+
+    def __init__(self, output_dir: str, filename: str = JOURNAL_FILENAME):
+        self.path = Path(output_dir) / filename
+        self.entries = self.load()
+
+    def load(self) -> Dict[str, Dict]:
+        """키별 최신 기록 로드 (손상된 줄은 건너뜀)"""
+        entries = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(record, dict) and "key" in record:
+                        entries[record["key"]] = record
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def record(self, key: str, status: str, **fields) -> Dict:
+        """상태 이벤트 한 줄 추가 (fsync까지 완료 후 반환)"""
+        entry = {"key": key, "status": status, "time": time.time()}
+        entry.update(fields)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries[key] = entry
+        return entry
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.entries.get(key)
+
+    def is_completed(
+        self,
+        key: str,
+        paths: Optional[Iterable[Path]] = None,
+        digest: Optional[str] = None
+    ) -> bool:
+        """
+        성공 기록이 있는 작업인지
+
+        성공은 다운로드 전에 기록되므로, paths(로컬 출력 경로)를 주면 모두 있어야 완료로 본다
+        (다운로드 실패나 중단으로 파일이 없으면 다시 생성).
+        digest(워크플로우 해시)를 주면 기록된 해시와 같아야 한다 (seed/프롬프트/옵션이 바뀐 작업은 다시 생성).
+        """
+        entry = self.entries.get(key)
+        if not entry or entry["status"] != STATUS_SUCCESS:
+            return False
+        if digest is not None and entry.get("hash") != digest:
+            return False
+        return all(Path(path).exists() for path in paths or [])
+
+    def pending_prompt(self, key: str, digest: Optional[str] = None) -> Optional[Dict]:
+        """제출 후 결과가 기록되지 않은 작업의 {"prompt_id", "host"} (재연결용, digest가 다르면 None)"""
+        entry = self.entries.get(key)
+        if not entry or entry["status"] != STATUS_QUEUED or not entry.get("prompt_id"):
+            return None
+        if digest is not None and entry.get("hash") != digest:
+            return None
+        return {"prompt_id": entry["prompt_id"], "host": entry.get("host")}
+
+    def summary(self) -> Dict[str, int]:
+        """상태별 작업 수"""
+        counts = {}
+        for entry in self.entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Show batch generation journal status"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        required=True,
+        help="batch_generate.py 출력 디렉토리"
+    )
+
+    args = parser.parse_args()
+
+    journal = JobJournal(args.output)
+    if not journal.entries:
+        print(f"저널이 없습니다: {journal.path}")
+        return
+
+    print(f"Journal: {journal.path}")
+    for status, count in sorted(journal.summary().items()):
+        print(f"  {status}: {count}")
+
+
+if __name__ == "__main__":
+    main()
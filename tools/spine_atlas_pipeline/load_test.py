@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Load Test
+=========
+mock_comfyui.py 서버로 batch_generate / parts_segment 경로의 처리량과 지연을 측정
+
+시나리오마다 같은 seed의 새 모의 서버를 띄워 실제 코드 경로를 그대로 실행한다.
+    generate     JobScheduler + OutputDownloader (batch_generate.py와 같은 경로)
+    segment      AsyncSegmentRunner (async_segment.py, 업로드/GPU/다운로드 파이프라인)
+    segment-seq  parts_segment.segment_parts (이미지/파츠 순차 실행, 비교 기준)
+
+보고 항목:
+    jobs/min     초당 완료 작업 수 × 60 (generate: 프롬프트, segment: 이미지)
+    e2e p50/p90  작업 하나의 종단 지연 (generate: 서버가 프롬프트를 받은 시점 → 출력 파일 저장,
+                 segment: 이미지 업로드 시작 → 모든 파츠 저장)
+    GPU          모의 서버 실행 스레드 사용률 (클라이언트가 GPU를 놀리는 정도)
+    cache        노드 캐시 적중률
+
+Usage:
+    python load_test.py                                        # generate + segment, in-flight 1,3
+    python load_test.py -s generate --jobs 60 --in-flight 1,2,4,8 --exec-time lognormal:0.5,0.3
+    python load_test.py -s segment,segment-seq --images 8 --fail-rate 0.05 --json report.json
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from mock_comfyui import MockComfyUI, DEFAULT_EXEC_TIME, figure_png
+from batch_generate import load_prompts, build_jobs, image_paths, JobScheduler, OutputDownloader
+from async_segment import AsyncSegmentRunner
+from parts_segment import PARTS_PROMPTS, segment_parts
+
+SCENARIOS = ("generate", "segment", "segment-seq")
+DEFAULT_SEGMENT_TIME = "uniform:0.2,0.4"
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """q(0~1) 분위수 (nearest-rank, 값이 없으면 None)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def load_jobs(count: int, variants: int = 1) -> List[Dict]:
+    """character_prompts.json의 캐릭터 × 표정을 돌려 가며 count개 (라운드마다 seed_salt가 달라 새 seed)"""
+    prompts = load_prompts()
+    characters = list(prompts["characters"])
+    expressions = ["idle", "happy", "angry", "skill", "victory"]
+    jobs, round_index = [], 0
+    while len(jobs) < count:
+        jobs += build_jobs(
+            characters, expressions, prompts, use_rembg=False, variants=variants,
+            seed_salt=f"load{round_index}"
+        )
+        round_index += 1
+    return jobs[:count]
+
+
+def run_generate(mock: MockComfyUI, jobs: List[Dict], in_flight: int, output_dir: str) -> Dict:
+    """batch_generate 경로: 스케줄러가 큐를 채우고 다운로더가 출력 저장"""
+    saved = {}   # prompt_id -> 저장 완료 시각
+
+    class TimedDownloader(OutputDownloader):
+        def _download(self, result: Dict):
+            super()._download(result)
+            if all(path.exists() for path in image_paths(self.output_dir, result)):
+                saved[result["prompt_id"]] = time.time()
+
+    scheduler = JobScheduler([mock.host], max_in_flight=in_flight, poll_interval=0.1)
+    downloader = TimedDownloader(output_dir, backends=scheduler.backends)
+    started = time.time()
+    results = scheduler.run(jobs, on_complete=lambda result, done, total: downloader.submit(result))
+    stats = downloader.close()
+    elapsed = time.time() - started
+
+    with mock.lock:
+        timings = dict(mock.timings)
+    latencies = [
+        saved[r["prompt_id"]] - timings[r["prompt_id"]]["queued"]
+        for r in results if r["prompt_id"] in saved and r["prompt_id"] in timings
+    ]
+    return {
+        "total": len(jobs),
+        "success": len(saved),
+        "failed": len(jobs) - len(saved),
+        "images": stats["files"],
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "errors": [f"{r['key']}: {r['error']}" for r in results if r["error"]] + stats["errors"],
+    }
+
+
+def run_segment(mock: MockComfyUI, images: List[str], gpu_limit: int, output_dir: str,
+                parts: List[str]) -> Dict:
+    """async_segment 경로: 이미지마다 업로드 → 파츠 프롬프트 → 마스크 다운로드"""
+    latencies = []
+
+    class TimedRunner(AsyncSegmentRunner):
+        async def _segment_image(self, image_path: str) -> Dict:
+            started = time.time()
+            result = await super()._segment_image(image_path)
+            if not result["errors"]:
+                latencies.append(time.time() - started)
+            return result
+
+    runner = TimedRunner(mock.host, output_dir, parts, gpu_limit=gpu_limit, poll_interval=0.1,
+                         manifest_path=None)
+    started = time.time()
+    results = asyncio.run(runner.run(images))
+    elapsed = time.time() - started
+    return {
+        "total": len(images),
+        "success": len(latencies),
+        "failed": len(images) - len(latencies),
+        "images": sum(len(r["parts"]) for r in results),
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "errors": [e for r in results for e in r["errors"]],
+    }
+
+
+def run_segment_sequential(mock: MockComfyUI, images: List[str], output_dir: str,
+                           parts: List[str]) -> Dict:
+    """parts_segment 경로: 이미지/파츠를 하나씩 큐에 올리고 완료까지 대기"""
+    latencies, results = [], []
+    started = time.time()
+    for image in images:
+        image_started = time.time()
+        result = segment_parts(mock.host, image, output_dir, parts, manifest_path=None)
+        results.append(result)
+        if not result["errors"]:
+            latencies.append(time.time() - image_started)
+    elapsed = time.time() - started
+    return {
+        "total": len(images),
+        "success": len(latencies),
+        "failed": len(images) - len(latencies),
+        "images": sum(1 for r in results for status in r["parts"].values() if status == "success"),
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "errors": [e for r in results for e in r["errors"]],
+    }
+
+
+def summarize(scenario: str, in_flight: Optional[int], run: Dict, server: Dict) -> Dict:
+    elapsed = run["elapsed"]
+    return {
+        "scenario": scenario,
+        "in_flight": in_flight,
+        "total": run["total"],
+        "success": run["success"],
+        "failed": run["failed"],
+        "outputs": run["images"],
+        "elapsed": round(elapsed, 3),
+        "jobs_per_min": round(run["success"] / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "e2e_p50": percentile(run["latencies"], 0.5),
+        "e2e_p90": percentile(run["latencies"], 0.9),
+        "e2e_max": max(run["latencies"]) if run["latencies"] else None,
+        "gpu_utilization": round(server["busy"] / elapsed, 3) if elapsed > 0 else 0.0,
+        "cache_hit_rate": server["cache_hit_rate"],
+        "server": server,
+        "errors": run["errors"][:20],
+    }
+
+
+def print_report(rows: List[Dict]):
+    def seconds(value: Optional[float]) -> str:
+        return f"{value:.2f}s" if value is not None else "-"
+
+    print(f"\n{'scenario':<12} {'in-flight':>9} {'ok/total':>9} {'elapsed':>8} {'jobs/min':>9} "
+          f"{'e2e p50':>8} {'e2e p90':>8} {'e2e max':>8} {'GPU':>5} {'cache':>6}")
+    for row in rows:
+        print(f"{row['scenario']:<12} {row['in_flight'] or '-':>9} "
+              f"{row['success']:>4}/{row['total']:<4} {row['elapsed']:>7.1f}s {row['jobs_per_min']:>9.1f} "
+              f"{seconds(row['e2e_p50']):>8} {seconds(row['e2e_p90']):>8} {seconds(row['e2e_max']):>8} "
+              f"{row['gpu_utilization']:>5.0%} {row['cache_hit_rate']:>6.0%}")
+    for row in rows:
+        for error in row["errors"][:3]:
+            print(f"  [{row['scenario']}] {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test batch_generate and parts_segment against a mock ComfyUI"
+    )
+    parser.add_argument(
+        "--scenario", "-s",
+        default="generate,segment",
+        help=f"시나리오, 콤마 구분 ({', '.join(SCENARIOS)}, 기본: generate,segment)"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=30,
+        help="generate 작업 수 (기본: 30)"
+    )
+    parser.add_argument(
+        "--variants",
+        type=int,
+        default=1,
+        help="generate 작업당 이미지 수 (기본: 1)"
+    )
+    parser.add_argument(
+        "--images",
+        type=int,
+        default=6,
+        help="segment 입력 이미지 수 (기본: 6)"
+    )
+    parser.add_argument(
+        "--parts",
+        help="segment 파츠 (콤마 구분, 기본: 전체)"
+    )
+    parser.add_argument(
+        "--in-flight", "-j",
+        default="1,3",
+        help="generate in-flight / segment GPU 동시 프롬프트 수, 콤마로 여러 값 비교 (기본: 1,3)"
+    )
+    parser.add_argument(
+        "--exec-time",
+        default=DEFAULT_EXEC_TIME,
+        help=f"생성 프롬프트 실행 시간 분포 (기본: {DEFAULT_EXEC_TIME})"
+    )
+    parser.add_argument(
+        "--segment-time",
+        default=DEFAULT_SEGMENT_TIME,
+        help=f"파츠 분리 프롬프트 실행 시간 분포 (기본: {DEFAULT_SEGMENT_TIME})"
+    )
+    parser.add_argument(
+        "--fail-rate",
+        type=float,
+        default=0.0,
+        help="실행 오류 주입 비율 (기본: 0)"
+    )
+    parser.add_argument(
+        "--http-error-rate",
+        type=float,
+        default=0.0,
+        help="503 주입 비율 (기본: 0)"
+    )
+    parser.add_argument(
+        "--rtt",
+        type=float,
+        default=0.0,
+        help="요청마다 더할 지연 (초, 기본: 0)"
+    )
+    parser.add_argument(
+        "--cache-prompts",
+        type=int,
+        default=1,
+        help="모의 서버 노드 캐시 크기 (기본: 1)"
+    )
+    parser.add_argument(
+        "--image-size",
+        type=int,
+        default=512,
+        help="모의 출력 이미지 크기 (기본: 512)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="모의 서버 난수 seed (기본: 0)"
+    )
+    parser.add_argument(
+        "--json",
+        help="결과를 JSON으로 저장 (CI 비교용)"
+    )
+
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenario.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        print(f"Error: Unknown scenario: {', '.join(unknown)} (available: {', '.join(SCENARIOS)})")
+        sys.exit(1)
+    in_flights = [int(v) for v in args.in_flight.split(",") if v.strip()]
+    parts = [p.strip() for p in args.parts.split(",")] if args.parts else list(PARTS_PROMPTS)
+
+    def start_mock() -> MockComfyUI:
+        return MockComfyUI(
+            exec_time=args.exec_time,
+            class_times={"Segment": args.segment_time},
+            fail_rate=args.fail_rate,
+            http_error_rate=args.http_error_rate,
+            rtt=args.rtt,
+            cache_prompts=args.cache_prompts,
+            image_size=args.image_size,
+            seed=args.seed
+        ).start()
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="load_test_") as work_dir:
+        work = Path(work_dir)
+        images = []
+        if any(s.startswith("segment") for s in scenarios):
+            png = figure_png(args.image_size)
+            for i in range(args.images):
+                path = work / "inputs" / f"load_{i:03d}.png"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(png)
+                images.append(str(path))
+
+        for scenario in scenarios:
+            for in_flight in ([None] if scenario == "segment-seq" else in_flights):
+                label = f"{scenario}" + (f" (in-flight {in_flight})" if in_flight else "")
+                print(f"Running {label}...")
+                mock = start_mock()
+                output_dir = str(work / f"{scenario}_{in_flight}")
+                try:
+                    if scenario == "generate":
+                        run = run_generate(mock, load_jobs(args.jobs, args.variants), in_flight, output_dir)
+                    elif scenario == "segment":
+                        run = run_segment(mock, images, in_flight, output_dir, parts)
+                    else:
+                        run = run_segment_sequential(mock, images, output_dir, parts)
+                    rows.append(summarize(scenario, in_flight, run, mock.snapshot()))
+                finally:
+                    mock.stop()
+
+    print_report(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2, ensure_ascii=False)
+        print(f"\nReport: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
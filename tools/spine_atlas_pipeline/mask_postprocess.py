@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Mask Post-processing
+====================
+파츠 마스크 겹침 해소 + 구멍 메우기 + 스펙클 제거
+
+GroundingDINO + SAM 마스크는 서로 겹친다 (hair vs head, weapon vs body).
+한 이미지의 모든 파츠 마스크를 (P, H, W) 배열 하나로 쌓고,
+SpineAtlasPacker.DEFAULT_PART_ORDER 기준 앞쪽(z-order 위) 파츠가 픽셀을 갖도록 정리한다.
+
+Usage:
+    python mask_postprocess.py --input parts/arcana_idle/ --source arcana_idle.png --output parts/arcana/
+    python mask_postprocess.py -i D:/AI/ComfyUI/output --prefix arcana_idle -s arcana_idle.png -o parts/arcana/
+
+Requirements:
+    pip install pillow numpy rectpack
+"""
+
+import os
+import re
+import sys
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    print("NumPy가 필요합니다: pip install numpy")
+    sys.exit(1)
+
+try:
+    from PIL import Image
+except ImportError:
+    print("Pillow가 필요합니다: pip install pillow")
+    sys.exit(1)
+
+from atlas_packer import SpineAtlasPacker
+from fast_segment import label_components, load_rgba
+
+
+# 분리 파츠명 → Spine z-order 파츠명
+PART_ORDER_ALIASES = {
+    "hair": "hair_front",
+    "accessory": "effect_front",
+}
+
+
+def z_rank(part_name: str) -> int:
+    """z-order 순위 (클수록 앞, 알 수 없는 파츠는 맨 앞 — Atlas 정렬과 동일)"""
+    order = SpineAtlasPacker.DEFAULT_PART_ORDER
+    name = PART_ORDER_ALIASES.get(part_name, part_name)
+    return order.index(name) if name in order else len(order)
+
+
+def part_mask(rgba: np.ndarray) -> np.ndarray:
+    """파츠 이미지 → bool 마스크 (알파가 없으면 검은 배경 기준)"""
+    alpha = rgba[..., 3]
+    if (alpha < 255).any():
+        return alpha > 127
+    return rgba[..., :3].max(axis=2) > 8
+
+
+def find_part_images(input_dir: str, prefix: Optional[str] = None) -> Dict[str, Path]:
+    """
+    파츠 이미지 검색
+
+    <part>.png (fast 백엔드) 와 <prefix>_<part>_00001_.png (ComfyUI SaveImage)
+    두 형식을 모두 인식한다. 같은 파츠가 여럿이면 마지막(최신 카운터) 파일을 쓴다.
+    """
+    pattern = re.compile(
+        rf"^(?:{re.escape(prefix)}_)?(?P<part>.+?)(?:_\d{{5}}_)?$" if prefix
+        else r"^(?P<part>.+?)(?:_\d{5}_)?$"
+    )
+    found = {}
+    for path in sorted(Path(input_dir).glob("*.png")):
+        if prefix and not path.stem.startswith(f"{prefix}_"):
+            continue
+        match = pattern.match(path.stem)
+        if match:
+            found[match.group("part")] = path
+    return found
+
+
+def load_mask_stack(
+    part_paths: Dict[str, Path]
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    파츠 마스크를 (P, H, W) bool 배열로 로드
+
+    Returns:
+        (파츠 이름 리스트, 마스크 스택, 파츠 RGBA 스택 (P, H, W, 4))
+    """
+    names = list(part_paths)
+    images = np.stack([load_rgba(str(part_paths[name])) for name in names])
+    masks = np.stack([part_mask(image) for image in images])
+    return names, masks, images
+
+
+def remove_speckles(masks: np.ndarray, min_area: int) -> np.ndarray:
+    """파츠별 min_area 미만 연결 요소 제거"""
+    cleaned = np.zeros_like(masks)
+    for i, mask in enumerate(masks):
+        labels, count = label_components(mask)
+        if count == 0:
+            continue
+        areas = np.bincount(labels.ravel(), minlength=count + 1)
+        keep = areas >= min_area
+        keep[0] = False
+        cleaned[i] = keep[labels]
+    return cleaned
+
+
+def resolve_overlaps(masks: np.ndarray, ranks: List[int]) -> np.ndarray:
+    """
+    픽셀별 소유 파츠 결정 (z-order가 가장 앞인 파츠가 소유)
+
+    Returns:
+        (H, W) int 배열, 파츠 인덱스 (-1 = 소유자 없음)
+    """
+    order = np.argsort(ranks, kind="stable")  # 뒤 → 앞
+    stacked = masks[order]
+    front = len(order) - 1 - stacked[::-1].argmax(axis=0)
+    return np.where(stacked.any(axis=0), order[front], -1)
+
+
+def fill_holes(
+    owner: np.ndarray,
+    part_index: int,
+    max_hole: int,
+    fillable: np.ndarray
+) -> int:
+    """
+    파츠 내부의 작은 구멍(테두리에 닿지 않는 배경 요소)을 메움 (owner 제자리 수정)
+
+    fillable(소유자 없는 전경 등)인 픽셀만 채운다. 채운 픽셀 수 반환.
+    """
+    outside = owner != part_index
+    labels, count = label_components(outside)
+    if count == 0:
+        return 0
+
+    areas = np.bincount(labels.ravel(), minlength=count + 1)
+    border = np.unique(np.concatenate([
+        labels[0], labels[-1], labels[:, 0], labels[:, -1]
+    ]))
+    is_hole = areas <= max_hole
+    is_hole[0] = False
+    is_hole[border] = False
+
+    hole = is_hole[labels] & fillable
+    owner[hole] = part_index
+    return int(hole.sum())
+
+
+def postprocess_masks(
+    names: List[str],
+    masks: np.ndarray,
+    min_area: int = 64,
+    max_hole: int = 256,
+    foreground: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    스펙클 제거 → 겹침 해소 → 조각 재배분 → 구멍 메우기
+
+    겹침 해소 후 남은 조각을 지우면 그 픽셀은 다음 순위 파츠에게 돌아간다
+    (예: head 위의 hair 부스러기 → head).
+
+    Args:
+        names: 파츠 이름
+        masks: (P, H, W) bool
+        min_area: 이보다 작은 연결 요소는 제거
+        max_hole: 이 크기 이하의 내부 구멍만 메움
+        foreground: 원본 전경 마스크 (있으면 전경 픽셀만 구멍 메우기 대상)
+
+    Returns:
+        (정리된 (P, H, W) 마스크, 통계)
+    """
+    ranks = [z_rank(name) for name in names]
+    claimed = int(masks.sum())
+
+    masks = remove_speckles(masks, min_area)
+    speckles = claimed - int(masks.sum())
+    duplicates = int(masks.sum()) - int(masks.any(axis=0).sum())
+    owner = resolve_overlaps(masks, ranks)
+
+    # 겹침 해소로 생긴 조각 제거 후 재배분
+    resolved = np.stack([owner == i for i in range(len(names))])
+    fragments = resolved & ~remove_speckles(resolved, min_area)
+    if fragments.any():
+        masks = masks & ~fragments
+        owner = resolve_overlaps(masks, ranks)
+
+    unowned = owner < 0
+    fillable = unowned if foreground is None else unowned & foreground
+    filled = 0
+    for i in np.argsort(ranks)[::-1]:  # 앞 파츠부터
+        filled += fill_holes(owner, int(i), max_hole, fillable)
+        fillable &= owner < 0
+
+    result = np.stack([owner == i for i in range(len(names))])
+    stats = {
+        "claimed_px": claimed,
+        "final_px": int(result.sum()),
+        "speckle_px_removed": speckles,
+        "duplicate_px_removed": duplicates,
+        "holes_filled_px": filled,
+    }
+    return result, stats
+
+
+def bbox_area(mask: np.ndarray) -> int:
+    """마스크 bounding box 넓이 (Atlas에서 차지하는 영역)"""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if len(rows) == 0:
+        return 0
+    return int((rows[-1] - rows[0] + 1) * (cols[-1] - cols[0] + 1))
+
+
+def postprocess_parts(
+    input_dir: str,
+    output_dir: str,
+    source_path: Optional[str] = None,
+    prefix: Optional[str] = None,
+    min_area: int = 64,
+    max_hole: int = 256
+) -> dict:
+    """
+    한 이미지의 파츠 마스크 정리 후 <output_dir>/<part>.png 저장
+
+    색상은 원본(source_path)이 있으면 원본에서, 없으면 각 파츠 이미지에서 가져온다.
+    캔버스 크기는 유지하고 마스크 밖은 RGB까지 0으로 비워서,
+    atlas_packer가 오프셋을 계산하며 빈틈없이 trim하도록 한다.
+    """
+    part_paths = find_part_images(input_dir, prefix)
+    if not part_paths:
+        raise FileNotFoundError(f"파츠 이미지를 찾을 수 없습니다: {input_dir}")
+
+    names, masks, images = load_mask_stack(part_paths)
+    source = load_rgba(source_path) if source_path else None
+    if source is not None and source.shape[:2] != masks.shape[1:]:
+        raise ValueError(
+            f"원본 크기 {source.shape[1]}x{source.shape[0]}와 "
+            f"파츠 크기 {masks.shape[2]}x{masks.shape[1]}가 다릅니다"
+        )
+
+    if source is None:
+        # 구멍 픽셀의 색을 알 수 없으므로 원본 없이는 메우지 않는다
+        foreground, max_hole = None, 0
+    else:
+        foreground = source[..., 3] > 16
+    cleaned, stats = postprocess_masks(names, masks, min_area, max_hole, foreground)
+
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    bbox_before = sum(bbox_area(mask) for mask in masks)
+    bbox_after = 0
+
+    for i, name in enumerate(names):
+        mask = cleaned[i]
+        colors = source if source is not None else images[i]
+        part = np.where(mask[..., None], colors, 0).astype(np.uint8)
+        Image.fromarray(part, "RGBA").save(os.path.join(output_dir, f"{name}.png"))
+        bbox_after += bbox_area(mask)
+        print(f"  - {name}: {int(masks[i].sum())} → {int(mask.sum())} px")
+
+    stats["parts"] = names
+    stats["bbox_area_before"] = bbox_before
+    stats["bbox_area_after"] = bbox_after
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Part mask post-processing (overlap / holes / speckles)"
+    )
+    parser.add_argument(
+        "--input", "-i",
+        required=True,
+        help="파츠 이미지 폴더"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        required=True,
+        help="정리된 파츠 출력 폴더"
+    )
+    parser.add_argument(
+        "--source", "-s",
+        help="원본 캐릭터 이미지 (색상/전경 기준, 없으면 구멍 메우기 생략)"
+    )
+    parser.add_argument(
+        "--prefix",
+        help="ComfyUI 출력 파일 prefix (예: arcana_idle → arcana_idle_head_00001_.png)"
+    )
+    parser.add_argument(
+        "--min-area",
+        type=int,
+        default=64,
+        help="스펙클로 볼 최대 연결 요소 크기 (기본: 64)"
+    )
+    parser.add_argument(
+        "--max-hole",
+        type=int,
+        default=256,
+        help="메울 구멍 최대 크기 (기본: 256)"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        stats = postprocess_parts(
+            args.input, args.output, args.source, args.prefix,
+            args.min_area, args.max_hole
+        )
+    except (FileNotFoundError, ValueError) as e:
+        print(f"오류: {e}")
+        sys.exit(1)
+
+    print("\n완료!")
+    print(f"  파츠 수: {len(stats['parts'])}")
+    print(f"  중복 픽셀 제거: {stats['duplicate_px_removed']} px")
+    print(f"  스펙클 제거: {stats['speckle_px_removed']} px")
+    print(f"  구멍 메움: {stats['holes_filled_px']} px")
+    print(f"  bbox 면적: {stats['bbox_area_before']} → {stats['bbox_area_after']} px")
+
+
+if __name__ == "__main__":
+    main()
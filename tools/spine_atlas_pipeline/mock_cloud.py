@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Mock Cloud Services
+===================
+Replicate / RunPod Serverless API 대역 서버 (표준 라이브러리만 사용)
+
+cloud_api_alternatives.py의 동기 대기(Prefer: wait, /runsync), 폴링 전환, webhook 경로를
+네트워크/API 키 없이 실행하기 위한 서버다. provider의 base_url을 이 서버로 돌려 쓴다.
+
+Replicate (base_url = <host>/v1):
+    POST /v1/predictions                 Prefer: wait=N이면 끝나거나 N초가 지날 때까지 응답 보류
+    GET  /v1/predictions/<id>
+    POST /v1/predictions/<id>/cancel
+    GET  /files/<id>/<i>.png             출력 이미지 (prediction output의 URL)
+
+RunPod (base_url = <host>/v2, endpoint id는 아무 값):
+    POST /v2/<endpoint>/run              바로 IN_QUEUE 응답
+    POST /v2/<endpoint>/runsync          끝나거나 --runsync-wait초가 지날 때까지 응답 보류
+    GET  /v2/<endpoint>/status/<id>
+    POST /v2/<endpoint>/cancel/<id>
+    출력은 worker-comfyui 형식({"filename", "type": "base64", "data"}), 워크플로우 SaveImage 이름 규칙
+
+요청에 webhook이 있으면 작업이 끝난 뒤 --webhook-delay초 후 최종 상태 JSON을 그 URL로 POST한다.
+GET /mock/stats는 요청/동기 완료/webhook 전송 수 등 서버 측 통계다.
+
+Usage:
+    python mock_cloud.py --port 8199 --run-time uniform:2,4 --runsync-wait 1
+    python cloud_api_alternatives.py -s replicate -c arcana \\
+        --base-url replicate=http://localhost:8199/v1   # 다른 터미널에서 (REPLICATE_API_TOKEN은 아무 값)
+"""
+
+import json
+import time
+import uuid
+import base64
+import random
+import argparse
+import threading
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mock_comfyui import parse_distribution, figure_png, batch_sizes
+
+DEFAULT_MOCK_CLOUD_PORT = 8199
+DEFAULT_RUN_TIME = "uniform:1,2"
+DEFAULT_RUNSYNC_WAIT = 90.0
+DEFAULT_IMAGE_SIZE = 64
+
+# 서비스별 상태 이름 (대기, 실행, 성공, 실패, 취소)
+REPLICATE_STATES = ("starting", "processing", "succeeded", "failed", "canceled")
+RUNPOD_STATES = ("IN_QUEUE", "IN_PROGRESS", "COMPLETED", "FAILED", "CANCELLED")
+
+
+class MockCloud:
+    """Replicate / RunPod API를 흉내 내는 서버 (start()로 백그라운드 실행, .host로 접속)"""
+
+    def __init__(
+        self,
+        port: int = 0,
+        bind: str = "127.0.0.1",
+        queue_time: str = "fixed:0",
+        run_time: str = DEFAULT_RUN_TIME,
+        runsync_wait: float = DEFAULT_RUNSYNC_WAIT,
+        fail_rate: float = 0.0,
+        webhook_delay: float = 0.0,
+        drop_webhooks: bool = False,
+        image_size: int = DEFAULT_IMAGE_SIZE,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            port: 포트 (0이면 빈 포트)
+            queue_time: 작업이 실행을 시작하기까지의 시간 분포
+            run_time: 실행 시간 분포
+            runsync_wait: RunPod /runsync가 응답을 보류하는 최대 시간 (초)
+            fail_rate: 실패로 끝나는 작업 비율
+            webhook_delay: 완료 후 webhook을 보내기까지의 지연 (초)
+            drop_webhooks: webhook을 보내지 않음 (폴링 대체 경로 확인용)
+            image_size: 출력 이미지 한 변 크기
+            seed: 분포/실패 주입 난수 seed
+        """
+        self.queue_time = parse_distribution(queue_time)
+        self.run_time = parse_distribution(run_time)
+        self.runsync_wait = runsync_wait
+        self.fail_rate = fail_rate
+        self.webhook_delay = webhook_delay
+        self.drop_webhooks = drop_webhooks
+        self.image = figure_png(image_size)
+        self.rng = random.Random(seed)
+
+        self.lock = threading.Condition()
+        self.jobs = {}   # id -> {"api", "created", "started", "finished", "failed", "cancelled", ...}
+        self.stats = {
+            "requests": 0, "created": 0, "sync_completed": 0, "status_polls": 0,
+            "cancelled": 0, "webhooks_sent": 0, "webhooks_failed": 0, "files": 0,
+        }
+
+        self.server = ThreadingHTTPServer((bind, port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_port
+        self.host = f"http://{'127.0.0.1' if bind in ('0.0.0.0', '') else bind}:{self.port}"
+        self.thread = None
+        self.closed = False
+
+    def start(self) -> "MockCloud":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot(self) -> Dict:
+        """서버 측 통계 (/mock/stats)"""
+        with self.lock:
+            return dict(self.stats, jobs=len(self.jobs))
+
+    # ---- 작업 ----
+
+    def create(self, api: str, body: Dict) -> Dict:
+        """작업 생성 (시작/종료 시각을 미리 정하고 webhook 전송 예약)"""
+        now = time.time()
+        with self.lock:
+            queued = self.queue_time(self.rng)
+            running = self.run_time(self.rng)
+            failed = self.fail_rate and self.rng.random() < self.fail_rate
+        job_id = uuid.uuid4().hex
+        job = {
+            "api": api,
+            "id": job_id,
+            "created": now,
+            "started": now + queued,
+            "finished": now + queued + running,
+            "failed": bool(failed),
+            "cancelled": False,
+            "webhook": body.get("webhook"),
+            "input": body.get("input", {}),
+        }
+        job["outputs"] = self._outputs(job)
+        with self.lock:
+            self.jobs[job_id] = job
+            self.stats["created"] += 1
+        if job["webhook"]:
+            threading.Thread(target=self._push_webhook, args=(job,), daemon=True).start()
+        return job
+
+    def _outputs(self, job: Dict) -> List:
+        """Replicate: 파일 URL 목록, RunPod: 워크플로우 SaveImage 이름의 base64 이미지"""
+        if job["api"] == "replicate":
+            count = int(job["input"].get("num_outputs", 1))
+            return [f"{self.host}/files/{job['id']}/{i}.png" for i in range(count)]
+
+        workflow = job["input"].get("workflow") or {}
+        sizes = batch_sizes(workflow)
+        data = base64.b64encode(self.image).decode("ascii")
+        images, counters = [], {}
+        for node_id, node in workflow.items():
+            if node.get("class_type") != "SaveImage":
+                continue
+            prefix = str(node.get("inputs", {}).get("filename_prefix", "ComfyUI"))
+            name = prefix.rpartition("/")[2]
+            for _ in range(sizes.get(node_id, 1)):
+                counters[name] = counters.get(name, 0) + 1
+                images.append({"filename": f"{name}_{counters[name]:05d}_.png",
+                               "type": "base64", "data": data})
+        return images
+
+    def state(self, job: Dict, now: Optional[float] = None) -> int:
+        """상태 인덱스 (REPLICATE_STATES / RUNPOD_STATES 순서)"""
+        now = time.time() if now is None else now
+        if job["cancelled"]:
+            return 4
+        if now < job["started"]:
+            return 0
+        if now < job["finished"]:
+            return 1
+        return 3 if job["failed"] else 2
+
+    def describe(self, job: Dict) -> Dict:
+        """서비스 형식의 작업 상태 JSON"""
+        index = self.state(job)
+        if job["api"] == "replicate":
+            payload = {
+                "id": job["id"],
+                "status": REPLICATE_STATES[index],
+                "input": job["input"],
+                "output": job["outputs"] if index == 2 else None,
+                "error": "Injected failure" if index == 3 else None,
+                "urls": {"get": f"{self.host}/v1/predictions/{job['id']}",
+                         "cancel": f"{self.host}/v1/predictions/{job['id']}/cancel"},
+            }
+        else:
+            payload = {"id": job["id"], "status": RUNPOD_STATES[index]}
+            if index == 2:
+                payload["output"] = {"images": job["outputs"]}
+            elif index == 3:
+                payload["error"] = "Injected failure"
+        return payload
+
+    def wait_done(self, job: Dict, seconds: float) -> bool:
+        """작업이 끝나거나 seconds가 지날 때까지 대기 (끝났으면 True)"""
+        deadline = time.time() + seconds
+        with self.lock:
+            while not self.closed and self.state(job) < 2:
+                remaining = min(deadline, job["finished"]) - time.time()
+                if remaining <= 0:
+                    break
+                self.lock.wait(remaining)
+            return self.state(job) >= 2
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if self.state(job) < 2:
+                job["cancelled"] = True
+                self.stats["cancelled"] += 1
+                self.lock.notify_all()
+        return job
+
+    def _push_webhook(self, job: Dict):
+        """완료(또는 취소) 후 webhook_delay 뒤 최종 상태 POST"""
+        with self.lock:
+            while not self.closed and self.state(job) < 2:
+                self.lock.wait(max(0.0, job["finished"] - time.time()))
+            if self.closed:
+                return
+        time.sleep(self.webhook_delay)
+        if self.drop_webhooks:
+            return
+        request = urllib.request.Request(
+            job["webhook"],
+            data=json.dumps(self.describe(job)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                response.read()
+            key = "webhooks_sent"
+        except OSError:
+            key = "webhooks_failed"
+        with self.lock:
+            self.stats[key] += 1
+
+    def lookup(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    # ---- HTTP ----
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, code: int, payload=None, body: Optional[bytes] = None,
+                       content_type: str = "application/json"):
+                if body is None:
+                    body = json.dumps(payload if payload is not None else {}).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self) -> Dict:
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    data = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                except json.JSONDecodeError:
+                    return {}
+                return data if isinstance(data, dict) else {}
+
+            def _count(self, key: str = "requests"):
+                with mock.lock:
+                    mock.stats[key] += 1
+
+            def _route(self) -> Tuple[str, List[str]]:
+                """("replicate" | "runpod" | "files" | "", 나머지 경로 조각)"""
+                parts = [p for p in urlparse(self.path).path.split("/") if p]
+                if parts[:1] == ["v1"]:
+                    return "replicate", parts[1:]
+                if parts[:1] == ["v2"] and len(parts) >= 2:
+                    return "runpod", parts[2:]
+                if parts[:1] == ["files"]:
+                    return "files", parts[1:]
+                if parts == ["mock", "stats"]:
+                    return "stats", []
+                return "", parts
+
+            def do_GET(self):
+                self._count()
+                api, parts = self._route()
+                if api == "stats":
+                    return self._reply(200, mock.snapshot())
+                if api == "files" and len(parts) == 2:
+                    job = mock.lookup(parts[0])
+                    if job is None or mock.state(job) != 2:
+                        return self._reply(404, {"detail": "Not found"})
+                    self._count("files")
+                    return self._reply(200, body=mock.image, content_type="image/png")
+                if (api == "replicate" and len(parts) == 2 and parts[0] == "predictions") or \
+                        (api == "runpod" and len(parts) == 2 and parts[0] == "status"):
+                    job = mock.lookup(parts[1])
+                    if job is None or job["api"] != api:
+                        return self._reply(404, {"detail": "Not found"})
+                    self._count("status_polls")
+                    return self._reply(200, mock.describe(job))
+                self._reply(404, {"detail": "Not found"})
+
+            def do_POST(self):
+                self._count()
+                api, parts = self._route()
+                body = self._json()
+                if api == "replicate" and parts == ["predictions"]:
+                    job = mock.create("replicate", body)
+                    prefer = self.headers.get("Prefer", "")
+                    if prefer.startswith("wait"):
+                        _, _, seconds = prefer.partition("=")
+                        self._sync(job, float(seconds or 60))
+                    return self._reply(201, mock.describe(job))
+                if api == "replicate" and len(parts) == 3 and parts[2] == "cancel":
+                    job = mock.cancel(parts[1])
+                    return self._reply(200 if job else 404, mock.describe(job) if job else None)
+                if api == "runpod" and parts in (["run"], ["runsync"]):
+                    job = mock.create("runpod", body)
+                    if parts == ["runsync"]:
+                        self._sync(job, mock.runsync_wait)
+                    return self._reply(200, mock.describe(job))
+                if api == "runpod" and len(parts) == 2 and parts[0] == "cancel":
+                    job = mock.cancel(parts[1])
+                    return self._reply(200 if job else 404, mock.describe(job) if job else None)
+                self._reply(404, {"detail": "Not found"})
+
+            def _sync(self, job: Dict, seconds: float):
+                if mock.wait_done(job, seconds):
+                    self._count("sync_completed")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a mock Replicate / RunPod API server for offline tests"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_MOCK_CLOUD_PORT,
+        help=f"포트 (기본: {DEFAULT_MOCK_CLOUD_PORT})"
+    )
+    parser.add_argument(
+        "--bind",
+        default="127.0.0.1",
+        help="바인드 주소 (기본: 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--queue-time",
+        default="fixed:0",
+        help="실행 시작까지의 시간 분포 (기본: fixed:0)"
+    )
+    parser.add_argument(
+        "--run-time",
+        default=DEFAULT_RUN_TIME,
+        help=f"실행 시간 분포 (기본: {DEFAULT_RUN_TIME})"
+    )
+    parser.add_argument(
+        "--runsync-wait",
+        type=float,
+        default=DEFAULT_RUNSYNC_WAIT,
+        help=f"RunPod /runsync 최대 보류 시간 (초, 기본: {DEFAULT_RUNSYNC_WAIT:.0f})"
+    )
+    parser.add_argument(
+        "--fail-rate",
+        type=float,
+        default=0.0,
+        help="실패로 끝나는 작업 비율 (기본: 0)"
+    )
+    parser.add_argument(
+        "--webhook-delay",
+        type=float,
+        default=0.0,
+        help="완료 후 webhook 전송 지연 (초, 기본: 0)"
+    )
+    parser.add_argument(
+        "--drop-webhooks",
+        action="store_true",
+        help="webhook을 보내지 않음 (폴링 대체 경로 확인용)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="난수 seed"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        mock = MockCloud(
+            args.port, args.bind, args.queue_time, args.run_time,
+            runsync_wait=args.runsync_wait,
+            fail_rate=args.fail_rate,
+            webhook_delay=args.webhook_delay,
+            drop_webhooks=args.drop_webhooks,
+            seed=args.seed
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    mock.start()
+    print(f"Mock cloud on {mock.host} (Replicate {mock.host}/v1, RunPod {mock.host}/v2, Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stats = mock.snapshot()
+        mock.stop()
+        print(f"\n  Jobs: {stats['created']} ({stats['sync_completed']} finished in sync wait, "
+              f"{stats['status_polls']} status polls, {stats['webhooks_sent']} webhooks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,849 @@
+#!/usr/bin/env python3
+"""
+Mock ComfyUI Server
+===================
+GPU 없이 파이프라인 스크립트를 실행/측정하기 위한 ComfyUI API 대역 서버 (표준 라이브러리만 사용)
+
+구현 엔드포인트:
+    POST /prompt            검증(노드 연결, LoadImage 입력, 출력 노드) 후 큐에 추가
+    GET  /queue             queue_running / queue_pending
+    POST /queue             {"delete": [prompt_id, ...]} 또는 {"clear": true}
+    GET  /history[/<id>]    완료 항목 (status.messages에 execution_cached 포함, outputs)
+    POST /history           {"delete": [...]} 또는 {"clear": true}
+    GET  /view              출력/입력 이미지 (HEAD로 존재 확인 가능)
+    POST /upload/image      multipart 업로드 (overwrite 아니면 "name (1).png"로 이름 변경)
+    POST /interrupt         실행 중인 프롬프트 중단 ({"prompt_id"}가 있으면 일치할 때만)
+    GET  /system_stats      가짜 GPU (vram_total 설정 가능)
+    GET  /ws?clientId=      WebSocket: status, execution_start, execution_cached, executing,
+                            progress, executed, execution_success / execution_error / execution_interrupted
+    GET  /mock/stats        처리량, GPU 사용 시간, 노드 캐시 적중 등 서버 측 통계
+
+실행 모델:
+    GPU 하나를 흉내 내는 실행 스레드가 큐를 FIFO로 처리한다. 프롬프트 실행 시간은
+    분포에서 뽑은 값 × (캐시되지 않은 노드 비율) × 배치 크기로 정한다.
+    노드 캐시는 최근 --cache-prompts개 프롬프트에서 실행한 노드 서명(node_signatures)과
+    같은 노드를 건너뛴 것으로 본다.
+
+분포 형식 (--exec-time, --class-time):
+    fixed:2.0  uniform:1,3  normal:2,0.5  exp:2  lognormal:<중앙값>,<sigma>
+
+Usage:
+    python mock_comfyui.py --port 8188 --exec-time lognormal:4,0.3
+    python mock_comfyui.py --port 8188 --exec-time uniform:1,2 --class-time GroundingDino=fixed:0.4 \\
+        --fail-rate 0.05 --http-error-rate 0.02
+    python batch_generate.py -c arcana --host http://localhost:8188   # 다른 터미널에서
+"""
+
+import io
+import json
+import math
+import time
+import uuid
+import zlib
+import base64
+import random
+import struct
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict, deque
+from email import policy
+from email.parser import BytesParser
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MOCK_PORT = 8188
+DEFAULT_EXEC_TIME = "uniform:1.5,2.5"
+DEFAULT_VRAM_GB = 24
+DEFAULT_IMAGE_SIZE = 1024
+MAX_HISTORY = 10000
+OUTPUT_NODES = ("SaveImage", "PreviewImage")
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def node_signatures(workflow: Dict) -> Dict[str, str]:
+    """
+    노드별 서명 (class_type + 입력, 링크 입력은 상위 노드 서명으로 치환)
+
+    서명이 같은 노드는 ComfyUI 캐시 관점에서 같은 출력을 낸다.
+    """
+    signatures = {}
+
+    def sign(node_id: str) -> str:
+        if node_id in signatures:
+            return signatures[node_id]
+        node = workflow[node_id]
+        inputs = {}
+        for name, value in node.get("inputs", {}).items():
+            if isinstance(value, list) and len(value) == 2 and str(value[0]) in workflow:
+                inputs[name] = ["link", sign(str(value[0])), value[1]]
+            else:
+                inputs[name] = value
+        payload = json.dumps(
+            {"class_type": node["class_type"], "inputs": inputs},
+            sort_keys=True, ensure_ascii=False
+        )
+        signatures[node_id] = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        return signatures[node_id]
+
+    for node_id in workflow:
+        sign(node_id)
+    return signatures
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """"uniform:1,3" 형식 → rng를 받아 초 단위 값을 뽑는 함수 (음수는 0)"""
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(",") if v.strip()]
+    except ValueError:
+        raise ValueError(f"Invalid distribution: {spec}")
+    samplers = {
+        ("fixed", 1): lambda rng: values[0],
+        ("uniform", 2): lambda rng: rng.uniform(values[0], values[1]),
+        ("normal", 2): lambda rng: rng.gauss(values[0], values[1]),
+        ("exp", 1): lambda rng: rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0,
+        ("lognormal", 2): lambda rng: rng.lognormvariate(math.log(values[0]), values[1]),
+    }
+    sampler = samplers.get((kind.strip().lower(), len(values)))
+    if sampler is None:
+        raise ValueError(f"Invalid distribution: {spec} "
+                         "(fixed:s, uniform:a,b, normal:mean,sd, exp:mean, lognormal:median,sigma)")
+    return lambda rng: max(0.0, sampler(rng))
+
+
+def figure_png(size: int = DEFAULT_IMAGE_SIZE) -> bytes:
+    """투명 배경 위 머리/몸/다리 블록으로 된 RGBA PNG (fast_segment, atlas_packer가 처리할 수 있는 형태)"""
+    blocks = [
+        # (y0, y1, x0, x1) 비율, RGBA
+        ((0.06, 0.30, 0.36, 0.64), (240, 200, 170, 255)),
+        ((0.30, 0.68, 0.30, 0.70), (60, 80, 200, 255)),
+        ((0.68, 0.95, 0.38, 0.62), (40, 40, 40, 255)),
+    ]
+    rows = []
+    transparent = b"\x00\x00\x00\x00"
+    for y in range(size):
+        row = bytearray(transparent * size)
+        for (y0, y1, x0, x1), color in blocks:
+            if y0 * size <= y < y1 * size:
+                start, end = int(x0 * size), int(x1 * size)
+                row[start * 4:end * 4] = bytes(color) * (end - start)
+        rows.append(b"\x00" + bytes(row))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(b"".join(rows), 6)) + chunk(b"IEND", b""))
+
+
+def batch_sizes(prompt: Dict) -> Dict[str, int]:
+    """노드별 출력 배치 크기 (EmptyLatentImage batch_size, RepeatLatentBatch amount, ImageFromBatch length)"""
+    sizes = {}
+
+    def size_of(node_id: str, seen=()) -> int:
+        if node_id in sizes:
+            return sizes[node_id]
+        node = prompt.get(node_id, {})
+        inputs = node.get("inputs", {})
+        upstream = [
+            size_of(value[0], seen + (node_id,)) for value in inputs.values()
+            if isinstance(value, list) and value and value[0] in prompt and value[0] not in seen
+        ]
+        size = max(upstream, default=1)
+        class_type = node.get("class_type", "")
+        if class_type == "EmptyLatentImage":
+            size = int(inputs.get("batch_size", 1))
+        elif class_type == "RepeatLatentBatch":
+            size *= int(inputs.get("amount", 1))
+        elif class_type == "ImageFromBatch":
+            size = int(inputs.get("length", 1))
+        sizes[node_id] = max(1, size)
+        return sizes[node_id]
+
+    for node_id in prompt:
+        size_of(node_id)
+    return sizes
+
+
+class MockComfyUI:
+    """ComfyUI API를 흉내 내는 서버 (start()로 백그라운드 실행, .host로 접속)"""
+
+    def __init__(
+        self,
+        port: int = 0,
+        bind: str = "127.0.0.1",
+        exec_time: str = DEFAULT_EXEC_TIME,
+        class_times: Optional[Dict[str, str]] = None,
+        fail_rate: float = 0.0,
+        reject_rate: float = 0.0,
+        http_error_rate: float = 0.0,
+        rtt: float = 0.0,
+        cache_prompts: int = 1,
+        vram_gb: float = DEFAULT_VRAM_GB,
+        image_size: int = DEFAULT_IMAGE_SIZE,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            port: 포트 (0이면 빈 포트)
+            exec_time: 캐시 없는 프롬프트 하나의 실행 시간 분포
+            class_times: class_type에 이 문자열이 들어간 노드가 있는 프롬프트의 실행 시간 분포
+            fail_rate: 실행 중 오류(execution_error)로 끝나는 비율
+            reject_rate: /prompt에서 검증 실패(400)로 거절하는 비율
+            http_error_rate: 임의 요청에 503을 돌려주는 비율 (재시도 경로 확인용, /ws 제외)
+            rtt: 요청마다 더하는 지연 (초, 네트워크 왕복 흉내)
+            cache_prompts: 노드 캐시가 기억하는 최근 프롬프트 수 (0이면 캐시 없음)
+            vram_gb: /system_stats vram_total
+            image_size: 출력 이미지 한 변 크기
+            seed: 분포/실패 주입 난수 seed
+        """
+        self.exec_time = parse_distribution(exec_time)
+        self.class_times = [
+            (pattern, parse_distribution(spec)) for pattern, spec in (class_times or {}).items()
+        ]
+        self.fail_rate = fail_rate
+        self.reject_rate = reject_rate
+        self.http_error_rate = http_error_rate
+        self.rtt = rtt
+        self.vram_total = int(vram_gb * 1024 ** 3)
+        self.image = figure_png(image_size)
+        self.rng = random.Random(seed)
+
+        self.lock = threading.Condition()
+        self.pending = deque()        # (number, prompt_id, prompt, client_id)
+        self.running = None           # (number, prompt_id, prompt, client_id)
+        self.interrupt = threading.Event()
+        self.history = OrderedDict()
+        self.timings = OrderedDict()  # prompt_id -> {"queued", "started", "finished"}
+        self.outputs = set()          # "subfolder/filename"
+        self.counters = {}            # filename_prefix -> 마지막 번호
+        self.inputs = {}              # input 폴더 이름 -> bytes
+        self.cache = deque(maxlen=max(0, cache_prompts)) if cache_prompts else None
+        self.ui_cache = {}            # 출력 노드 서명 -> 마지막 출력 (캐시된 노드도 history에 남김)
+        self.number = 0
+        self.sockets = {}             # client_id -> [WebSocket 연결]
+        self.started = time.time()
+        self.stats = {
+            "requests": 0, "http_errors": 0, "prompts": 0, "rejected": 0, "completed": 0,
+            "failed": 0, "interrupted": 0, "deleted": 0, "uploads": 0, "views": 0,
+            "view_bytes": 0, "nodes": 0, "cached_nodes": 0, "busy": 0.0,
+        }
+
+        self.server = ThreadingHTTPServer((bind, port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_port
+        self.host = f"http://{'127.0.0.1' if bind in ('0.0.0.0', '') else bind}:{self.port}"
+        self.threads = []
+        self.closed = False
+
+    def start(self) -> "MockComfyUI":
+        for target in (self.server.serve_forever, self._execute_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+        self.interrupt.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot(self) -> Dict:
+        """서버 측 통계 (/mock/stats)"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats["queue_pending"] = len(self.pending)
+            stats["queue_running"] = 1 if self.running else 0
+        elapsed = time.time() - self.started
+        stats["uptime"] = round(elapsed, 3)
+        stats["busy"] = round(stats["busy"], 3)
+        stats["utilization"] = round(stats["busy"] / elapsed, 3) if elapsed > 0 else 0.0
+        stats["cache_hit_rate"] = round(stats["cached_nodes"] / stats["nodes"], 3) if stats["nodes"] else 0.0
+        return stats
+
+    # ---- /prompt 검증, 큐 ----
+
+    def validate(self, prompt) -> Optional[Dict]:
+        """ComfyUI 형식의 검증 오류 (없으면 None)"""
+        if not isinstance(prompt, dict) or not prompt:
+            return {"type": "invalid_prompt", "message": "Cannot execute because prompt is empty",
+                    "details": "", "extra_info": {}}
+        node_errors = {}
+        for node_id, node in prompt.items():
+            if not isinstance(node, dict) or "class_type" not in node:
+                return {"type": "invalid_prompt",
+                        "message": f"Cannot execute because node {node_id} is missing the class_type property.",
+                        "details": f"Node ID '#{node_id}'", "extra_info": {}}
+            errors = []
+            for name, value in node.get("inputs", {}).items():
+                if isinstance(value, list) and len(value) == 2 and isinstance(value[1], int) \
+                        and value[0] not in prompt:
+                    errors.append({"type": "required_input_missing", "message": "Required input is missing",
+                                   "details": name, "extra_info": {"input_name": name}})
+            if node["class_type"] == "LoadImage" and node.get("inputs", {}).get("image") not in self.inputs:
+                image = node.get("inputs", {}).get("image")
+                errors.append({"type": "custom_validation_failed", "message": "Custom validation failed for node",
+                               "details": f"image - Invalid image file: {image}", "extra_info": {}})
+            if errors:
+                node_errors[node_id] = {"errors": errors, "dependent_outputs": [], "class_type": node["class_type"]}
+        if not any(node.get("class_type") in OUTPUT_NODES for node in prompt.values()):
+            return {"type": "prompt_no_outputs", "message": "Prompt has no outputs",
+                    "details": "", "extra_info": {}}
+        if node_errors:
+            return {"type": "prompt_outputs_failed_validation", "message": "Prompt outputs failed validation",
+                    "details": "", "extra_info": {}, "node_errors": node_errors}
+        return None
+
+    def enqueue(self, prompt: Dict, client_id: Optional[str]) -> Tuple[int, Dict]:
+        """POST /prompt 처리 (상태 코드, 응답 본문)"""
+        error = self.validate(prompt)
+        with self.lock:
+            if error is None and self.reject_rate and self.rng.random() < self.reject_rate:
+                error = {"type": "prompt_outputs_failed_validation", "message": "Injected validation failure",
+                         "details": "", "extra_info": {}}
+            if error is not None:
+                self.stats["rejected"] += 1
+                return 400, {"error": error, "node_errors": error.pop("node_errors", {})}
+            prompt_id = str(uuid.uuid4())
+            self.number += 1
+            self.pending.append((self.number, prompt_id, prompt, client_id))
+            self.timings[prompt_id] = {"queued": time.time(), "started": None, "finished": None}
+            self.stats["prompts"] += 1
+            self.lock.notify_all()
+            number = self.number
+        self._broadcast_status()
+        return 200, {"prompt_id": prompt_id, "number": number, "node_errors": {}}
+
+    def queue_state(self) -> Dict:
+        with self.lock:
+            return {
+                "queue_running": [self._queue_item(self.running)] if self.running else [],
+                "queue_pending": [self._queue_item(item) for item in self.pending],
+            }
+
+    @staticmethod
+    def _queue_item(item) -> List:
+        number, prompt_id, prompt, client_id = item
+        outputs = [node_id for node_id, node in prompt.items() if node["class_type"] in OUTPUT_NODES]
+        return [number, prompt_id, prompt, {"client_id": client_id}, outputs]
+
+    def delete_pending(self, prompt_ids: Optional[List[str]] = None):
+        """prompt_ids가 None이면 대기 중 전체 삭제"""
+        with self.lock:
+            keep = deque(item for item in self.pending
+                         if prompt_ids is not None and item[1] not in prompt_ids)
+            for item in self.pending:
+                if item not in keep:
+                    self.timings.pop(item[1], None)
+                    self.stats["deleted"] += 1
+            self.pending = keep
+        self._broadcast_status()
+
+    def interrupt_running(self, prompt_id: Optional[str] = None):
+        with self.lock:
+            if self.running and (prompt_id is None or self.running[1] == prompt_id):
+                self.interrupt.set()
+
+    # ---- 실행 ----
+
+    def _execute_loop(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.closed:
+                    self.lock.wait()
+                if self.closed:
+                    return
+                self.running = self.pending.popleft()
+                self.interrupt.clear()
+            self._broadcast_status()
+            started = time.time()
+            self._execute(*self.running)
+            with self.lock:
+                self.stats["busy"] += time.time() - started
+                self.running = None
+            self._broadcast_status()
+
+    def _duration(self, prompt: Dict) -> float:
+        classes = [node["class_type"] for node in prompt.values()]
+        for pattern, sampler in self.class_times:
+            if any(pattern in class_type for class_type in classes):
+                return sampler(self.rng)
+        return self.exec_time(self.rng)
+
+    def _execute(self, number: int, prompt_id: str, prompt: Dict, client_id: Optional[str]):
+        signatures = node_signatures(prompt)
+        with self.lock:
+            remembered = set().union(*self.cache) if self.cache else set()
+            duration = self._duration(prompt)
+            fail_at = self.rng.random() if self.fail_rate and self.rng.random() < self.fail_rate else None
+            self.timings[prompt_id]["started"] = time.time()
+        cached = [node_id for node_id, signature in signatures.items() if signature in remembered]
+        to_run = [node_id for node_id in prompt if node_id not in cached]
+        sizes = batch_sizes(prompt)
+        batch = max((sizes[node_id] for node_id in to_run), default=1)
+        per_node = duration * batch / len(prompt)
+
+        messages = []
+
+        def emit(event: str, data: Dict):
+            data = dict(data, prompt_id=prompt_id, timestamp=int(time.time() * 1000))
+            if event in ("execution_start", "execution_cached", "execution_success",
+                         "execution_error", "execution_interrupted"):
+                messages.append([event, data])
+            self._send(client_id, event, data)
+
+        emit("execution_start", {})
+        emit("execution_cached", {"nodes": cached})
+        outputs, status = {}, "success"
+        with self.lock:
+            for node_id in cached:
+                if signatures[node_id] in self.ui_cache:
+                    outputs[node_id] = self.ui_cache[signatures[node_id]]
+        for index, node_id in enumerate(to_run):
+            class_type = prompt[node_id]["class_type"]
+            emit("executing", {"node": node_id, "display_node": node_id})
+            if fail_at is not None and index >= int(fail_at * len(to_run)):
+                emit("execution_error", {
+                    "node_id": node_id, "node_type": class_type, "executed": to_run[:index],
+                    "exception_message": "Injected failure", "exception_type": "RuntimeError",
+                    "traceback": [], "current_inputs": {}, "current_outputs": {},
+                })
+                status = "error"
+                break
+            if "Sampler" in class_type:
+                steps = int(prompt[node_id].get("inputs", {}).get("steps", 20))
+                for step in range(1, steps + 1):
+                    if self.interrupt.wait(per_node / steps):
+                        break
+                    self._send(client_id, "progress", {"value": step, "max": steps,
+                                                       "prompt_id": prompt_id, "node": node_id})
+            else:
+                self.interrupt.wait(per_node)
+            if self.interrupt.is_set():
+                emit("execution_interrupted", {"node_id": node_id, "node_type": class_type,
+                                               "executed": to_run[:index]})
+                status = "interrupted"
+                break
+            if class_type in OUTPUT_NODES:
+                outputs[node_id] = {"images": self._save_outputs(prompt[node_id], sizes[node_id], class_type)}
+                emit("executed", {"node": node_id, "display_node": node_id, "output": outputs[node_id]})
+        if status == "success":
+            emit("executing", {"node": None})
+            emit("execution_success", {})
+
+        with self.lock:
+            if self.cache is not None and status == "success":
+                self.cache.append(set(signatures.values()))
+                remembered = set().union(*self.cache)
+                for node_id, output in outputs.items():
+                    self.ui_cache[signatures[node_id]] = output
+                self.ui_cache = {
+                    signature: output for signature, output in self.ui_cache.items()
+                    if signature in remembered
+                }
+            self.stats["nodes"] += len(prompt)
+            self.stats["cached_nodes"] += len(cached)
+            self.stats["completed" if status == "success" else
+                       "failed" if status == "error" else "interrupted"] += 1
+            self.timings[prompt_id]["finished"] = time.time()
+            self.history[prompt_id] = {
+                "prompt": [number, prompt_id, prompt, {"client_id": client_id}, list(outputs)],
+                "outputs": outputs,
+                "status": {
+                    "status_str": "success" if status == "success" else "error",
+                    "completed": status == "success",
+                    "messages": messages,
+                },
+                "meta": {},
+            }
+            while len(self.history) > MAX_HISTORY:
+                old_id, _ = self.history.popitem(last=False)
+                self.timings.pop(old_id, None)
+
+    def _save_outputs(self, node: Dict, count: int, class_type: str) -> List[Dict]:
+        """SaveImage 규칙대로 <subfolder>/<prefix>_00001_.png 이름 부여"""
+        folder_type = "output" if class_type == "SaveImage" else "temp"
+        prefix = str(node.get("inputs", {}).get("filename_prefix", "ComfyUI"))
+        subfolder, _, name = prefix.rpartition("/")
+        images = []
+        with self.lock:
+            for _ in range(count):
+                self.counters[prefix] = self.counters.get(prefix, 0) + 1
+                filename = f"{name}_{self.counters[prefix]:05d}_.png"
+                self.outputs.add(f"{folder_type}:{subfolder}/{filename}")
+                images.append({"filename": filename, "subfolder": subfolder, "type": folder_type})
+        return images
+
+    # ---- /upload/image, /view ----
+
+    def upload(self, content_type: str, body: bytes) -> Tuple[int, Dict]:
+        message = BytesParser(policy=policy.HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+        )
+        fields, image = {}, None
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "image" and part.get_filename():
+                image = (part.get_filename(), part.get_payload(decode=True) or b"")
+            elif name:
+                fields[name] = (part.get_payload(decode=True) or b"").decode("utf-8", "replace")
+        if image is None:
+            return 400, {"error": "No image uploaded"}
+
+        filename, data = image
+        subfolder = fields.get("subfolder", "")
+        stem, dot, ext = filename.rpartition(".")
+        with self.lock:
+            name = filename
+            if fields.get("overwrite", "").lower() not in ("true", "1"):
+                i = 1
+                while "/".join(filter(None, [subfolder, name])) in self.inputs:
+                    name = f"{stem} ({i}){dot}{ext}" if dot else f"{filename} ({i})"
+                    i += 1
+            self.inputs["/".join(filter(None, [subfolder, name]))] = data
+            self.stats["uploads"] += 1
+        return 200, {"name": name, "subfolder": subfolder, "type": fields.get("type", "input")}
+
+    def view(self, filename: str, subfolder: str, folder_type: str) -> Optional[bytes]:
+        if folder_type == "input":
+            return self.inputs.get("/".join(filter(None, [subfolder, filename])))
+        if f"{folder_type}:{subfolder}/{filename}" in self.outputs:
+            return self.image
+        return None
+
+    # ---- WebSocket ----
+
+    def _send(self, client_id: Optional[str], event: str, data: Dict):
+        """client_id의 WebSocket으로 이벤트 전송 (client_id가 None이면 모두에게)"""
+        frame = _ws_frame(json.dumps({"type": event, "data": data}).encode("utf-8"))
+        with self.lock:
+            targets = [conn for cid, conns in self.sockets.items()
+                       if client_id is None or cid == client_id for conn in conns]
+        for conn in targets:
+            try:
+                with conn["lock"]:
+                    conn["socket"].sendall(frame)
+            except OSError:
+                pass
+
+    def _broadcast_status(self):
+        with self.lock:
+            remaining = len(self.pending) + (1 if self.running else 0)
+        self._send(None, "status", {"status": {"exec_info": {"queue_remaining": remaining}}})
+
+    def _serve_ws(self, handler: BaseHTTPRequestHandler, client_id: str):
+        key = handler.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        handler.send_response(101, "Switching Protocols")
+        handler.send_header("Upgrade", "websocket")
+        handler.send_header("Connection", "Upgrade")
+        handler.send_header("Sec-WebSocket-Accept", accept)
+        handler.end_headers()
+        handler.wfile.flush()
+        handler.close_connection = True
+
+        conn = {"socket": handler.connection, "lock": threading.Lock()}
+        with self.lock:
+            self.sockets.setdefault(client_id, []).append(conn)
+            remaining = len(self.pending) + (1 if self.running else 0)
+        with conn["lock"]:
+            conn["socket"].sendall(_ws_frame(json.dumps({
+                "type": "status",
+                "data": {"status": {"exec_info": {"queue_remaining": remaining}}, "sid": client_id},
+            }).encode("utf-8")))
+        try:
+            while not self.closed:
+                opcode, payload = _ws_read(handler.rfile)
+                if opcode is None or opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    with conn["lock"]:
+                        conn["socket"].sendall(_ws_frame(payload, opcode=0xA))
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self.lock:
+                self.sockets.get(client_id, []).remove(conn)
+            try:
+                with conn["lock"]:
+                    conn["socket"].sendall(_ws_frame(b"", opcode=0x8))
+            except OSError:
+                pass
+
+    # ---- HTTP ----
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, code: int, payload=None, body: Optional[bytes] = None,
+                       content_type: str = "application/json"):
+                if body is None:
+                    body = json.dumps(payload if payload is not None else {}).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length", 0))
+                return self.rfile.read(length) if length else b""
+
+            def _json(self) -> Dict:
+                try:
+                    data = json.loads(self._body() or b"{}")
+                except json.JSONDecodeError:
+                    return {}
+                return data if isinstance(data, dict) else {}
+
+            def _begin(self) -> bool:
+                """공통 처리: 요청 수, 지연, 503 주입 (True면 계속 처리)"""
+                with mock.lock:
+                    mock.stats["requests"] += 1
+                    inject = mock.http_error_rate and mock.rng.random() < mock.http_error_rate
+                    if inject:
+                        mock.stats["http_errors"] += 1
+                if mock.rtt:
+                    time.sleep(mock.rtt)
+                if inject:
+                    if self.command == "POST":
+                        self._body()
+                    self._reply(503, {"error": "Injected error"})
+                    return False
+                return True
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/ws":
+                    if self.headers.get("Upgrade", "").lower() != "websocket":
+                        return self._reply(400, {"error": "WebSocket upgrade required"})
+                    return mock._serve_ws(self, query.get("clientId", [uuid.uuid4().hex])[0])
+                if not self._begin():
+                    return
+                if url.path == "/system_stats":
+                    return self._reply(200, {
+                        "system": {"os": "mock", "python_version": "", "comfyui_version": "mock",
+                                   "embedded_python": False},
+                        "devices": [{"name": "cuda:0 Mock GPU", "type": "cuda", "index": 0,
+                                     "vram_total": mock.vram_total, "vram_free": mock.vram_total,
+                                     "torch_vram_total": mock.vram_total, "torch_vram_free": mock.vram_total}],
+                    })
+                if url.path == "/queue":
+                    return self._reply(200, mock.queue_state())
+                if url.path == "/history":
+                    with mock.lock:
+                        items = list(mock.history.items())
+                    max_items = int(query.get("max_items", [len(items)])[0] or len(items))
+                    return self._reply(200, dict(items[-max_items:] if max_items else []))
+                if url.path.startswith("/history/"):
+                    prompt_id = url.path[len("/history/"):]
+                    with mock.lock:
+                        entry = mock.history.get(prompt_id)
+                    return self._reply(200, {prompt_id: entry} if entry else {})
+                if url.path == "/view":
+                    data = mock.view(query.get("filename", [""])[0], query.get("subfolder", [""])[0],
+                                     query.get("type", ["output"])[0])
+                    if data is None:
+                        return self._reply(404, {"error": "File not found"})
+                    with mock.lock:
+                        mock.stats["views"] += 1
+                        mock.stats["view_bytes"] += len(data) if self.command == "GET" else 0
+                    return self._reply(200, body=data, content_type="image/png")
+                if url.path == "/mock/stats":
+                    return self._reply(200, mock.snapshot())
+                self._reply(404, {"error": "Not found"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if not self._begin():
+                    return
+                if url.path == "/prompt":
+                    data = self._json()
+                    return self._reply(*mock.enqueue(data.get("prompt"), data.get("client_id")))
+                if url.path == "/upload/image":
+                    return self._reply(*mock.upload(self.headers.get("Content-Type", ""), self._body()))
+                if url.path == "/interrupt":
+                    mock.interrupt_running(self._json().get("prompt_id"))
+                    return self._reply(200, body=b"")
+                if url.path == "/queue":
+                    data = self._json()
+                    if data.get("clear"):
+                        mock.delete_pending()
+                    elif data.get("delete"):
+                        mock.delete_pending(list(data["delete"]))
+                    return self._reply(200, body=b"")
+                if url.path == "/history":
+                    data = self._json()
+                    with mock.lock:
+                        if data.get("clear"):
+                            mock.history.clear()
+                        for prompt_id in data.get("delete", []):
+                            mock.history.pop(prompt_id, None)
+                    return self._reply(200, body=b"")
+                self._body()
+                self._reply(404, {"error": "Not found"})
+
+        return Handler
+
+
+def _ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """서버 → 클라이언트 WebSocket 프레임 (마스크 없음)"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack(">BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def _ws_read(stream: io.BufferedIOBase) -> Tuple[Optional[int], bytes]:
+    """클라이언트 프레임 하나 읽기 (연결이 끊기면 (None, b""))"""
+    header = stream.read(2)
+    if len(header) < 2:
+        return None, b""
+    opcode, length = header[0] & 0x0F, header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", stream.read(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", stream.read(8))[0]
+    mask = stream.read(4) if header[1] & 0x80 else b""
+    payload = stream.read(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a mock ComfyUI server for offline tests and benchmarks"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_MOCK_PORT,
+        help=f"포트 (기본: {DEFAULT_MOCK_PORT})"
+    )
+    parser.add_argument(
+        "--bind",
+        default="127.0.0.1",
+        help="바인드 주소 (기본: 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--exec-time",
+        default=DEFAULT_EXEC_TIME,
+        help=f"캐시 없는 프롬프트 실행 시간 분포 (기본: {DEFAULT_EXEC_TIME})"
+    )
+    parser.add_argument(
+        "--class-time",
+        action="append",
+        default=[],
+        help="노드 class_type별 실행 시간 분포, 반복 가능 (예: GroundingDino=fixed:0.4)"
+    )
+    parser.add_argument(
+        "--fail-rate",
+        type=float,
+        default=0.0,
+        help="실행 오류로 끝나는 프롬프트 비율 (기본: 0)"
+    )
+    parser.add_argument(
+        "--reject-rate",
+        type=float,
+        default=0.0,
+        help="/prompt 검증 실패(400) 비율 (기본: 0)"
+    )
+    parser.add_argument(
+        "--http-error-rate",
+        type=float,
+        default=0.0,
+        help="임의 요청 503 비율 (기본: 0)"
+    )
+    parser.add_argument(
+        "--rtt",
+        type=float,
+        default=0.0,
+        help="요청마다 더할 지연 (초, 기본: 0)"
+    )
+    parser.add_argument(
+        "--cache-prompts",
+        type=int,
+        default=1,
+        help="노드 캐시가 기억하는 최근 프롬프트 수 (0: 캐시 없음, 기본: 1)"
+    )
+    parser.add_argument(
+        "--vram",
+        type=float,
+        default=DEFAULT_VRAM_GB,
+        help=f"보고할 GPU VRAM (GB, 기본: {DEFAULT_VRAM_GB})"
+    )
+    parser.add_argument(
+        "--image-size",
+        type=int,
+        default=DEFAULT_IMAGE_SIZE,
+        help=f"출력 이미지 크기 (기본: {DEFAULT_IMAGE_SIZE})"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="난수 seed (같은 seed면 같은 실행 시간/실패 순서)"
+    )
+
+    args = parser.parse_args()
+
+    class_times = {}
+    for item in args.class_time:
+        pattern, sep, spec = item.partition("=")
+        if not sep:
+            parser.error(f"--class-time must be <class>=<distribution>: {item}")
+        class_times[pattern] = spec
+
+    try:
+        mock = MockComfyUI(
+            args.port, args.bind, args.exec_time, class_times,
+            fail_rate=args.fail_rate,
+            reject_rate=args.reject_rate,
+            http_error_rate=args.http_error_rate,
+            rtt=args.rtt,
+            cache_prompts=args.cache_prompts,
+            vram_gb=args.vram,
+            image_size=args.image_size,
+            seed=args.seed
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    mock.start()
+    print(f"Mock ComfyUI on {mock.host} (exec {args.exec_time}, Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stats = mock.snapshot()
+        mock.stop()
+        print(f"\n  Prompts: {stats['prompts']} ({stats['completed']} completed, {stats['failed']} failed, "
+              f"{stats['interrupted']} interrupted, {stats['rejected']} rejected)")
+        print(f"  GPU busy: {stats['busy']:.1f}s ({stats['utilization']:.0%}), "
+              f"node cache {stats['cache_hit_rate']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,20 +6,39 @@ SAM + GroundingDINO를 사용한 캐릭터 파츠 분리
 
 Usage:
     python parts_segment.py --image arcana_idle.png --output parts/
+    python parts_segment.py --image arcana_idle.png --backend fast  # CPU 전용
 """
 
 import os
+import io
 import sys
 import json
 import time
+import uuid
+import hashlib
 import argparse
+import tempfile
+import threading
 import requests
 from pathlib import Path
+from typing import Optional
+
+from comfy_client import (
+    ComfyClient,
+    get_client,
+    check_comfyui,
+    cancel_prompt,
+    estimate_reclaimed,
+)
 
 
 DEFAULT_COMFYUI_HOST = "http://localhost:8188"
 DEFAULT_INPUT_DIR = "D:/AI/ComfyUI/output"
 DEFAULT_OUTPUT_DIR = "D:/AI/SpineAtlas/parts"
+SCRIPT_DIR = Path(__file__).parent
+
+# 호스트별 업로드 기록 (content hash -> ComfyUI input 파일명)
+DEFAULT_UPLOAD_MANIFEST = SCRIPT_DIR / ".comfyui_uploads.json"
 
 # 파츠 검출용 프롬프트 (각 파츠별로 개별 실행)
 PARTS_PROMPTS = {
@@ -31,49 +50,183 @@ PARTS_PROMPTS = {
 }
 
 
-def check_comfyui(host: str) -> bool:
-    """ComfyUI 서버 상태 확인"""
-    try:
-        response = requests.get(f"{host}/system_stats", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """파일 내용의 SHA-256 (청크 단위로 읽어 메모리 사용 고정)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
-def queue_prompt(host: str, prompt: dict, client_id: str = "parts-segmenter") -> str:
-    """ComfyUI에 프롬프트 큐 등록"""
-    payload = {
-        "prompt": prompt,
-        "client_id": client_id
-    }
-    response = requests.post(f"{host}/prompt", json=payload)
-    return response.json().get("prompt_id")
+def content_hash_name(image_path: str, digest: str) -> str:
+    """내용 해시 기반 업로드 파일명 (예: arcana_idle_1a2b3c4d5e6f7a8b.png)"""
+    path = Path(image_path)
+    return f"{path.stem}_{digest[:16]}{path.suffix or '.png'}"
 
 
-def wait_for_completion(host: str, prompt_id: str, timeout: int = 180) -> bool:
-    """생성 완료 대기"""
-    start_time = time.time()
+def load_upload_manifest(manifest_path: str) -> dict:
+    """업로드 매니페스트 로드 ({host: {sha256: upload_result}})"""
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_upload_manifest(manifest_path: str, manifest: dict):
+    """업로드 매니페스트 저장 (기록자별 임시 파일 + rename으로 원자적 기록)"""
+    manifest_path = Path(manifest_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=manifest_path.name + ".", suffix=".tmp", dir=manifest_path.parent
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# 같은 프로세스의 업로드 스레드끼리 매니페스트 읽기-병합-쓰기를 직렬화
+_manifest_lock = threading.Lock()
+
+
+def record_upload(manifest_path: str, host: str, digest: str, result: dict):
+    """업로드 결과를 매니페스트에 병합 기록 (다른 기록자가 쓴 항목은 유지)"""
+    with _manifest_lock:
+        manifest = load_upload_manifest(manifest_path)
+        manifest.setdefault(host, {})[digest] = result
+        save_upload_manifest(manifest_path, manifest)
+
+
+class MultipartFileStream:
+    """
+    multipart/form-data 본문을 파일에서 청크 단위로 읽어 전송하는 file-like 객체
+
+    requests의 files= 인자는 본문 전체를 메모리에 만든 뒤 전송하므로,
+    길이(__len__)와 read()만 제공해 Content-Length 고정 스트리밍 업로드를 한다.
+    """
+
+    def __init__(
+        self,
+        field_name: str,
+        file_path: str,
+        filename: str,
+        content_type: str = "image/png",
+        fields: dict = None
+    ):
+        self.boundary = uuid.uuid4().hex
+        head = b""
+        for key, value in (fields or {}).items():
+            head += (
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{key}"\r\n\r\n'
+                f"{value}\r\n"
+            ).encode("utf-8")
+        head += (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+        self._length = len(head) + os.path.getsize(file_path) + len(tail)
+        self._streams = [io.BytesIO(head), open(file_path, "rb"), io.BytesIO(tail)]
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length
+        chunks = []
+        while size > 0 and self._streams:
+            chunk = self._streams[0].read(size)
+            if not chunk:
+                self._streams.pop(0).close()
+                continue
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
 
-    while time.time() - start_time < timeout:
-        response = requests.get(f"{host}/history/{prompt_id}")
-        if response.status_code == 200:
-            history = response.json()
-            if prompt_id in history:
-                return True
-        time.sleep(2)
+    def close(self):
+        for stream in self._streams:
+            stream.close()
+        self._streams = []
 
-    return False
 
+def remote_input_exists(host: str, filename: str, client: Optional[ComfyClient] = None) -> bool:
+    """ComfyUI input 폴더에 파일이 남아 있는지 확인 (HEAD /view)"""
+    client = client or get_client(host)
+    try:
+        response = client.head(
+            "/view",
+            params={"filename": filename, "type": "input"},
+            timeout=5
+        )
+        return response.status_code == 200
+    except requests.RequestException:
+        return False
 
-def upload_image(host: str, image_path: str) -> dict:
-    """이미지를 ComfyUI에 업로드"""
-    with open(image_path, 'rb') as f:
-        files = {'image': (os.path.basename(image_path), f, 'image/png')}
-        response = requests.post(f"{host}/upload/image", files=files)
 
-    if response.status_code == 200:
-        return response.json()
-    return None
+def upload_image(
+    host: str,
+    image_path: str,
+    manifest_path: str = DEFAULT_UPLOAD_MANIFEST,
+    verify_remote: bool = True,
+    client: Optional[ComfyClient] = None,
+    force: bool = False
+) -> dict:
+    """
+    이미지를 ComfyUI에 업로드 (내용 해시 기반 중복 제거)
+
+    같은 내용의 파일이 이미 해당 호스트에 업로드되어 있으면 매니페스트에
+    기록된 결과를 그대로 반환하고, 아니면 파일을 스트리밍으로 업로드한다.
+    force면 매니페스트 확인 없이 업로드하고 결과는 기록한다.
+    manifest_path가 None이면 매번 업로드하고 기록하지 않는다.
+    """
+    client = client or get_client(host)
+    digest = file_sha256(image_path)
+    upload_name = content_hash_name(image_path, digest)
+
+    manifest = load_upload_manifest(manifest_path) if manifest_path and not force else {}
+    cached = manifest.get(host, {}).get(digest)
+    if cached and (
+        not verify_remote or remote_input_exists(host, cached["name"], client)
+    ):
+        return dict(cached, cached=True)
+
+    body = MultipartFileStream(
+        "image", image_path, upload_name,
+        fields={"type": "input", "overwrite": "true"}
+    )
+    try:
+        # 스트림 본문은 한 번 읽으면 되감을 수 없으므로 재시도하지 않는다
+        response = client.post(
+            "/upload/image",
+            data=body,
+            headers={"Content-Type": body.content_type},
+            retries=0
+        )
+    finally:
+        body.close()
+
+    if response.status_code != 200:
+        return None
+
+    result = response.json()
+    if manifest_path:
+        # 업로드 도중 다른 스레드/프로세스가 기록했을 수 있으므로 다시 읽고 병합
+        record_upload(manifest_path, host, digest, result)
+
+    return dict(result, cached=False)
 
 
 def build_segmentation_workflow(
@@ -133,14 +286,18 @@ def segment_parts(
     host: str,
     image_path: str,
     output_dir: str,
-    parts: list = None
+    parts: list = None,
+    manifest_path: str = DEFAULT_UPLOAD_MANIFEST,
+    force_upload: bool = False
 ) -> dict:
     """이미지에서 파츠 분리"""
 
     results = {
         "image": image_path,
         "parts": {},
-        "errors": []
+        "errors": [],
+        "durations": [],
+        "cancelled": []
     }
 
     # 사용할 파츠 결정
@@ -149,12 +306,15 @@ def segment_parts(
 
     # 이미지 업로드
     print(f"Uploading image: {image_path}")
-    upload_result = upload_image(host, image_path)
+    upload_result = upload_image(host, image_path, manifest_path, force=force_upload)
 
     if not upload_result:
         results["errors"].append("Failed to upload image")
         return results
 
+    if upload_result.get("cached"):
+        print(f"  [SKIP] Already uploaded as {upload_result['name']}")
+
     image_name = upload_result.get("name", os.path.basename(image_path))
     output_prefix = Path(image_path).stem
 
@@ -175,20 +335,35 @@ def segment_parts(
         )
 
         try:
-            prompt_id = queue_prompt(host, workflow)
+            client = get_client(host)
+            prompt_id = client.queue_prompt(workflow, "parts-segmenter")
 
             if not prompt_id:
                 results["errors"].append(f"{part_name}: Failed to queue")
                 continue
 
-            if wait_for_completion(host, prompt_id, timeout=180):
+            started = time.time()
+            if client.wait_for_completion(prompt_id, timeout=180) is not None:
                 results["parts"][part_name] = "success"
+                results["durations"].append(time.time() - started)
                 print(f"    [OK] {part_name} completed")
             else:
                 results["parts"][part_name] = "timeout"
                 results["errors"].append(f"{part_name}: Timeout")
                 print(f"    [FAIL] {part_name} timeout")
 
+                # GPU에 남은 작업 취소
+                state = cancel_prompt(host, prompt_id)
+                if state:
+                    reclaimed = estimate_reclaimed(state, results["durations"])
+                    results["cancelled"].append({
+                        "part": part_name,
+                        "prompt_id": prompt_id,
+                        "state": state,
+                        "reclaimed_sec": reclaimed
+                    })
+                    print(f"    [CANCEL] {part_name} ({state}, ~{reclaimed:.0f}s GPU reclaimed)")
+
         except Exception as e:
             results["parts"][part_name] = "error"
             results["errors"].append(f"{part_name}: {str(e)}")
@@ -220,8 +395,14 @@ def main():
     )
     parser.add_argument(
         "--parts", "-p",
-        default="head,body,hair,weapon,accessory",
-        help="분리할 파츠 (콤마 구분)"
+        default=None,
+        help="분리할 파츠 (콤마 구분, 기본: 백엔드가 지원하는 전체 파츠)"
+    )
+    parser.add_argument(
+        "--backend", "-b",
+        choices=["comfyui", "fast"],
+        default="comfyui",
+        help="comfyui: SAM + GroundingDINO, fast: NumPy CPU 분리 (head/body/hair)"
     )
     parser.add_argument(
         "--threshold", "-t",
@@ -229,15 +410,26 @@ def main():
         default=0.25,
         help="검출 threshold (기본: 0.25)"
     )
+    parser.add_argument(
+        "--upload-manifest",
+        default=str(DEFAULT_UPLOAD_MANIFEST),
+        help=f"업로드 매니페스트 경로 (기본: {DEFAULT_UPLOAD_MANIFEST})"
+    )
+    parser.add_argument(
+        "--force-upload",
+        action="store_true",
+        help="매니페스트/원격 파일 확인 없이 항상 업로드 (결과는 매니페스트에 기록)"
+    )
 
     args = parser.parse_args()
 
-    # ComfyUI 연결 확인
-    print(f"Connecting to ComfyUI at {args.host}...")
-    if not check_comfyui(args.host):
-        print("Error: ComfyUI is not running!")
-        sys.exit(1)
-    print("  [OK] Connected\n")
+    # ComfyUI 연결 확인 (fast 백엔드는 불필요)
+    if args.backend == "comfyui":
+        print(f"Connecting to ComfyUI at {args.host}...")
+        if not check_comfyui(args.host):
+            print("Error: ComfyUI is not running!")
+            sys.exit(1)
+        print("  [OK] Connected\n")
 
     # 이미지 경로 확인
     image_path = args.image
@@ -252,19 +444,34 @@ def main():
         sys.exit(1)
 
     # 파츠 리스트
-    parts = [p.strip() for p in args.parts.split(",")]
+    if args.parts:
+        parts = [p.strip() for p in args.parts.split(",")]
+    elif args.backend == "fast":
+        from fast_segment import FAST_PARTS
+        parts = list(FAST_PARTS)
+    else:
+        parts = list(PARTS_PROMPTS.keys())
 
     print("=" * 50)
     print("  Parts Segmentation")
     print("=" * 50)
     print(f"  Image: {image_path}")
     print(f"  Parts: {', '.join(parts)}")
+    print(f"  Backend: {args.backend}")
     print(f"  Output: {args.output}")
     print("=" * 50)
     print()
 
     # 세그먼테이션 실행
-    result = segment_parts(args.host, image_path, args.output, parts)
+    if args.backend == "fast":
+        # numpy는 fast 백엔드에서만 필요하므로 지연 import
+        from fast_segment import segment_parts_fast
+        result = segment_parts_fast(image_path, args.output, parts)
+    else:
+        result = segment_parts(
+            args.host, image_path, args.output, parts, args.upload_manifest,
+            force_upload=args.force_upload
+        )
 
     # 결과 출력
     print("\n" + "=" * 50)
@@ -274,6 +481,11 @@ def main():
     success_count = sum(1 for v in result["parts"].values() if v == "success")
     print(f"  Success: {success_count}/{len(parts)}")
 
+    cancelled = result.get("cancelled", [])
+    if cancelled:
+        reclaimed = sum(c["reclaimed_sec"] for c in cancelled)
+        print(f"  Cancelled: {len(cancelled)}, ~{reclaimed:.0f}s GPU time reclaimed")
+
     if result["errors"]:
         print(f"\n  Errors ({len(result['errors'])}):")
         for err in result["errors"]:
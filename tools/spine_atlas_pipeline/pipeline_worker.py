@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+"""
+Pipeline Worker
+===============
+생성 / 파츠 분리 / Atlas 패킹을 로컬 HTTP로 받는 상주 워커
+
+n8n에서 스크립트를 매번 실행하면 호출마다 Python 시작과 import, character_prompts.json 파싱,
+ComfyUI 연결 확인(check_comfyui)이 반복된다. 이 워커는 한 번 띄워 두고
+프롬프트, ComfyUI 커넥션 풀, 상태 확인 결과, VRAM 기준 배치 크기, 패커를 메모리에 유지한 채
+작업만 받아 실행하므로 호출당 지연은 실제 작업 시간만 남는다.
+
+엔드포인트 (JSON):
+    POST /jobs/generate   {"characters": [...] 또는 "all": true, "expressions", "variants",
+                           "no_rembg", "seed_salt", "img2img_denoise", "output"}
+    POST /jobs/segment    {"images": [파일 또는 폴더], "output", "parts", "backend": "comfyui" | "fast"}
+    POST /jobs/pack       {"input": 파츠 폴더, "output": .atlas 경로, "format", "size", "padding", "rotation"}
+    GET  /jobs/<id>       작업 상태 (queued → running → success | error) + 결과
+    GET  /jobs            최근 작업 목록
+    GET  /health          종류별 대기 작업 수, ComfyUI 상태
+
+POST에 ?wait=<초>를 붙이면 그 안에 끝난 작업은 결과와 함께 200으로 응답하고,
+끝나지 않았으면 202와 작업 ID를 돌려준다 (이후 GET /jobs/<id>로 폴링).
+작업 종류마다 큐 길이가 --queue-size로 제한되며, 가득 차면 429 + Retry-After로 거절한다.
+
+Usage:
+    python pipeline_worker.py --host http://localhost:8188 --port 8190
+    curl -X POST "http://localhost:8190/jobs/generate?wait=600" -d '{"characters": ["arcana"], "expressions": ["idle"]}'
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import asyncio
+import argparse
+import importlib
+import threading
+import importlib.util
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from comfy_client import get_client
+from batch_generate import (
+    DEFAULT_COMFYUI_HOST,
+    DEFAULT_OUTPUT_DIR,
+    SCRIPT_DIR,
+    FULL_SIZE,
+    load_prompts,
+    build_jobs,
+    get_vram_total,
+    max_batch_for_vram,
+    restore_cached,
+    image_paths,
+    JobScheduler,
+    OutputDownloader,
+)
+from generation_cache import GenerationCache, CACHE_DIRNAME
+from job_journal import JobJournal
+from parts_segment import DEFAULT_OUTPUT_DIR as DEFAULT_PARTS_DIR, DEFAULT_UPLOAD_MANIFEST, PARTS_PROMPTS
+from async_segment import AsyncSegmentRunner, collect_images
+
+DEFAULT_WORKER_PORT = 8190
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_EXPRESSIONS = ["idle", "happy", "angry", "skill", "victory"]
+PROMPTS_PATH = SCRIPT_DIR / "character_prompts.json"
+
+JOB_KINDS = ("generate", "segment", "pack")
+DEFAULT_WORKERS = {"generate": 1, "segment": 1, "pack": 2}
+JOB_HISTORY = 500          # 상태 조회용으로 보관하는 끝난 작업 수
+HEALTH_TTL = 10.0          # ComfyUI 상태 확인 결과 재사용 시간 (초)
+MAX_WAIT = 3600.0
+MAX_BODY_BYTES = 1 << 20
+QUEUE_FULL_RETRY_AFTER = 5
+
+
+def optional_module(name: str, packages: List[str]):
+    """packages가 모두 설치돼 있으면 name 모듈 import (없으면 None)
+
+    파이프라인 스크립트는 선택 의존성이 없으면 import 시 sys.exit하므로 먼저 확인한다.
+    """
+    if not all(importlib.util.find_spec(package) for package in packages):
+        return None
+    return importlib.import_module(name)
+
+
+class PipelineWorker:
+    """작업 종류별 제한 큐 + 워커 스레드, 요청 사이에 유지되는 상주 상태"""
+
+    def __init__(
+        self,
+        host: str = DEFAULT_COMFYUI_HOST,
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+        parts_dir: str = DEFAULT_PARTS_DIR,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        workers: Optional[Dict[str, int]] = None,
+        max_in_flight: int = 3,
+        timeout: int = 120
+    ):
+        """
+        Args:
+            host: ComfyUI 호스트
+            output_dir: generate 기본 출력 폴더 (<output>/<char>/full/)
+            parts_dir: segment 기본 출력 폴더 (<parts>/<image stem>/<part>.png)
+            queue_size: 작업 종류별 최대 대기 작업 수
+            workers: 작업 종류별 동시 실행 수
+            max_in_flight: 생성 시 ComfyUI 큐에 올려둘 프롬프트 수
+            timeout: 생성 작업당 최대 실행 시간 (초)
+        """
+        self.host = host.rstrip("/")
+        self.client = get_client(self.host)
+        self.output_dir = output_dir
+        self.parts_dir = parts_dir
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.workers = dict(DEFAULT_WORKERS, **(workers or {}))
+        self.queues = {kind: queue.Queue(maxsize=queue_size) for kind in JOB_KINDS}
+        self.started = time.time()
+
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()   # job_id -> 작업 (끝난 작업은 JOB_HISTORY개까지 보관)
+        self.done = {}              # job_id -> threading.Event
+
+        self._prompts = None
+        self._prompts_mtime = None
+        self._health = (0.0, False)
+        self._max_batch = {}
+        self._packers = {}
+        self.atlas_packer = None
+        self.fast_segment = None
+
+    # ---- 상주 상태 ----
+
+    def warm(self):
+        """시작 시 한 번: 프롬프트 파싱, ComfyUI 연결, 선택 의존성 모듈 import"""
+        self.prompts()
+        print(f"  ComfyUI {self.host}: {'up' if self.comfyui_alive() else 'DOWN'}")
+        self.atlas_packer = optional_module("atlas_packer", ["PIL", "rectpack"])
+        self.fast_segment = optional_module("fast_segment", ["numpy", "PIL"])
+        if self.atlas_packer is None:
+            print("  [WARN] pack 비활성화: pip install pillow rectpack")
+        if self.fast_segment is None:
+            print("  [WARN] fast segment 비활성화: pip install numpy pillow")
+
+    def prompts(self) -> Dict:
+        """character_prompts.json (파일이 바뀌었을 때만 다시 읽음)"""
+        mtime = PROMPTS_PATH.stat().st_mtime
+        with self.lock:
+            if self._prompts is None or mtime != self._prompts_mtime:
+                self._prompts = load_prompts()
+                self._prompts_mtime = mtime
+            return self._prompts
+
+    def comfyui_alive(self, refresh: bool = False) -> bool:
+        """ComfyUI 상태 (HEALTH_TTL 동안 이전 확인 결과 재사용)"""
+        checked, alive = self._health
+        if refresh or time.time() - checked > HEALTH_TTL:
+            alive = self.client.check()
+            self._health = (time.time(), alive)
+        return alive
+
+    def max_batch(self, size: int) -> int:
+        """VRAM 기준 샘플러 배치 크기 (호스트 GPU가 바뀌지 않으므로 한 번만 조회)"""
+        if size not in self._max_batch:
+            self._max_batch[size] = max_batch_for_vram(get_vram_total(self.host), size, size)
+        return self._max_batch[size]
+
+    def packer(self, size: int, padding: int, rotation: bool):
+        key = (size, padding, rotation)
+        if key not in self._packers:
+            self._packers[key] = self.atlas_packer.SpineAtlasPacker(
+                atlas_size=size, padding=padding, allow_rotation=rotation
+            )
+        return self._packers[key]
+
+    # ---- 작업 큐 ----
+
+    def start(self) -> "PipelineWorker":
+        for kind in JOB_KINDS:
+            for i in range(max(1, self.workers[kind])):
+                threading.Thread(
+                    target=self._work, args=(kind,), name=f"{kind}-{i}", daemon=True
+                ).start()
+        return self
+
+    def submit(self, kind: str, params: Dict) -> Dict:
+        """
+        작업 등록
+
+        Raises:
+            ValueError: 잘못된 요청
+            RuntimeError: 이 워커에서 실행할 수 없는 작업 (선택 의존성 없음)
+            queue.Full: 해당 종류의 큐가 가득 참
+        """
+        params = getattr(self, f"validate_{kind}")(params)
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "kind": kind,
+            "status": "queued",
+            "params": params,
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "result": None,
+            "error": None,
+        }
+        with self.lock:
+            self.queues[kind].put_nowait(job)
+            self.jobs[job["id"]] = job
+            self.done[job["id"]] = threading.Event()
+            self._trim()
+        print(f"  [JOB] {job['id']} {kind} queued ({self.queues[kind].qsize()} waiting)")
+        return job
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["finished"]]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job_id]
+            del self.done[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return self.view(job) if job else None
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """끝날 때까지 최대 timeout초 대기 후 현재 상태"""
+        with self.lock:
+            event = self.done.get(job_id)
+        if event is not None and timeout > 0:
+            event.wait(timeout)
+        return self.get(job_id)
+
+    @staticmethod
+    def view(job: Dict) -> Dict:
+        """응답용 작업 상태 (대기 / 실행 시간 포함)"""
+        view = dict(job)
+        now = time.time()
+        view["queue_time"] = round((job["started"] or now) - job["created"], 3)
+        if job["started"]:
+            view["elapsed"] = round((job["finished"] or now) - job["started"], 3)
+        return view
+
+    def stats(self) -> Dict:
+        with self.lock:
+            running = sum(1 for job in self.jobs.values() if job["status"] == "running")
+        return {
+            "status": "ok",
+            "comfyui": self.comfyui_alive(),
+            "queued": {kind: q.qsize() for kind, q in self.queues.items()},
+            "running": running,
+            "uptime": round(time.time() - self.started, 1),
+            "pack": self.atlas_packer is not None,
+            "fast_segment": self.fast_segment is not None,
+        }
+
+    def _work(self, kind: str):
+        run = getattr(self, f"run_{kind}")
+        while True:
+            job = self.queues[kind].get()
+            job["status"] = "running"
+            job["started"] = time.time()
+            try:
+                job["result"] = run(job["params"])
+                job["status"] = "success"
+            except Exception as e:
+                job["status"] = "error"
+                job["error"] = f"{type(e).__name__}: {e}"
+            job["finished"] = time.time()
+            with self.lock:
+                event = self.done.get(job["id"])
+            if event is not None:
+                event.set()
+            self.queues[kind].task_done()
+            print(f"  [JOB] {job['id']} {kind} {job['status']} "
+                  f"({job['finished'] - job['started']:.1f}s)" + (f": {job['error']}" if job["error"] else ""))
+
+    # ---- 요청 검증 ----
+
+    def validate_generate(self, params: Dict) -> Dict:
+        characters = self.prompts()["characters"]
+        if params.get("all"):
+            char_list = list(characters)
+        else:
+            char_list = _as_list(params.get("characters") or params.get("character"))
+        if not char_list:
+            raise ValueError("characters 또는 all이 필요합니다")
+        unknown = [name for name in char_list if name not in characters]
+        if unknown:
+            raise ValueError(f"Unknown character: {', '.join(unknown)}")
+
+        denoise = params.get("img2img_denoise")
+        return {
+            "characters": char_list,
+            "expressions": _as_list(params.get("expressions")) or DEFAULT_EXPRESSIONS,
+            "variants": max(1, int(params.get("variants", 1))),
+            "no_rembg": bool(params.get("no_rembg", False)),
+            "seed_salt": str(params.get("seed_salt", "")),
+            "img2img_denoise": float(denoise) if denoise is not None else None,
+            "output": params.get("output") or self.output_dir,
+        }
+
+    def validate_segment(self, params: Dict) -> Dict:
+        images = _as_list(params.get("images") or params.get("image"))
+        if not images:
+            raise ValueError("images가 필요합니다")
+        backend = params.get("backend", "comfyui")
+        if backend not in ("comfyui", "fast"):
+            raise ValueError("backend must be comfyui or fast")
+        if backend == "fast" and self.fast_segment is None:
+            raise RuntimeError("fast segment에는 numpy, pillow가 필요합니다")
+        parts = _as_list(params.get("parts")) or None
+        if backend == "comfyui" and parts:
+            unknown = [part for part in parts if part not in PARTS_PROMPTS]
+            if unknown:
+                raise ValueError(f"Unknown part: {', '.join(unknown)}")
+        return {
+            "images": images,
+            "output": params.get("output") or self.parts_dir,
+            "parts": parts,
+            "backend": backend,
+        }
+
+    def validate_pack(self, params: Dict) -> Dict:
+        if self.atlas_packer is None:
+            raise RuntimeError("pack에는 pillow, rectpack이 필요합니다")
+        if not params.get("input") or not params.get("output"):
+            raise ValueError("input, output이 필요합니다")
+        atlas_format = params.get("format", "spine")
+        if atlas_format not in ("spine", "json"):
+            raise ValueError("format must be spine or json")
+        return {
+            "input": params["input"],
+            "output": params["output"],
+            "format": atlas_format,
+            "size": int(params.get("size", 2048)),
+            "padding": int(params.get("padding", 2)),
+            "rotation": bool(params.get("rotation", False)),
+        }
+
+    # ---- 작업 실행 ----
+
+    def run_generate(self, params: Dict) -> Dict:
+        """batch_generate와 같은 흐름 (저널 건너뛰기 → 출력 캐시 → 스케줄러 + 다운로더)"""
+        if not self.comfyui_alive(refresh=True):
+            raise RuntimeError(f"ComfyUI is not responding: {self.host}")
+        output = params["output"]
+        jobs = build_jobs(
+            params["characters"], params["expressions"], self.prompts(),
+            use_rembg=not params["no_rembg"],
+            variants=params["variants"],
+            max_batch=self.max_batch(FULL_SIZE),
+            seed_salt=params["seed_salt"],
+            img2img_denoise=params["img2img_denoise"]
+        )
+
+        journal = JobJournal(output)
+        completed = {
+            job["key"] for job in jobs
+            if journal.is_completed(job["key"], image_paths(output, job), job["hash"])
+        }
+        skipped = [job for job in jobs if job["key"] in completed]
+        jobs = [job for job in jobs if job["key"] not in completed]
+        cache = GenerationCache(Path(output) / CACHE_DIRNAME)
+        jobs, cache_hits = restore_cached(jobs, output, cache, journal)
+
+        results, download_errors = [], []
+        if jobs:
+            scheduler = JobScheduler(
+                [self.host], max_in_flight=self.max_in_flight, timeout=self.timeout, journal=journal
+            )
+            downloader = OutputDownloader(output, cache, backends=scheduler.backends)
+            results = scheduler.run(
+                jobs,
+                on_complete=lambda result, done, total: downloader.submit(result)
+            )
+            download_errors = downloader.close()["errors"]
+
+        done = skipped + cache_hits + [r for r in results if r["status"] == "success"]
+        images = [str(path) for job in done for path in image_paths(output, job) if path.exists()]
+        return {
+            "images": images,
+            "generated": sum(1 for r in results if r["status"] == "success"),
+            "cached": len(cache_hits),
+            "skipped": len(skipped),
+            "failed": sum(1 for r in results if r["status"] != "success"),
+            "errors": [f"{r['key']}: {r['error']}" for r in results if r["error"]] + download_errors,
+        }
+
+    def run_segment(self, params: Dict) -> Dict:
+        """이미지마다 <output>/<stem>/<part>.png (comfyui: 공유 커넥션 풀로 파이프라인 실행)"""
+        images = collect_images(params["images"])
+        missing = [path for path in images if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"Image not found: {', '.join(missing)}")
+        output = Path(params["output"])
+
+        if params["backend"] == "fast":
+            results = [
+                self.fast_segment.segment_parts_fast(image, str(output / Path(image).stem), params["parts"])
+                for image in images
+            ]
+        else:
+            if not self.comfyui_alive(refresh=True):
+                raise RuntimeError(f"ComfyUI is not responding: {self.host}")
+            runner = AsyncSegmentRunner(
+                self.host, str(output), params["parts"],
+                manifest_path=DEFAULT_UPLOAD_MANIFEST, client=self.client
+            )
+            results = asyncio.run(runner.run(images))
+
+        return {
+            "images": [
+                dict(result, part_dir=str(output / Path(result["image"]).stem)) for result in results
+            ],
+            "errors": [e for result in results for e in result["errors"]],
+        }
+
+    def run_pack(self, params: Dict) -> Dict:
+        packer = self.packer(params["size"], params["padding"], params["rotation"])
+        parts = packer.load_parts(params["input"])
+        if not parts:
+            raise ValueError(f"파츠 이미지를 찾을 수 없습니다: {params['input']}")
+        atlas, regions, width, height = packer.pack(parts)
+        atlas_path, png_path = packer.save(
+            atlas, regions, width, height, params["output"], params["format"]
+        )
+        return {
+            "atlas": atlas_path,
+            "png": png_path,
+            "parts": len(regions),
+            "width": width,
+            "height": height,
+        }
+
+    # ---- HTTP ----
+
+    def serve(self, port: int = DEFAULT_WORKER_PORT, bind: str = "127.0.0.1") -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer((bind, port), self._handler())
+        server.daemon_threads = True
+        return server
+
+    def _handler(self):
+        worker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, code: int, payload: Dict, headers: Optional[Dict] = None):
+                body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = urlparse(self.path).path.rstrip("/")
+                if path == "/health":
+                    return self._reply(200, worker.stats())
+                if path == "/jobs":
+                    with worker.lock:
+                        jobs = [worker.view(job) for job in worker.jobs.values()]
+                    return self._reply(200, {"jobs": jobs[-100:]})
+                if path.startswith("/jobs/"):
+                    job = worker.get(path[len("/jobs/"):])
+                    return self._reply(200, job) if job else self._reply(404, {"error": "Unknown job"})
+                self._reply(404, {"error": "Not found"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                kind = url.path.rstrip("/")[len("/jobs/"):] if url.path.startswith("/jobs/") else None
+                if kind not in JOB_KINDS:
+                    return self._reply(404, {"error": f"POST /jobs/<{'|'.join(JOB_KINDS)}>"})
+
+                length = int(self.headers.get("Content-Length", 0))
+                if length > MAX_BODY_BYTES:
+                    return self._reply(413, {"error": "Request body too large"})
+                try:
+                    params = json.loads(self.rfile.read(length) or b"{}")
+                    wait = min(float(parse_qs(url.query).get("wait", ["0"])[0]), MAX_WAIT)
+                except ValueError as e:
+                    return self._reply(400, {"error": str(e)})
+                if not isinstance(params, dict):
+                    return self._reply(400, {"error": "JSON object expected"})
+
+                try:
+                    job = worker.submit(kind, params)
+                except queue.Full:
+                    return self._reply(429, {"error": f"{kind} queue is full"},
+                                       {"Retry-After": str(QUEUE_FULL_RETRY_AFTER)})
+                except RuntimeError as e:
+                    return self._reply(503, {"error": str(e)})
+                except (ValueError, TypeError) as e:
+                    return self._reply(400, {"error": str(e)})
+
+                job = worker.wait(job["id"], wait)
+                self._reply(200 if job["finished"] else 202, job)
+
+        return Handler
+
+
+def _as_list(value) -> List[str]:
+    """콤마 구분 문자열 또는 리스트 → 리스트"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return [str(item) for item in value]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Warm local worker for generate / segment / pack jobs"
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_COMFYUI_HOST,
+        help=f"ComfyUI 호스트 (기본: {DEFAULT_COMFYUI_HOST})"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_WORKER_PORT,
+        help=f"워커 포트 (기본: {DEFAULT_WORKER_PORT})"
+    )
+    parser.add_argument(
+        "--bind",
+        default="127.0.0.1",
+        help="바인드 주소 (기본: 127.0.0.1, n8n이 다른 머신이면 0.0.0.0)"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        default=DEFAULT_OUTPUT_DIR,
+        help=f"generate 기본 출력 디렉토리 (기본: {DEFAULT_OUTPUT_DIR})"
+    )
+    parser.add_argument(
+        "--parts-output",
+        default=DEFAULT_PARTS_DIR,
+        help=f"segment 기본 출력 디렉토리 (기본: {DEFAULT_PARTS_DIR})"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"작업 종류별 최대 대기 작업 수, 넘으면 429 (기본: {DEFAULT_QUEUE_SIZE})"
+    )
+    for kind in JOB_KINDS:
+        parser.add_argument(
+            f"--{kind}-workers",
+            type=int,
+            default=DEFAULT_WORKERS[kind],
+            help=f"{kind} 작업 동시 실행 수 (기본: {DEFAULT_WORKERS[kind]})"
+        )
+    parser.add_argument(
+        "--in-flight", "-j",
+        type=int,
+        default=3,
+        help="생성 시 ComfyUI 큐에 동시에 올려둘 프롬프트 수 (기본: 3)"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=120,
+        help="생성 작업당 최대 실행 시간 (기본: 120초)"
+    )
+
+    args = parser.parse_args()
+
+    worker = PipelineWorker(
+        args.host, args.output, args.parts_output,
+        queue_size=args.queue_size,
+        workers={kind: getattr(args, f"{kind}_workers") for kind in JOB_KINDS},
+        max_in_flight=args.in_flight,
+        timeout=args.timeout
+    )
+    print("Warming up...")
+    worker.warm()
+    server = worker.start().serve(args.port, args.bind)
+    print(f"Pipeline worker on http://{args.bind}:{server.server_port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Cloud Provider Stats
+====================
+클라우드 서비스별 생성 기록 저장 + 배치 크기 기준 자동 서비스 선택
+
+한 줄이 요청 하나({"provider", "status", "images", "queue_time", "run_time",
+"download_time", "unit_cost", "time"})인 JSON Lines 파일에 추가 기록하고,
+서비스별 최근 기록으로 실패율과 단계별 평균 시간을 계산한다.
+
+자동 선택(--service auto)은 이미지 N장, 요청당 k장(서비스 max_outputs 이하)에 대해 서비스마다
+
+    시도 수   = ceil(N / k) / (1 - 실패율)
+    예상 시간 = max(ceil(시도 수 / 동시 실행 수) × 평균 요청 시간, 시도 수 / 초당 요청 수)
+    예상 비용 = 시도 수 × k × 이미지당 비용
+
+을 계산해 시간 또는 비용이 가장 작은 서비스를 고른다.
+기록이 MIN_STATS_SAMPLES개 미만인 서비스는 클래스에 설정된 기본값을 쓴다.
+
+Usage:
+    python provider_stats.py -o D:/AI/SpineAtlas/characters            # 서비스별 기록 요약
+    python provider_stats.py -o D:/AI/SpineAtlas/characters -n 40      # 40장 배치 예상 시간/비용
+"""
+
+import json
+import math
+import time
+import argparse
+import threading
+from pathlib import Path
+from collections import deque
+from typing import Dict, List, Tuple
+
+STATS_FILENAME = ".cloud_stats.jsonl"
+STATS_WINDOW = 200        # 서비스별로 사용하는 최근 기록 수
+MIN_STATS_SAMPLES = 3
+PHASES = ("queue_time", "run_time", "download_time")
+MIN_SUCCESS_RATE = 0.05   # 실패율 100%인 서비스도 추정치가 무한대가 되지 않게
+
+OBJECTIVES = ("time", "cost")
+
+
+class ProviderStatsStore:
+    """서비스별 생성 기록 (추가 전용 JSON Lines)"""
+
+    def __init__(self, path: str, window: int = STATS_WINDOW):
+        self.path = Path(path)
+        self.window = window
+        self.lock = threading.Lock()
+        self.records = self.load()
+
+    def load(self) -> Dict[str, deque]:
+        """서비스별 최근 기록 로드 (손상된 줄은 건너뜀)"""
+        records = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(record, dict) and "provider" in record:
+                        records.setdefault(
+                            record["provider"], deque(maxlen=self.window)
+                        ).append(record)
+        except FileNotFoundError:
+            pass
+        return records
+
+    def record(
+        self,
+        provider: str,
+        status: str,
+        timings: Dict[str, float],
+        unit_cost: float,
+        images: int = 1
+    ) -> Dict:
+        """요청 하나의 결과 추가"""
+        entry = {
+            "provider": provider, "status": status, "images": images,
+            "time": time.time(), "unit_cost": unit_cost,
+        }
+        for phase in PHASES:
+            entry[phase] = round(timings.get(phase, 0.0), 3)
+
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.records.setdefault(provider, deque(maxlen=self.window)).append(entry)
+        return entry
+
+    def providers(self) -> List[str]:
+        with self.lock:
+            return list(self.records.keys())
+
+    def summary(self, provider: str) -> Dict:
+        """최근 기록 요약 (시간 평균은 성공한 생성 기준)"""
+        with self.lock:
+            records = list(self.records.get(provider, ()))
+
+        successes = [r for r in records if r["status"] == "success"]
+        summary = {
+            "samples": len(records),
+            "successes": len(successes),
+            "failure_rate": (len(records) - len(successes)) / len(records) if records else 0.0,
+            "unit_cost": records[-1]["unit_cost"] if records else None,
+        }
+        for phase in PHASES:
+            values = [r.get(phase, 0.0) for r in successes]
+            summary[phase] = sum(values) / len(values) if values else None
+        totals = sorted(sum(r.get(phase, 0.0) for phase in PHASES) for r in successes)
+        summary["total_time"] = sum(totals) / len(totals) if totals else None
+        summary["p90_time"] = totals[min(len(totals) - 1, int(0.9 * len(totals)))] if totals else None
+        return summary
+
+    def recent_totals(self, provider: str) -> List[float]:
+        """성공한 생성의 전체 시간 목록 (라우터 p90 초기값용)"""
+        with self.lock:
+            records = list(self.records.get(provider, ()))
+        return [
+            sum(r.get(phase, 0.0) for phase in PHASES)
+            for r in records if r["status"] == "success"
+        ]
+
+
+def estimate(provider, summary: Dict, batch_size: int, images_per_request: int = 1) -> Dict:
+    """이미지 batch_size장을 이 서비스로 처리할 때의 예상 시간/비용"""
+    from_history = summary["successes"] >= MIN_STATS_SAMPLES
+    latency = summary["total_time"] if from_history else provider.default_latency
+    failure_rate = summary["failure_rate"] if summary["samples"] >= MIN_STATS_SAMPLES else 0.0
+
+    per_request = max(1, min(images_per_request, provider.max_outputs))
+    attempts = math.ceil(batch_size / per_request) / max(1.0 - failure_rate, MIN_SUCCESS_RATE)
+    waves = math.ceil(attempts / provider.max_concurrency)
+    return {
+        "provider": provider.name,
+        "source": "history" if from_history else "default",
+        "latency": latency,
+        "failure_rate": failure_rate,
+        "time": max(waves * latency, attempts / provider.rate_limit),
+        "cost": attempts * per_request * provider.unit_cost,
+    }
+
+
+def choose_provider(
+    providers: List,
+    store: ProviderStatsStore,
+    batch_size: int,
+    objective: str = "time",
+    images_per_request: int = 1
+) -> Tuple[object, List[Dict]]:
+    """
+    이미지 batch_size장의 예상 시간(objective="time") 또는 비용("cost")이 가장 작은 서비스
+
+    providers는 CloudProvider 인스턴스 또는 클래스 (설정값 속성만 사용)
+
+    Returns:
+        (선택된 provider, 서비스별 추정치 목록 - 좋은 순)
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective must be one of {OBJECTIVES}")
+    if not providers:
+        raise ValueError("사용할 클라우드 서비스가 없습니다")
+
+    other = "cost" if objective == "time" else "time"
+    scored = [
+        (estimate(provider, store.summary(provider.name), batch_size, images_per_request), provider)
+        for provider in providers
+    ]
+    scored.sort(key=lambda item: (item[0][objective], item[0][other]))
+    return scored[0][1], [est for est, _ in scored]
+
+
+def print_estimates(estimates: List[Dict]):
+    for est in estimates:
+        print(f"  {est['provider']:>10}: ~{est['time']:.0f}s, ${est['cost']:.3f} "
+              f"({est['latency']:.1f}s/request, fail {est['failure_rate']:.0%}, {est['source']})")
+
+
+def main():
+    from cloud_api_alternatives import PROVIDERS, parse_mock_providers
+
+    parser = argparse.ArgumentParser(
+        description="Show cloud provider stats and batch estimates"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        required=True,
+        help="cloud_api_alternatives.py 출력 디렉토리"
+    )
+    parser.add_argument(
+        "--batch-size", "-n",
+        type=int,
+        help="이 이미지 수 배치의 서비스별 예상 시간/비용 출력"
+    )
+    parser.add_argument(
+        "--variants",
+        type=int,
+        default=1,
+        help="표정당 후보 수 (요청당 이미지 수)"
+    )
+    parser.add_argument(
+        "--mock-providers",
+        default="",
+        help="추정에 포함할 모의 서비스 (cloud_api_alternatives.py --mock-providers와 같은 형식)"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        mock_providers = parse_mock_providers(args.mock_providers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    store = ProviderStatsStore(Path(args.output) / STATS_FILENAME)
+    if not store.records:
+        print(f"기록이 없습니다: {store.path}")
+
+    for name in store.providers():
+        s = store.summary(name)
+        phases = ", ".join(
+            f"{phase.split('_')[0]} {s[phase]:.1f}s" for phase in PHASES if s[phase] is not None
+        )
+        print(f"{name}: {s['samples']} runs, fail {s['failure_rate']:.0%}"
+              + (f", {phases}, p90 {s['p90_time']:.1f}s" if phases else ""))
+
+    if args.batch_size:
+        # API 키 없이 클래스 설정값(동시 실행 수, rate, 비용, 기본 시간)만 사용
+        print(f"\nEstimates for {args.batch_size} images:")
+        _, estimates = choose_provider(
+            list(PROVIDERS.values()) + list(mock_providers.values()), store, args.batch_size,
+            images_per_request=args.variants
+        )
+        print_estimates(estimates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""
+Streaming Pipeline
+==================
+캐릭터 × 표정 이미지마다 생성 → 파츠 분리 → Atlas 패킹을 흘려보내는 오케스트레이터
+
+batch_generate.py, async_segment.py, atlas_packer.py를 따로 실행하면 모든 캐릭터 생성이
+끝나야 분리가 시작되고, 분리가 모두 끝나야 패킹이 시작된다. 여기서는 이미지 하나가
+다운로드되는 즉시 분리 단계로, 분리가 끝나는 즉시 패킹 단계로 넘기므로
+첫 Atlas가 실행 시작 몇 분 안에 나온다.
+
+    JobScheduler ─▶ download ─▶ segment ─▶ pack
+    (ComfyUI 큐)     [큐|N]      [큐|N]     [큐|N]
+
+단계마다 작업자 스레드 풀과 길이 제한 입력 큐를 둔다. 뒷 단계가 밀려 큐가 가득 차면
+앞 단계의 put이 막히고, 결국 스케줄러 완료 콜백이 막혀 새 프롬프트 제출이 멈춘다 (back-pressure).
+작업은 캐릭터 순으로 제출해 첫 캐릭터의 Atlas가 먼저 완성된다.
+
+출력:
+    <output>/<char>/full/<char>_<expr>.png     생성 이미지 (batch_generate와 동일, 저널/출력 캐시 공유)
+    <parts-output>/<char>_<expr>/<part>.png    파츠
+    <atlas-output>/<char>_<expr>.atlas / .png  Atlas
+
+Usage:
+    python stream_pipeline.py --character arcana
+    python stream_pipeline.py --all --segment-backend fast --segment-workers 4
+"""
+
+import sys
+import time
+import queue
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from comfy_client import get_client, check_comfyui
+from batch_generate import (
+    DEFAULT_COMFYUI_HOST,
+    DEFAULT_OUTPUT_DIR,
+    DEFAULT_DOWNLOAD_WORKERS,
+    FULL_SIZE,
+    load_prompts,
+    build_jobs,
+    get_vram_total,
+    max_batch_for_vram,
+    restore_cached,
+    image_paths,
+    save_job_outputs,
+    print_job_result,
+    JobScheduler,
+)
+from generation_cache import GenerationCache, CACHE_DIRNAME
+from job_journal import JobJournal
+from parts_segment import DEFAULT_OUTPUT_DIR as DEFAULT_PARTS_DIR, DEFAULT_UPLOAD_MANIFEST, PARTS_PROMPTS
+from async_segment import AsyncSegmentRunner
+from atlas_packer import SpineAtlasPacker
+
+DEFAULT_ATLAS_DIR = "D:/AI/SpineAtlas/atlas"
+DEFAULT_STAGE_QUEUE = 4     # 단계별 대기 항목 수 (넘으면 앞 단계가 기다림)
+DEFAULT_SEGMENT_WORKERS = 2
+DEFAULT_PACK_WORKERS = 2
+
+
+class Stage:
+    """작업자 스레드 풀 + 길이 제한 입력 큐 (가득 차면 put이 막혀 앞 단계가 기다림)"""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Dict], None],
+        workers: int = 1,
+        queue_size: int = DEFAULT_STAGE_QUEUE,
+        on_error: Optional[Callable[[str, Dict, Exception], None]] = None
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.on_error = on_error
+        self.threads = []
+        self.lock = threading.Lock()
+        self.stats = {"done": 0, "failed": 0, "busy": 0.0, "blocked": 0.0, "max_queue": 0}
+
+    def start(self) -> "Stage":
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def put(self, item: Dict):
+        """항목 추가 (큐가 가득 차면 자리가 날 때까지 대기, 대기 시간은 blocked로 집계)"""
+        started = time.time()
+        self.queue.put(item)
+        with self.lock:
+            self.stats["blocked"] += time.time() - started
+            self.stats["max_queue"] = max(self.stats["max_queue"], self.queue.qsize())
+
+    def close(self):
+        """남은 항목을 모두 처리한 뒤 작업자 종료 (앞 단계를 먼저 close해야 함)"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            started = time.time()
+            try:
+                self.handler(item)
+                outcome = "done"
+            except Exception as e:
+                outcome = "failed"
+                if self.on_error:
+                    self.on_error(self.name, item, e)
+            with self.lock:
+                self.stats[outcome] += 1
+                self.stats["busy"] += time.time() - started
+
+
+class StreamingPipeline:
+    """생성 결과를 download → segment → pack 단계로 흘려보내는 오케스트레이터"""
+
+    def __init__(
+        self,
+        hosts: List,
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+        parts_dir: str = DEFAULT_PARTS_DIR,
+        atlas_dir: str = DEFAULT_ATLAS_DIR,
+        parts: Optional[List[str]] = None,
+        segment_backend: str = "comfyui",
+        packer: Optional[SpineAtlasPacker] = None,
+        atlas_format: str = "spine",
+        max_in_flight: int = 3,
+        timeout: int = 120,
+        workers: Optional[Dict[str, int]] = None,
+        queue_size: int = DEFAULT_STAGE_QUEUE,
+        cache: Optional[GenerationCache] = None,
+        journal: Optional[JobJournal] = None,
+        force: bool = False
+    ):
+        """
+        Args:
+            hosts: ComfyUI 호스트 / 생성 백엔드 (JobScheduler와 같음, comfyui 분리는 첫 호스트 사용)
+            output_dir: 생성 이미지 출력 폴더
+            parts_dir: 파츠 출력 폴더 (<parts_dir>/<image stem>/<part>.png)
+            atlas_dir: Atlas 출력 폴더 (<atlas_dir>/<image stem>.atlas)
+            parts: 분리할 파츠 (기본: 백엔드의 전체 파츠)
+            segment_backend: "comfyui" (SAM) 또는 "fast" (CPU)
+            workers: 단계별 작업자 수 {"download", "segment", "pack"}
+            queue_size: 단계별 입력 큐 길이
+            force: 이미지보다 새 Atlas가 있어도 다시 분리/패킹
+        """
+        self.hosts = hosts
+        self.output_dir = output_dir
+        self.parts_dir = Path(parts_dir)
+        self.atlas_dir = Path(atlas_dir)
+        self.parts = parts
+        self.segment_backend = segment_backend
+        self.packer = packer or SpineAtlasPacker()
+        self.atlas_format = atlas_format
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.cache = cache
+        self.journal = journal
+        self.force = force
+
+        workers = dict(
+            {"download": DEFAULT_DOWNLOAD_WORKERS, "segment": DEFAULT_SEGMENT_WORKERS,
+             "pack": DEFAULT_PACK_WORKERS},
+            **(workers or {})
+        )
+        self.pack_stage = Stage("pack", self._pack, workers["pack"], queue_size, self._failed)
+        self.segment_stage = Stage("segment", self._segment, workers["segment"], queue_size, self._failed)
+        self.download_stage = Stage("download", self._download, workers["download"], queue_size, self._failed)
+        self.stages = [self.download_stage, self.segment_stage, self.pack_stage]
+
+        self.segment_host = next((h for h in hosts if isinstance(h, str)), None)
+        if segment_backend == "fast":
+            import fast_segment
+            self.segment_fast = fast_segment.segment_parts_fast
+        elif self.segment_host:
+            self.segment_client = get_client(self.segment_host)
+
+        self.scheduler = None
+        self.lock = threading.Lock()
+        self.started = None
+        self.atlases = []    # {"key", "atlas", "ready"(시작 후 초)}
+        self.skipped = []
+        self.errors = []
+
+    def run(self, jobs: List[Dict], done_jobs: Optional[List[Dict]] = None) -> Dict:
+        """
+        jobs를 생성하면서 끝나는 대로 분리/패킹
+
+        Args:
+            jobs: 생성할 작업 (build_jobs 형식, 이 순서로 제출)
+            done_jobs: 이미 이미지가 있는 작업 (저널 완료/출력 캐시 복원) → 바로 분리 단계로
+
+        Returns:
+            {"elapsed", "first_atlas", "atlases", "skipped", "generation", "stages", "errors"}
+        """
+        self.started = time.time()
+        for stage in self.stages:
+            stage.start()
+
+        # 이미 있는 이미지는 별도 스레드에서 넣어 GPU 제출이 기다리지 않게 함
+        feeder = threading.Thread(
+            target=lambda: [self.download_stage.put({"job": job, "fetch": False}) for job in done_jobs or []],
+            daemon=True
+        )
+        feeder.start()
+
+        results = []
+        if jobs:
+            self.scheduler = JobScheduler(
+                self.hosts, max_in_flight=self.max_in_flight, timeout=self.timeout,
+                journal=self.journal
+            )
+            results = self.scheduler.run(jobs, on_complete=self._generated)
+
+        feeder.join()
+        for stage in self.stages:
+            stage.close()
+
+        ready = [atlas["ready"] for atlas in self.atlases]
+        return {
+            "elapsed": time.time() - self.started,
+            "first_atlas": min(ready) if ready else None,
+            "atlases": list(self.atlases),
+            "skipped": list(self.skipped),
+            "generation": results,
+            "stages": {stage.name: dict(stage.stats, workers=stage.workers) for stage in self.stages},
+            "errors": [f"{r['key']}: {r['error']}" for r in results if r["error"]] + self.errors,
+        }
+
+    # ---- 단계 ----
+
+    def _generated(self, result: Dict, done: int, total: int):
+        """스케줄러 완료 콜백 (download 큐가 차 있으면 여기서 막혀 다음 제출이 늦춰짐)"""
+        print_job_result(result, done, total)
+        if result["status"] == "success":
+            self.download_stage.put({"job": result, "fetch": True})
+
+    def _download(self, item: Dict):
+        job = item["job"]
+        if item["fetch"]:
+            backend = self.scheduler.backends.get(job["host"]) if self.scheduler else None
+            save_job_outputs(job, self.output_dir, self.cache, backend)
+        for path in image_paths(self.output_dir, job):
+            if path.exists():
+                self.segment_stage.put({"key": path.stem, "image": path})
+            else:
+                self._failed("download", {"key": path.stem}, FileNotFoundError(str(path)))
+
+    def _segment(self, item: Dict):
+        image = item["image"]
+        atlas_path = self.atlas_dir / f"{image.stem}.atlas"
+        if (not self.force and atlas_path.exists()
+                and atlas_path.stat().st_mtime >= image.stat().st_mtime):
+            with self.lock:
+                self.skipped.append(item["key"])
+            print(f"  [SKIP] {item['key']}: atlas is up to date")
+            return
+
+        part_dir = self.parts_dir / image.stem
+        if self.segment_backend == "fast":
+            result = self.segment_fast(str(image), str(part_dir), self.parts)
+        else:
+            runner = AsyncSegmentRunner(
+                self.segment_host, str(self.parts_dir), self.parts,
+                manifest_path=DEFAULT_UPLOAD_MANIFEST, client=self.segment_client
+            )
+            result = asyncio.run(runner.run([str(image)]))[0]
+        if not result["parts"]:
+            raise RuntimeError("; ".join(result["errors"]) or "no parts")
+        for error in result["errors"]:
+            print(f"    [WARN] {item['key']}: {error}")
+        self.pack_stage.put(dict(item, part_dir=part_dir, atlas=atlas_path))
+
+    def _pack(self, item: Dict):
+        parts = self.packer.load_parts(str(item["part_dir"]))
+        if not parts:
+            raise RuntimeError(f"no part images in {item['part_dir']}")
+        atlas, regions, width, height = self.packer.pack(parts)
+        atlas_path, _ = self.packer.save(
+            atlas, regions, width, height, str(item["atlas"]), self.atlas_format
+        )
+        ready = time.time() - self.started
+        with self.lock:
+            self.atlases.append({"key": item["key"], "atlas": atlas_path, "ready": ready})
+        print(f"  [ATLAS] {item['key']} → {atlas_path} (+{ready:.1f}s)")
+
+    def _failed(self, stage: str, item: Dict, error: Exception):
+        key = item["job"]["key"] if "job" in item else item["key"]
+        with self.lock:
+            self.errors.append(f"{key}: {stage} {error}")
+        print(f"  [FAIL] {stage} {key}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stream generate → segment → pack per character expression"
+    )
+    parser.add_argument(
+        "--character", "-c",
+        help="캐릭터 이름 (예: arcana, leonhardt)"
+    )
+    parser.add_argument(
+        "--all", "-a",
+        action="store_true",
+        help="모든 캐릭터"
+    )
+    parser.add_argument(
+        "--expressions", "-e",
+        default="idle,happy,angry,skill,victory",
+        help="표정 (콤마 구분, 기본: idle,happy,angry,skill,victory)"
+    )
+    parser.add_argument(
+        "--variants", "-n",
+        type=int,
+        default=1,
+        help="표정당 후보 수 (후보마다 Atlas 하나)"
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_COMFYUI_HOST,
+        help=f"ComfyUI 호스트, 여러 대면 콤마 구분 (기본: {DEFAULT_COMFYUI_HOST})"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        default=DEFAULT_OUTPUT_DIR,
+        help=f"생성 이미지 출력 디렉토리 (기본: {DEFAULT_OUTPUT_DIR})"
+    )
+    parser.add_argument(
+        "--parts-output",
+        default=DEFAULT_PARTS_DIR,
+        help=f"파츠 출력 디렉토리 (기본: {DEFAULT_PARTS_DIR})"
+    )
+    parser.add_argument(
+        "--atlas-output",
+        default=DEFAULT_ATLAS_DIR,
+        help=f"Atlas 출력 디렉토리 (기본: {DEFAULT_ATLAS_DIR})"
+    )
+    parser.add_argument(
+        "--no-rembg",
+        action="store_true",
+        help="rembg 배경 제거 비활성화"
+    )
+    parser.add_argument(
+        "--seed-salt",
+        default="",
+        help="seed 유도용 salt (batch_generate와 같음)"
+    )
+    parser.add_argument(
+        "--segment-backend",
+        choices=["comfyui", "fast"],
+        default="comfyui",
+        help="comfyui: SAM (생성과 같은 GPU 큐 공유), fast: CPU 색상 분리 (기본: comfyui)"
+    )
+    parser.add_argument(
+        "--parts", "-p",
+        help="분리할 파츠 (콤마 구분, 기본: 전체)"
+    )
+    parser.add_argument(
+        "--format", "-f",
+        choices=["spine", "json"],
+        default="spine",
+        help="Atlas 형식 (기본: spine)"
+    )
+    parser.add_argument(
+        "--atlas-size",
+        type=int,
+        default=2048,
+        help="최대 Atlas 크기 (기본: 2048)"
+    )
+    parser.add_argument(
+        "--in-flight", "-j",
+        type=int,
+        default=3,
+        help="ComfyUI 큐에 동시에 올려둘 생성 프롬프트 수 (기본: 3)"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=120,
+        help="생성 작업당 최대 실행 시간 (기본: 120초)"
+    )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=DEFAULT_DOWNLOAD_WORKERS,
+        help=f"download 단계 작업자 수 (기본: {DEFAULT_DOWNLOAD_WORKERS})"
+    )
+    parser.add_argument(
+        "--segment-workers",
+        type=int,
+        default=DEFAULT_SEGMENT_WORKERS,
+        help=f"segment 단계 작업자 수 (기본: {DEFAULT_SEGMENT_WORKERS})"
+    )
+    parser.add_argument(
+        "--pack-workers",
+        type=int,
+        default=DEFAULT_PACK_WORKERS,
+        help=f"pack 단계 작업자 수 (기본: {DEFAULT_PACK_WORKERS})"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_STAGE_QUEUE,
+        help=f"단계별 대기 항목 수, 넘으면 앞 단계가 기다림 (기본: {DEFAULT_STAGE_QUEUE})"
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="저널 무시, 완료된 작업도 다시 생성"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="출력 캐시 사용 안 함"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="최신 Atlas가 있어도 다시 분리/패킹"
+    )
+
+    args = parser.parse_args()
+
+    prompts = load_prompts()
+    characters = prompts["characters"]
+    if args.all:
+        char_list = list(characters.keys())
+    elif args.character:
+        if args.character not in characters:
+            print(f"Error: Unknown character '{args.character}'")
+            print(f"Available: {', '.join(characters.keys())}")
+            sys.exit(1)
+        char_list = [args.character]
+    else:
+        print("Error: Specify --character or --all")
+        parser.print_help()
+        sys.exit(1)
+
+    parts = [p.strip() for p in args.parts.split(",")] if args.parts else None
+    if parts and args.segment_backend == "comfyui":
+        unknown = [p for p in parts if p not in PARTS_PROMPTS]
+        if unknown:
+            print(f"Error: Unknown part(s): {', '.join(unknown)}")
+            sys.exit(1)
+
+    hosts = [h.strip().rstrip("/") for h in args.host.split(",") if h.strip()]
+    alive_hosts = [host for host in hosts if check_comfyui(host)]
+    if not alive_hosts:
+        print("Error: ComfyUI is not running!")
+        print(f"Please start ComfyUI: python main.py --listen --port 8188")
+        sys.exit(1)
+
+    max_batch = min(
+        max_batch_for_vram(get_vram_total(host), FULL_SIZE, FULL_SIZE) for host in alive_hosts
+    )
+    jobs = build_jobs(
+        char_list, [e.strip() for e in args.expressions.split(",")], prompts,
+        use_rembg=not args.no_rembg,
+        variants=args.variants,
+        max_batch=max_batch,
+        seed_salt=args.seed_salt
+    )
+
+    journal = JobJournal(args.output)
+    if args.no_resume:
+        journal.entries = {}
+    completed = {
+        job["key"] for job in jobs
+        if journal.is_completed(job["key"], image_paths(args.output, job), job["hash"])
+    }
+    done_jobs = [job for job in jobs if job["key"] in completed]
+    jobs = [job for job in jobs if job["key"] not in completed]
+    cache = None if args.no_cache else GenerationCache(Path(args.output) / CACHE_DIRNAME)
+    if cache:
+        jobs, cache_hits = restore_cached(jobs, args.output, cache, journal)
+        done_jobs += cache_hits
+
+    workers = {
+        "download": args.download_workers,
+        "segment": args.segment_workers,
+        "pack": args.pack_workers,
+    }
+    print("=" * 50)
+    print("  Streaming Pipeline Plan")
+    print("=" * 50)
+    print(f"  Characters: {len(char_list)}")
+    print(f"  Images: {sum(len(job['images']) for job in jobs + done_jobs)} "
+          f"({len(done_jobs)} job(s) already generated)")
+    print(f"  Segment: {args.segment_backend}")
+    print(f"  Workers: " + ", ".join(f"{name} {count}" for name, count in workers.items())
+          + f" (queue {args.queue_size} per stage)")
+    print(f"  Atlas Output: {args.atlas_output}")
+    print("=" * 50)
+    print()
+
+    pipeline = StreamingPipeline(
+        alive_hosts, args.output, args.parts_output, args.atlas_output,
+        parts=parts,
+        segment_backend=args.segment_backend,
+        packer=SpineAtlasPacker(atlas_size=args.atlas_size),
+        atlas_format=args.format,
+        max_in_flight=args.in_flight,
+        timeout=args.timeout,
+        workers=workers,
+        queue_size=args.queue_size,
+        cache=cache,
+        journal=journal,
+        force=args.force
+    )
+    summary = pipeline.run(jobs, done_jobs)
+
+    elapsed = summary["elapsed"]
+    print("\n" + "=" * 50)
+    print("  Pipeline Complete")
+    print("=" * 50)
+    print(f"  Total Time: {elapsed:.1f}s")
+    print(f"  Atlases: {len(summary['atlases'])}"
+          + (f" (skipped {len(summary['skipped'])} up to date)" if summary["skipped"] else ""))
+    if summary["first_atlas"] is not None:
+        print(f"  First Atlas: +{summary['first_atlas']:.1f}s")
+    if elapsed > 0:
+        print(f"  Throughput: {len(summary['atlases']) / elapsed * 60:.1f} atlases/min")
+    print("  Stages:")
+    for name, stats in summary["stages"].items():
+        busy = stats["busy"] / (stats["workers"] * elapsed) if elapsed > 0 else 0.0
+        line = (f"    - {name}: {stats['done']} done, busy {busy:.0%} of {stats['workers']} worker(s), "
+                f"max queue {stats['max_queue']}")
+        if stats["failed"]:
+            line += f", {stats['failed']} failed"
+        if stats["blocked"] >= 0.1:
+            line += f", upstream waited {stats['blocked']:.1f}s"
+        print(line)
+
+    errors = summary["errors"]
+    if errors:
+        print(f"\n  Errors ({len(errors)}):")
+        for err in errors[:10]:
+            print(f"    - {err}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,10 @@ n8n 워크플로우에서 사용하는 ComfyUI API 호출을 직접 테스트
 import json
 import requests
 import random
-import time
 import sys
 
+from comfy_client import get_client
+
 COMFYUI_URL = "http://localhost:8188"
 
 def build_workflow(character: str, expression: str, seed: int = None) -> dict:
@@ -88,31 +89,8 @@ def build_workflow(character: str, expression: str, seed: int = None) -> dict:
 
 
 def queue_prompt(workflow: dict) -> dict:
-    """ComfyUI에 프롬프트 큐잉"""
-    response = requests.post(
-        f"{COMFYUI_URL}/prompt",
-        json=workflow,
-        headers={"Content-Type": "application/json"}
-    )
-    return response.json()
-
-
-def get_history(prompt_id: str) -> dict:
-    """실행 히스토리 조회"""
-    response = requests.get(f"{COMFYUI_URL}/history/{prompt_id}")
-    return response.json()
-
-
-def wait_for_completion(prompt_id: str, timeout: int = 120) -> bool:
-    """실행 완료 대기"""
-    start = time.time()
-    while time.time() - start < timeout:
-        history = get_history(prompt_id)
-        if prompt_id in history:
-            return True
-        time.sleep(2)
-        print(".", end="", flush=True)
-    return False
+    """ComfyUI에 프롬프트 큐잉 (/prompt 응답 전체)"""
+    return get_client(COMFYUI_URL).post_prompt(workflow["prompt"], workflow["client_id"])
 
 
 def main():
@@ -137,12 +115,11 @@ def main():
             prompt_id = result["prompt_id"]
             print(f"\n생성 대기 중 (prompt_id: {prompt_id})")
 
-            if wait_for_completion(prompt_id):
+            entry = get_client(COMFYUI_URL).wait_for_completion(prompt_id, timeout=120)
+            if entry is not None:
                 print("\n\n완료!")
-                history = get_history(prompt_id)
-                if prompt_id in history:
-                    outputs = history[prompt_id].get("outputs", {})
-                    print(f"출력: {json.dumps(outputs, indent=2)[:500]}")
+                outputs = entry.get("outputs", {})
+                print(f"출력: {json.dumps(outputs, indent=2)[:500]}")
             else:
                 print("\n\n타임아웃!")
         elif "error" in result:
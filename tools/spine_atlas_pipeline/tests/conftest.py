@@ -0,0 +1,6 @@
+"""파이프라인 스크립트는 같은 폴더의 모듈을 바로 import하므로 상위 폴더를 경로에 추가"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
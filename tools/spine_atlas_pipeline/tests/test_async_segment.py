@@ -0,0 +1,43 @@
+"""async_segment 마스크 다운로드 (mock_comfyui)"""
+
+import pytest
+
+from async_segment import run_segmentation
+from mock_comfyui import MockComfyUI, figure_png
+
+PARTS = ["head", "body"]
+
+
+@pytest.fixture
+def mock():
+    server = MockComfyUI(exec_time="fixed:0.02").start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "arcana_idle.png"
+    path.write_bytes(figure_png())
+    return str(path)
+
+
+def test_masks_are_saved_without_part_files(mock, image, tmp_path):
+    out = tmp_path / "parts"
+    results = run_segmentation(mock.host, [image], str(out), parts=PARTS, poll_interval=0.05,
+                               manifest_path=None)
+
+    assert results[0]["errors"] == []
+    assert sorted(p.name for p in (out / "arcana_idle").iterdir()) == ["body.png", "head.png"]
+
+
+def test_failed_download_leaves_no_part_file(mock, image, tmp_path):
+    out = tmp_path / "parts"
+    (out / "arcana_idle" / "head.png").mkdir(parents=True)   # rename 대상이 폴더라 실패
+
+    results = run_segmentation(mock.host, [image], str(out), parts=PARTS, poll_interval=0.05,
+                               manifest_path=None)
+
+    assert results[0]["parts"] == {"head": "error", "body": "success"}
+    assert any("head: download" in error for error in results[0]["errors"])
+    assert not list(out.rglob("*.part"))
@@ -0,0 +1,149 @@
+"""cloud_api_alternatives 동기 대기 / 폴링 전환 / webhook 경로 (mock_cloud.py 대역 서버)"""
+
+import time
+import threading
+
+import pytest
+
+import cloud_api_alternatives
+from cloud_api_alternatives import ReplicateAPI, RunPodAPI, GenerationTimeout
+from batch_generate import build_jobs, load_prompts
+from cloud_webhook import WebhookReceiver
+from mock_cloud import MockCloud
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.fixture
+def cloud(request):
+    """MockCloud 시작 (파라미터: MockCloud 키워드 인자)"""
+    mock = MockCloud(**getattr(request, "param", {})).start()
+    yield mock
+    mock.stop()
+
+
+@pytest.fixture
+def webhook():
+    receiver = WebhookReceiver("http://127.0.0.1", port=0, bind="127.0.0.1")
+    receiver.public_url = f"http://127.0.0.1:{receiver.port}"
+    receiver.start()
+    yield receiver
+    receiver.stop()
+
+
+def replicate(mock: MockCloud) -> ReplicateAPI:
+    return ReplicateAPI(api_token="test", base_url=f"{mock.host}/v1")
+
+
+def runpod(mock: MockCloud) -> RunPodAPI:
+    return RunPodAPI(api_key="test", endpoint_id="endpoint", base_url=f"{mock.host}/v2")
+
+
+def eventually(predicate, timeout: float = 2.0) -> bool:
+    """서버 스레드가 통계를 갱신할 때까지 잠깐 대기"""
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def assert_images(paths):
+    for path in paths:
+        with open(path, "rb") as f:
+            assert f.read(8) == PNG_SIGNATURE
+
+
+@pytest.mark.parametrize("cloud", [{"run_time": "fixed:0.3"}], indirect=True)
+def test_replicate_prefer_wait_returns_finished_prediction(cloud, tmp_path):
+    paths = [str(tmp_path / "a_v1.png"), str(tmp_path / "a_v2.png")]
+    replicate(cloud).run("positive", "negative", paths)
+
+    stats = cloud.snapshot()
+    assert stats["sync_completed"] == 1
+    assert stats["status_polls"] == 0
+    assert stats["files"] == 2
+    assert_images(paths)
+
+
+@pytest.mark.parametrize("cloud", [{"run_time": "fixed:1.5"}], indirect=True)
+def test_replicate_polls_when_sync_wait_expires(cloud, tmp_path):
+    api = replicate(cloud)
+    api.sync_wait = 1
+    paths = [str(tmp_path / "a.png")]
+    api.run("positive", "negative", paths)
+
+    stats = cloud.snapshot()
+    assert stats["sync_completed"] == 0
+    assert stats["status_polls"] >= 1
+    assert_images(paths)
+
+
+@pytest.mark.parametrize("cloud", [{"run_time": "fixed:1.0", "runsync_wait": 0.2}], indirect=True)
+def test_runpod_runsync_timeout_falls_back_to_status_polling(cloud, tmp_path):
+    paths = [str(tmp_path / "a.png")]
+    runpod(cloud).run("positive", "negative", paths)
+
+    stats = cloud.snapshot()
+    assert stats["sync_completed"] == 0
+    assert stats["status_polls"] >= 1
+    assert_images(paths)
+
+
+@pytest.mark.parametrize("cloud", [{"run_time": "fixed:0.2"}], indirect=True)
+def test_runpod_runs_batch_generate_job_workflow(cloud, tmp_path):
+    job = build_jobs(["arcana"], ["idle"], load_prompts(), use_rembg=False, variants=2, max_batch=2)[0]
+    api = runpod(cloud)
+    paths = [str(tmp_path / f"{name}.png") for name in job["images"]]
+    api.generate_job(job, paths, threading.Event())
+    assert_images(paths)
+
+    # 출력 파일명이 작업 이미지 이름과 맞지 않으면 실패
+    with pytest.raises(Exception, match="do not match"):
+        api.run("", "", paths, workflow=job["prompt"], names=["arcana_happy_v1", "arcana_happy_v2"])
+
+
+@pytest.mark.parametrize("cloud", [{"run_time": "fixed:1.0"}], indirect=True)
+@pytest.mark.parametrize("make_api", [replicate, runpod])
+def test_webhook_push_finishes_before_slow_poll(cloud, webhook, tmp_path, make_api):
+    api = make_api(cloud)
+    api.webhook = webhook
+    api.sync_wait = 0
+    paths = [str(tmp_path / "a.png")]
+
+    started = time.time()
+    api.run("positive", "negative", paths)
+    elapsed = time.time() - started
+
+    assert elapsed < cloud_api_alternatives.WEBHOOK_POLL_INITIAL
+    assert eventually(lambda: cloud.snapshot()["webhooks_sent"] == 1)
+    stats = cloud.snapshot()
+    assert stats["status_polls"] == 1   # poll_until 첫 조회만, 완료는 webhook으로
+    assert_images(paths)
+
+
+@pytest.mark.parametrize("cloud", [{"run_time": "fixed:0.5", "drop_webhooks": True}], indirect=True)
+def test_missing_webhook_falls_back_to_polling(cloud, webhook, tmp_path, monkeypatch):
+    monkeypatch.setattr(cloud_api_alternatives, "WEBHOOK_POLL_INITIAL", 0.3)
+    api = replicate(cloud)
+    api.webhook = webhook
+    api.sync_wait = 0
+    paths = [str(tmp_path / "a.png")]
+    api.run("positive", "negative", paths)
+
+    stats = cloud.snapshot()
+    assert stats["webhooks_sent"] == 0
+    assert stats["status_polls"] >= 2
+    assert_images(paths)
+
+
+@pytest.mark.parametrize("cloud", [{"run_time": "fixed:30"}], indirect=True)
+@pytest.mark.parametrize("make_api", [replicate, runpod])
+def test_timeout_cancels_remote_job(cloud, tmp_path, make_api):
+    api = make_api(cloud)
+    api.sync_wait = 0
+    api.generation_timeout = 0.5
+    with pytest.raises(GenerationTimeout):
+        api.run("positive", "negative", [str(tmp_path / "a.png")])
+    assert eventually(lambda: cloud.snapshot()["cancelled"] == 1)
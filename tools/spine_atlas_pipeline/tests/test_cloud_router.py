@@ -0,0 +1,62 @@
+"""ProviderRouter hedge / failover 후 임시 파일과 .<service>.part 폴더 정리 (MockProvider)"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cloud_api_alternatives import MockProvider
+from cloud_router import ProviderRouter
+
+
+@pytest.fixture
+def make_router():
+    routers = []
+
+    def make(*providers, **kwargs):
+        router = ProviderRouter(list(providers), **kwargs)
+        routers.append(router)
+        return router
+
+    yield make
+    for router in routers:
+        router.close()
+
+
+def leftovers(path):
+    return sorted(p.name for p in path.iterdir() if p.name.startswith("."))
+
+
+def test_hedge_winner_is_promoted_and_part_dirs_removed(make_router, tmp_path):
+    router = make_router(MockProvider("slow", run_time=2.0), MockProvider("fast", run_time=0.05),
+                         hedge_delay=0.1)
+    paths = [str(tmp_path / "a_v1.png"), str(tmp_path / "a_v2.png")]
+    router.run("positive", "negative", paths)
+    router.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a_v1.png", "a_v2.png"]
+    stats = router.provider_stats()
+    assert stats["fast"]["won"] == 1
+    assert stats["slow"]["cancelled"] == 1
+
+
+def test_failover_discards_failed_attempt(make_router, tmp_path):
+    router = make_router(MockProvider("broken", run_time=0.01, failure_rate=1.0),
+                         MockProvider("ok", run_time=0.01))
+    router.run("positive", "negative", str(tmp_path / "a.png"))
+    router.close()
+
+    assert [p.name for p in tmp_path.iterdir()] == ["a.png"]
+    assert router.provider_stats()["broken"]["failed"] == 1
+
+
+def test_concurrent_jobs_share_part_dir(make_router, tmp_path):
+    router = make_router(MockProvider("a", run_time=0.05, max_concurrency=8),
+                         MockProvider("b", run_time=0.02, failure_rate=0.3, max_concurrency=8),
+                         hedge_delay=0.03)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: router.run("p", "n", str(tmp_path / f"{i}.png")), range(24)))
+    router.close()
+
+    assert leftovers(tmp_path) == []
+    assert len(list(tmp_path.glob("*.png"))) == 24
+    assert router.part_dirs == {}
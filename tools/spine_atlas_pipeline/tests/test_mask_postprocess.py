@@ -0,0 +1,53 @@
+"""mask_postprocess 겹침 해소 z-order / 조각 재배분"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")   # mask_postprocess는 의존성이 없으면 import 시 종료
+
+from mask_postprocess import resolve_overlaps, postprocess_masks, z_rank
+
+
+def boxes(shape, *regions):
+    """(y0, y1, x0, x1) 영역마다 bool 마스크 하나"""
+    masks = np.zeros((len(regions),) + shape, dtype=bool)
+    for mask, (y0, y1, x0, x1) in zip(masks, regions):
+        mask[y0:y1, x0:x1] = True
+    return masks
+
+
+def test_z_rank_follows_atlas_part_order():
+    assert z_rank("body") < z_rank("head") < z_rank("hair") < z_rank("weapon") < z_rank("accessory")
+    assert z_rank("unknown_part") > z_rank("accessory")   # 알 수 없는 파츠는 맨 앞
+
+
+def test_front_part_owns_overlap():
+    names = ["hair", "body", "head"]   # 입력 순서와 무관하게 z-order로 결정
+    masks = boxes((4, 6), (0, 2, 0, 4), (0, 4, 0, 6), (0, 3, 2, 6))
+    owner = resolve_overlaps(masks, [z_rank(name) for name in names])
+
+    assert owner.tolist() == [
+        [0, 0, 0, 0, 2, 2],
+        [0, 0, 0, 0, 2, 2],
+        [1, 1, 2, 2, 2, 2],
+        [1, 1, 1, 1, 1, 1],
+    ]
+
+
+def test_unclaimed_pixels_have_no_owner_and_ties_keep_later_part():
+    masks = boxes((2, 3), (0, 1, 0, 2), (0, 1, 1, 3))
+    owner = resolve_overlaps(masks, [5, 5])
+    assert owner.tolist() == [[0, 1, 1], [-1, -1, -1]]
+
+
+def test_fragment_left_by_overlap_goes_to_next_part_behind():
+    # weapon이 hair 가운데를 덮어 hair에는 양옆 한 줄씩만 남음 → 그 조각은 뒤의 head로
+    names = ["head", "hair", "weapon"]
+    masks = boxes((16, 16), (0, 16, 0, 16), (0, 16, 0, 10), (0, 16, 1, 9))
+    result, stats = postprocess_masks(names, masks, min_area=20, max_hole=0)
+
+    assert not result[1].any()
+    assert result[2].sum() == 128 and result[2][:, 1:9].all()
+    assert result[0].sum() == 128
+    assert stats["duplicate_px_removed"] == 256 + 160 + 128 - 256
+    assert stats["final_px"] == 256
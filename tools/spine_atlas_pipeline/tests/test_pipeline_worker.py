@@ -0,0 +1,87 @@
+"""pipeline_worker 큐 제한(429) / wait 응답 (mock_comfyui)"""
+
+import time
+import threading
+
+import pytest
+import requests
+
+from mock_comfyui import MockComfyUI
+from pipeline_worker import PipelineWorker, QUEUE_FULL_RETRY_AFTER
+
+
+@pytest.fixture
+def mock():
+    server = MockComfyUI(exec_time="fixed:0.5").start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def worker(mock, tmp_path):
+    """generate 작업자 1개, 대기 큐 1칸"""
+    pipeline_worker = PipelineWorker(mock.host, str(tmp_path / "out"), str(tmp_path / "parts"),
+                                     queue_size=1, workers={"generate": 1}).start()
+    server = pipeline_worker.serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pipeline_worker.url = f"http://127.0.0.1:{server.server_port}"
+    yield pipeline_worker
+    server.shutdown()
+    server.server_close()
+
+
+def generate(worker, expression, wait=0):
+    return requests.post(f"{worker.url}/jobs/generate?wait={wait}",
+                         json={"characters": ["arcana"], "expressions": [expression],
+                               "seed_salt": expression}, timeout=30)
+
+
+def wait_status(worker, job_id, status, timeout=10):
+    deadline = time.time() + timeout
+    while worker.get(job_id)["status"] != status:
+        assert time.time() < deadline, worker.get(job_id)
+        time.sleep(0.02)
+
+
+def test_full_queue_is_rejected_with_retry_after(worker, mock):
+    running = generate(worker, "idle")
+    assert running.status_code == 202
+    wait_status(worker, running.json()["id"], "running")
+
+    queued = generate(worker, "happy")
+    assert queued.status_code == 202
+    assert requests.get(f"{worker.url}/health", timeout=5).json()["queued"]["generate"] == 1
+
+    rejected = generate(worker, "angry")
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == str(QUEUE_FULL_RETRY_AFTER)
+    assert "queue is full" in rejected.json()["error"]
+
+    # 거절된 작업은 등록되지 않고, 큐가 비면 다시 받는다
+    assert len(requests.get(f"{worker.url}/jobs", timeout=5).json()["jobs"]) == 2
+    wait_status(worker, queued.json()["id"], "success")
+    assert generate(worker, "angry", wait=30).json()["status"] == "success"
+    assert mock.snapshot()["completed"] == 3
+
+
+def test_wait_returns_finished_job_or_202(worker):
+    finished = generate(worker, "idle", wait=30)
+    assert finished.status_code == 200
+    job = finished.json()
+    assert job["status"] == "success"
+    assert job["result"]["generated"] == 1 and len(job["result"]["images"]) == 1
+
+    # 같은 작업을 다시 요청하면 저널 덕분에 바로 끝남
+    again = generate(worker, "idle", wait=30).json()
+    assert again["result"]["skipped"] == 1 and again["result"]["generated"] == 0
+
+    pending = generate(worker, "happy", wait=0.05)
+    assert pending.status_code == 202
+    assert pending.json()["finished"] is None
+
+
+def test_invalid_request_is_rejected_before_queueing(worker):
+    response = requests.post(f"{worker.url}/jobs/generate", json={"characters": ["nobody"]}, timeout=5)
+    assert response.status_code == 400
+    assert "Unknown character" in response.json()["error"]
+    assert worker.stats()["queued"]["generate"] == 0
@@ -0,0 +1,101 @@
+"""provider_stats 자동 선택 (MockProvider 실행 기록 → 시간/비용 목적별 선택)"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from cloud_api_alternatives import MockProvider, parse_mock_providers
+from provider_stats import ProviderStatsStore, choose_provider, MIN_STATS_SAMPLES
+
+PIPELINE_DIR = Path(__file__).resolve().parent.parent
+
+
+def seed(store: ProviderStatsStore, name: str, seconds: float, unit_cost: float, failures: int = 0, successes: int = 4):
+    for _ in range(successes):
+        store.record(name, "success", {"run_time": seconds}, unit_cost)
+    for _ in range(failures):
+        store.record(name, "error", {"run_time": seconds}, unit_cost)
+
+
+def test_time_and_cost_objectives_pick_different_providers(tmp_path):
+    # 기본 지연은 같게 두고, 시간 차이는 기록으로만 나게 한다
+    fast = MockProvider("fast", run_time=5.0, unit_cost=0.01)
+    cheap = MockProvider("cheap", run_time=5.0, unit_cost=0.001)
+    store = ProviderStatsStore(str(tmp_path / "stats.jsonl"))
+    seed(store, "fast", 1.0, 0.01)
+    seed(store, "cheap", 8.0, 0.001)
+
+    chosen, estimates = choose_provider([cheap, fast], store, 20, "time")
+    assert chosen is fast
+    assert [est["source"] for est in estimates] == ["history", "history"]
+
+    chosen, _ = choose_provider([cheap, fast], store, 20, "cost")
+    assert chosen is cheap
+
+
+def test_defaults_until_enough_samples(tmp_path):
+    slow_default = MockProvider("slow_default", run_time=10.0)
+    steady = MockProvider("steady", run_time=4.0)
+    store = ProviderStatsStore(str(tmp_path / "stats.jsonl"))
+    seed(store, "slow_default", 0.5, 0.0, successes=MIN_STATS_SAMPLES - 1)
+
+    chosen, estimates = choose_provider([slow_default, steady], store, 8, "time")
+    assert chosen is steady
+    assert estimates[-1]["source"] == "default"
+
+    store.record("slow_default", "success", {"run_time": 0.5}, 0.0)
+    chosen, _ = choose_provider([slow_default, steady], store, 8, "time")
+    assert chosen is slow_default
+
+
+def test_failure_rate_counts_against_provider(tmp_path):
+    flaky = MockProvider("flaky", unit_cost=0.001)
+    solid = MockProvider("solid", unit_cost=0.0015)
+    store = ProviderStatsStore(str(tmp_path / "stats.jsonl"))
+    seed(store, "flaky", 2.0, 0.001, failures=6, successes=4)
+    seed(store, "solid", 2.0, 0.0015)
+
+    chosen, estimates = choose_provider([flaky, solid], store, 20, "cost")
+    assert chosen is solid
+    assert estimates[-1]["failure_rate"] == pytest.approx(0.6)
+
+
+def test_run_records_stats_used_for_selection(tmp_path):
+    store = ProviderStatsStore(str(tmp_path / "stats.jsonl"))
+    providers = parse_mock_providers("quick=0.05:0.02,slow=0.3:0.002")
+    for provider in providers.values():
+        provider.stats_store = store
+        for i in range(MIN_STATS_SAMPLES):
+            provider.run("positive", "negative", str(tmp_path / f"{provider.name}_{i}.png"))
+
+    # 파일에서 다시 읽어도 같은 결과
+    reloaded = ProviderStatsStore(str(tmp_path / "stats.jsonl"))
+    for store_ in (store, reloaded):
+        assert choose_provider(list(providers.values()), store_, 10, "time")[0].name == "quick"
+        assert choose_provider(list(providers.values()), store_, 10, "cost")[0].name == "slow"
+
+
+def test_parse_mock_providers_rejects_bad_specs():
+    assert parse_mock_providers("") == {}
+    provider = parse_mock_providers("m=2:0.5:0.25")["m"]
+    assert (provider.run_time, provider.unit_cost, provider.failure_rate) == (2.0, 0.5, 0.25)
+    for spec in ("m", "m=fast", "replicate=1", "m=1:2:3:4"):
+        with pytest.raises(ValueError):
+            parse_mock_providers(spec)
+
+
+def test_cli_auto_selects_mock_provider(tmp_path):
+    def run(objective):
+        result = subprocess.run(
+            [sys.executable, "cloud_api_alternatives.py", "-s", "auto", "-c", "arcana", "-e", "idle",
+             "--mock-providers", "fast=0.05:0.01,cheap=0.2:0.001", "--optimize", objective,
+             "-o", str(tmp_path / objective)],
+            cwd=PIPELINE_DIR, capture_output=True, text=True, timeout=60
+        )
+        assert result.returncode == 0, result.stderr
+        return result.stdout
+
+    assert "Service: fast" in run("time")
+    assert "Service: cheap" in run("cost")
@@ -0,0 +1,50 @@
+"""JobScheduler: 모든 호스트가 죽었을 때 복구를 기다린 뒤 실패 처리 (mock_comfyui)"""
+
+import threading
+import time
+
+from batch_generate import JobScheduler, build_jobs, load_prompts
+from mock_comfyui import MockComfyUI
+
+
+def jobs(count: int = 2):
+    return build_jobs(["arcana"], ["idle", "happy", "angry"][:count], load_prompts(), use_rembg=False)
+
+
+def dead_host() -> MockComfyUI:
+    """포트만 잡아두고 바로 내린 서버 (같은 포트로 다시 띄울 수 있음)"""
+    mock = MockComfyUI(exec_time="fixed:0.05").start()
+    mock.stop()
+    return mock
+
+
+def test_waits_for_host_to_come_back():
+    down = dead_host()
+    revived = []
+
+    def revive():
+        time.sleep(0.5)
+        revived.append(MockComfyUI(port=down.port, exec_time="fixed:0.05").start())
+
+    threading.Thread(target=revive, daemon=True).start()
+    scheduler = JobScheduler([down.host], poll_interval=0.05, health_interval=0.2, outage_wait=10)
+    try:
+        results = scheduler.run(jobs())
+    finally:
+        for mock in revived:
+            mock.stop()
+
+    assert [r["error"] for r in results] == [None, None]
+    assert revived[0].snapshot()["completed"] == 2
+
+
+def test_fails_waiting_jobs_after_outage_deadline():
+    down = dead_host()
+    scheduler = JobScheduler([down.host], poll_interval=0.05, health_interval=0.1, outage_wait=0.5)
+
+    started = time.time()
+    results = scheduler.run(jobs())
+    elapsed = time.time() - started
+
+    assert elapsed >= 0.5
+    assert [r["error"] for r in results] == ["No healthy backend"] * 2
@@ -0,0 +1,69 @@
+"""stream_pipeline.Stage back-pressure / close 순서"""
+
+import threading
+import time
+
+from stream_pipeline import Stage
+
+
+def test_full_queue_blocks_put_until_worker_frees_a_slot():
+    release = threading.Event()
+    handled = []
+
+    def handler(item):
+        release.wait(5)
+        handled.append(item["n"])
+
+    stage = Stage("slow", handler, workers=1, queue_size=2).start()
+    stage.put({"n": 0})
+    while stage.queue.qsize():   # 작업자가 첫 항목을 가져갈 때까지
+        time.sleep(0.01)
+    stage.put({"n": 1})
+    stage.put({"n": 2})
+
+    blocked = threading.Thread(target=stage.put, args=({"n": 3},))
+    blocked.start()
+    blocked.join(0.3)
+    assert blocked.is_alive()            # 큐 2칸이 차 있으면 앞 단계가 기다림
+
+    release.set()
+    blocked.join(5)
+    assert not blocked.is_alive()
+    stage.close()
+
+    assert handled == [0, 1, 2, 3]
+    assert stage.stats["done"] == 4
+    assert stage.stats["blocked"] >= 0.25
+    assert stage.stats["max_queue"] == 2
+
+
+def test_close_drains_chained_stages_in_order():
+    packed = []
+    pack = Stage("pack", lambda item: (time.sleep(0.01), packed.append(item["n"])), workers=1).start()
+    segment = Stage("segment", lambda item: pack.put({"n": item["n"] * 10}), workers=2,
+                    queue_size=1).start()
+
+    for n in range(8):
+        segment.put({"n": n})
+    segment.close()   # 앞 단계부터: segment가 끝낸 항목이 모두 pack 큐에 들어간 뒤 pack 종료
+    pack.close()
+
+    assert sorted(packed) == [n * 10 for n in range(8)]
+    assert not any(thread.is_alive() for thread in segment.threads + pack.threads)
+
+
+def test_failed_items_are_reported_and_do_not_stop_the_stage():
+    errors = []
+
+    def handler(item):
+        if item["n"] % 2:
+            raise ValueError(f"bad {item['n']}")
+
+    stage = Stage("check", handler, workers=2,
+                  on_error=lambda name, item, e: errors.append((name, item["n"], str(e)))).start()
+    for n in range(6):
+        stage.put({"n": n})
+    stage.close()
+
+    assert stage.stats["done"] == 3 and stage.stats["failed"] == 3
+    assert sorted(errors) == [("check", n, f"bad {n}") for n in (1, 3, 5)]
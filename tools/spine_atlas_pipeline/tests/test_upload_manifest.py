@@ -0,0 +1,41 @@
+"""parts_segment 업로드 중복 제거 / --force-upload (mock_comfyui)"""
+
+import pytest
+
+from mock_comfyui import MockComfyUI, figure_png
+from parts_segment import upload_image, load_upload_manifest
+
+
+@pytest.fixture
+def mock():
+    server = MockComfyUI().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "arcana_idle.png"
+    path.write_bytes(figure_png(64))
+    return str(path)
+
+
+def test_second_upload_uses_manifest(mock, image, tmp_path):
+    manifest = str(tmp_path / "uploads.json")
+    first = upload_image(mock.host, image, manifest)
+    second = upload_image(mock.host, image, manifest)
+
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["name"] == first["name"]
+    assert mock.snapshot()["uploads"] == 1
+
+
+def test_force_upload_skips_check_but_records(mock, image, tmp_path):
+    manifest = str(tmp_path / "uploads.json")
+    forced = upload_image(mock.host, image, manifest, force=True)
+    assert forced["cached"] is False
+    assert [entry["name"] for entry in load_upload_manifest(manifest)[mock.host].values()] == [forced["name"]]
+
+    assert upload_image(mock.host, image, manifest, force=True)["cached"] is False
+    assert upload_image(mock.host, image, manifest)["cached"] is True
+    assert mock.snapshot()["uploads"] == 2